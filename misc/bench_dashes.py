@@ -0,0 +1,81 @@
+#! /usr/bin/env python3
+#
+# Compare the curve splitting convert2dash() with the polyline dash engine
+# dash_polylines() of silhouette/convert2dashes.py, on the dashed paths of svg files.
+#
+# Usage:
+#  python3 misc/bench_dashes.py                      # examples/dashline.svg and test/data/curved_dashes.test.svg
+#  python3 misc/bench_dashes.py -s 0.01 -x 20 examples/dashline.svg
+#
+# "curves" splits the Bezier curves at the dash ends and then flattens the
+# pieces, "polylines" flattens first and cuts the polylines. Both are in the
+# user units of the paths, before any transform. "ends" is the largest
+# distance between corresponding dash end points of the two.
+
+import argparse
+import copy
+import os
+import sys
+import time
+
+import numpy as np
+
+root = os.path.dirname(os.path.abspath(__file__)) + '/..'
+sys.path.append(root)      # make it callable from anywhere
+import inkex
+from inkex import PathElement, ShapeElement
+from silhouette.Geometry import flatten_superpath
+from silhouette.convert2dashes import convert2dash, dash_pattern, dash_polylines
+
+
+def curves(node, flat):
+    node = node.to_path_element()
+    convert2dash(node)
+    return flatten_superpath(node.path.to_superpath(), flat)
+
+
+def polylines(node, flat, pattern):
+    subpaths = flatten_superpath(node.to_path_element().path.to_superpath(), flat)
+    return dash_polylines(subpaths, *pattern)
+
+
+def best_of(repeat, func):
+    best = float("inf")
+    for r in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    ArgParser = argparse.ArgumentParser(description='Benchmark dash splitting.')
+    ArgParser.add_argument('-s', '--smoothness', type=float, default=0.05, help="Flattening tolerance. Default: 0.05")
+    ArgParser.add_argument('-x', '--scale', type=float, default=1.0,
+                           help="Scale the paths, but not the dash pattern, to make more dashes. Default: 1")
+    ArgParser.add_argument('-r', '--repeat', type=int, default=3, help="Report the best of r runs. Default: 3")
+    ArgParser.add_argument('svgfile', nargs='*')
+    args = ArgParser.parse_args()
+
+    files = args.svgfile or [root + '/examples/dashline.svg', root + '/test/data/curved_dashes.test.svg']
+    print("%-24s %-10s %7s %10s %10s %8s %10s" % ("file", "element", "dashes", "curves", "polylines", "speedup", "ends"))
+    for filename in files:
+        svg = inkex.load_svg(filename).getroot()
+        for node in svg.iter():
+            if not isinstance(node, ShapeElement) or isinstance(node, inkex.Group):
+                continue
+            pattern = dash_pattern(node.style)
+            if pattern is None:
+                continue
+            name = node.get_id()
+            if args.scale != 1.0:
+                node = PathElement.new(node.path.transform(inkex.Transform(scale=args.scale)), style=str(node.style))
+            t_old, old = best_of(args.repeat, lambda: curves(copy.deepcopy(node), args.smoothness))
+            t_new, new = best_of(args.repeat, lambda: polylines(node, args.smoothness, pattern))
+            if len(old) == len(new):
+                ends = max(max(np.hypot(*(a[0] - b[0])), np.hypot(*(a[-1] - b[-1]))) for a, b in zip(old, new))
+                ends = "%.2e" % ends
+            else:
+                ends = "%d != %d" % (len(old), len(new))
+            print("%-24s %-10s %7d %9.4fs %9.4fs %7.1fx %10s" % (
+                os.path.basename(filename), name, len(new), t_old, t_new, t_old / t_new, ends))
@@ -0,0 +1,81 @@
+#! /usr/bin/env python3
+#
+# Scalar versus numpy batch versions of the functions in silhouette/Geometry.py
+#
+# Usage:
+#  python3 misc/bench_geometry.py                # 100000 random points
+#  python3 misc/bench_geometry.py -n 1000000
+#
+# "batch" includes converting the XY_s points to arrays, as a caller holding
+# points would have to do that. "arrays" is the batch function alone.
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/..')      # make it callable from anywhere
+from silhouette import Geometry
+from silhouette.Geometry import XY_s
+
+
+def best_of(repeat, func):
+    best = float("inf")
+    for r in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def to_array(points):
+    a = np.empty((len(points), 2))
+    a[:,0] = np.fromiter((p.x for p in points), dtype=float, count=len(points))
+    a[:,1] = np.fromiter((p.y for p in points), dtype=float, count=len(points))
+    return a
+
+
+if __name__ == "__main__":
+    ArgParser = argparse.ArgumentParser(description='Benchmark the scalar and the batch geometry functions.')
+    ArgParser.add_argument('-n', '--count', type=int, default=100000, help="Number of points per argument. Default: 100000")
+    ArgParser.add_argument('-r', '--repeat', type=int, default=3, help="Report the best of r runs. Default: 3")
+    args = ArgParser.parse_args()
+
+    rnd = random.Random(1)
+    A, B, C, D = ([XY_s((rnd.uniform(0, 300), rnd.uniform(0, 300))) for i in range(args.count)] for k in range(4))
+
+    kernels = [
+        ('dist_sq', 2,
+         lambda a, b: Geometry.dist_sq(a, b),
+         lambda a, b: Geometry.dist_sq_batch(a, b)),
+        ('ccw', 3,
+         lambda a, b, c: Geometry.ccw(a, b, c),
+         lambda a, b, c: Geometry.ccw_batch(a, b, c)),
+        ('colinear', 3,
+         lambda a, b, c: Geometry.colinear(a, b, c),
+         lambda a, b, c: Geometry.colinear_batch(a, b, c)),
+        ('sharp_turn 90', 3,
+         lambda a, b, c: Geometry.sharp_turn(a, b, c, 0.0),
+         lambda a, b, c: Geometry.sharp_turn_batch(a, b, c, 0.0)),
+        ('sharp_turn 63', 3,
+         lambda a, b, c: Geometry.sharp_turn(a, b, c, 0.5),
+         lambda a, b, c: Geometry.sharp_turn_batch(a, b, c, 0.5)),
+        ('intersect_lines', 4,
+         lambda a, b, c, d: Geometry.intersect_lines(a, b, c, d, limit1=True, limit2=True),
+         lambda a, b, c, d: Geometry.intersect_lines_batch(a, b, c, d, limit1=True, limit2=True)),
+        ('intersect_y', 2,
+         lambda a, b: Geometry.intersect_y(a, b, 150.0, limit=True),
+         lambda a, b: Geometry.intersect_y_batch(a, b, 150.0, limit=True)),
+    ]
+
+    arrays = [to_array(p) for p in (A, B, C, D)]
+    print("%-16s %10s %10s %10s %8s" % ("function", "scalar", "batch", "arrays", "speedup"))
+    for name, nargs, scalar, batch in kernels:
+        args_pt = (A, B, C, D)[:nargs]
+        t_scalar = best_of(args.repeat, lambda: [scalar(*p) for p in zip(*args_pt)])
+        t_batch = best_of(args.repeat, lambda: batch(*(to_array(p) for p in args_pt)))
+        t_arrays = best_of(args.repeat, lambda: batch(*arrays[:nargs]))
+        print("%-16s %9.4fs %9.4fs %9.4fs %7.1fx" % (name, t_scalar, t_batch, t_arrays, t_scalar / t_arrays))
@@ -0,0 +1,71 @@
+#! /usr/bin/env python3
+#
+# Start-up and load time of the headless silhouette/SvgLoader.py against the
+# inkex based traversal of sendto_silhouette.py.
+#
+# Usage:
+#  python3 misc/bench_loader.py                      # all test/data files, in one process each
+#  python3 misc/bench_loader.py examples/stencil-free-fonts.svg
+#
+# Each variant runs in a fresh python process, so that the import time is
+# measured as a script or batch job sees it. "process" includes interpreter start-up.
+
+import argparse
+import glob
+import os
+import subprocess
+import sys
+import time
+
+root = os.path.dirname(os.path.abspath(__file__)) + '/..'
+
+INKEX = """
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, %r)
+from sendto_silhouette import SendtoSilhouette
+imported = time.perf_counter()
+paths = 0
+for filename in sys.argv[1:]:
+    e = SendtoSilhouette()
+    e.parse_arguments([filename])
+    e.load_raw()
+    e.clean_up()
+    e.initDocScale()
+    e.report = lambda *args: None
+    e.recursivelyTraverseSvg(e.document.getroot())
+    paths += len(e.paths)
+print(imported - start, time.perf_counter() - imported, paths)
+""" % root
+
+HEADLESS = """
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, %r)
+from silhouette.SvgLoader import load_paths
+imported = time.perf_counter()
+paths = 0
+for filename in sys.argv[1:]:
+    paths += len(load_paths(filename))
+print(imported - start, time.perf_counter() - imported, paths)
+""" % root
+
+
+if __name__ == "__main__":
+    ArgParser = argparse.ArgumentParser(description='Benchmark the headless SVG loader.')
+    ArgParser.add_argument('-r', '--repeat', type=int, default=3, help="Report the best of r runs. Default: 3")
+    ArgParser.add_argument('svgfile', nargs='*')
+    args = ArgParser.parse_args()
+
+    files = args.svgfile or sorted(glob.glob(root + '/test/data/*.svg'))
+    print("%d files" % len(files))
+    for name, code in (('inkex', INKEX), ('headless', HEADLESS)):
+        best = None
+        for r in range(args.repeat):
+            start = time.perf_counter()
+            out = subprocess.run([sys.executable, '-c', code] + files, capture_output=True, text=True, check=True)
+            elapsed = time.perf_counter() - start
+            t_import, t_load, paths = out.stdout.split()
+            if best is None or elapsed < best[2]:
+                best = (float(t_import), float(t_load), elapsed, int(paths))
+        print("%-9s import=%7.3fs  load=%7.3fs  process=%7.3fs  paths=%d" % ((name,) + best))
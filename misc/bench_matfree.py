@@ -0,0 +1,69 @@
+#! /usr/bin/env python3
+#
+# Time and memory of the MatFree strategy on the cut dumps in misc/dump.
+#
+# Usage:
+#  python3 misc/bench_matfree.py                     # all dumps, tiled 2x2, default and pyramids preset
+#  python3 misc/bench_matfree.py -t 4 -p pyramids misc/dump/star_man.dump
+#  python3 misc/bench_matfree.py -t 1 -l 16 -j 4        # a roll of 16 tigers, on 4 processes
+#
+# Peak memory is traced in a second run, as tracemalloc slows things down.
+
+import argparse
+import gc
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/..')      # make it callable from anywhere
+from silhouette.Strategy import MatFree
+from bench_mintravel import load_dump, tile
+
+
+def roll(paths, n, gap=20.0):
+    """Repeat paths n times along y, with gap mm between them, like a roll fed job."""
+    ys = [p[1] for path in paths for p in path]
+    h = max(ys) - min(ys) + gap
+    return [[(x, y + k*h) for x, y in path] for k in range(n) for path in paths]
+
+
+def run(paths, preset, processes=None):
+    mf = MatFree(preset)
+    mf.verbose = 0
+    mf.processes = processes
+    mf.apply([list(p) for p in paths])
+    return mf
+
+
+if __name__ == "__main__":
+    ArgParser = argparse.ArgumentParser(description='Benchmark the matfree strategy.')
+    ArgParser.add_argument('-t', '--tile', type=int, default=2, help="Tile each dump t x t times. Default: 2")
+    ArgParser.add_argument('-p', '--preset', action='append', help="MatFree preset, can be repeated. Default: default and pyramids")
+    ArgParser.add_argument('-r', '--repeat', type=int, default=3, help="Report the best of r runs. Default: 3")
+    ArgParser.add_argument('-l', '--roll', type=int, default=1, help="Then repeat the tiles l times along y, 20mm apart. Default: 1")
+    ArgParser.add_argument('-j', '--processes', type=int, default=None, help="Process independent y-bands on a pool of j processes.")
+    ArgParser.add_argument('dumpfile', nargs='*')
+    args = ArgParser.parse_args()
+
+    files = args.dumpfile or sorted(glob.glob(os.path.dirname(os.path.abspath(__file__)) + '/dump/*.dump'))
+    for filename in files:
+        paths = roll(tile(load_dump(filename), args.tile), args.roll)
+        for preset in args.preset or ['default', 'pyramids']:
+            best = float("inf")
+            for r in range(args.repeat):
+                gc.collect()
+                start = time.perf_counter()
+                mf = run(paths, preset, args.processes)
+                best = min(best, time.perf_counter() - start)
+            npoints = sum(len(path) for path in mf.output)
+            del mf
+            gc.collect()
+            tracemalloc.start()
+            mf = run(paths, preset, args.processes)
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print("%-24s %-9s paths=%6d  output points=%7d  time=%8.3fs  peak=%8.1fMB  kept=%8.1fMB  (%d bytes/point)" % (
+                os.path.basename(filename), preset, len(paths), npoints, best,
+                peak / 1e6, current / 1e6, current / max(npoints, 1)))
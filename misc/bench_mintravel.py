@@ -0,0 +1,89 @@
+#! /usr/bin/env python3
+#
+# Compare the linear scan and the KDTree backed StrategyMinTraveling.sort()
+# on the cut dumps in misc/dump.
+#
+# Usage:
+#  python3 misc/bench_mintravel.py                   # all dumps, tiled 4x4
+#  python3 misc/bench_mintravel.py -t 10 misc/dump/Ghostscript_Tiger.dump
+#  python3 misc/bench_mintravel.py -r 2              # also refine for 2 seconds
+#  python3 misc/bench_mintravel.py -c -j 4 -t 30     # also sort_cells(), on 4 processes
+#
+# Tiling repeats a dump on a grid, so that a dump with a few hundred paths
+# becomes a job with several thousand paths.
+
+import argparse
+import ast
+import glob
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/..')      # make it callable from anywhere
+import silhouette.StrategyMinTraveling as mintravel
+
+
+def load_dump(filename):
+    """Return the cut paths of a dump file, as written with --log_paths"""
+    for line in open(filename, 'r'):
+        if line.lstrip().startswith('['):
+            return ast.literal_eval(line)
+    return []
+
+
+def tile(paths, n):
+    """Repeat paths n by n times, shifted by the size of their bounding box."""
+    xs = [p[0] for path in paths for p in path]
+    ys = [p[1] for path in paths for p in path]
+    w = max(xs) - min(xs) + 1
+    h = max(ys) - min(ys) + 1
+    tiled = []
+    for i in range(n):
+        for j in range(n):
+            tiled.extend([[(x + i*w, y + j*h) for x, y in path] for path in paths])
+    return tiled
+
+
+def timed(func, paths, **kwargs):
+    paths = [list(p) for p in paths]
+    start = time.time()
+    result = func(paths, **kwargs)
+    return time.time() - start, result
+
+
+if __name__ == "__main__":
+    ArgParser = argparse.ArgumentParser(description='Benchmark the mintravel strategies.')
+    ArgParser.add_argument('-t', '--tile', type=int, default=4, help="Tile each dump t x t times. Default: 4")
+    ArgParser.add_argument('-f', '--full', action='store_true', help="Also run the entrycircular (mintravelfull) variant")
+    ArgParser.add_argument('-r', '--refine', type=float, default=0.0, help="Also run refine() for this many seconds. Default: 0")
+    ArgParser.add_argument('-c', '--cells', action='store_true', help="Also run sort_cells() (mintravelcells)")
+    ArgParser.add_argument('-j', '--processes', type=int, default=None, help="Process pool size for sort_cells()")
+    ArgParser.add_argument('dumpfile', nargs='*')
+    args = ArgParser.parse_args()
+
+    files = args.dumpfile or sorted(glob.glob(os.path.dirname(os.path.abspath(__file__)) + '/dump/*.dump'))
+    variants = [('mintravel', {})]
+    if args.full:
+        variants.append(('mintravelfull', {'entrycircular': True}))
+
+    for filename in files:
+        paths = tile(load_dump(filename), args.tile)
+        for name, kwargs in variants:
+            t_lin, r_lin = timed(mintravel.sort_linear, paths, **kwargs)
+            t_idx, r_idx = timed(mintravel.sort, paths, **kwargs)
+            print("%-24s %-14s paths=%6d  linear=%8.3fs  indexed=%8.3fs  speedup=%7.1fx  travel=%.1fmm  %s" % (
+                os.path.basename(filename), name, len(paths), t_lin, t_idx,
+                t_lin / max(t_idx, 1e-9), mintravel.travel(r_idx),
+                "same" if r_lin == r_idx else "DIFFERENT"))
+            if args.refine > 0:
+                t_ref, r_ref = timed(mintravel.refine, r_idx, seconds=args.refine,
+                                     reversible=(name != 'mintravelfwd'))
+                print("%-24s %-14s refined in %.3fs: travel=%.1fmm -> %.1fmm" % (
+                    os.path.basename(filename), name, t_ref,
+                    mintravel.travel(r_idx), mintravel.travel(r_ref)))
+        if args.cells:
+            t_idx, r_idx = timed(mintravel.sort, paths)
+            t_cel, r_cel = timed(mintravel.sort_cells, paths, processes=args.processes)
+            print("%-24s %-14s paths=%6d  indexed=%8.3fs  cells=%8.3fs  travel=%.1fmm -> %.1fmm" % (
+                os.path.basename(filename), 'mintravelcells', len(paths), t_idx, t_cel,
+                mintravel.travel(r_idx), mintravel.travel(r_cel)))
@@ -43,7 +43,6 @@ from inkex.extensions import EffectExtension
 from inkex import Boolean, Path, ShapeElement, PathElement, Rectangle, Circle, Ellipse, Line, Polyline, Polygon, Group, Use, TextElement, Image, BaseElement, SvgDocumentElement
 from inkex.transforms import Transform
 from inkex.units import convert_unit
-from inkex.bezier import subdiv
 
 from gettext import gettext
 from optparse import SUPPRESS_HELP
@@ -51,10 +50,11 @@ from tempfile import NamedTemporaryFile, gettempdir
 
 from silhouette.Graphtec import SilhouetteCameo, CAMEO_MATS
 from silhouette.Strategy import MatFree
-from silhouette.convert2dashes import convert2dash
+from silhouette.convert2dashes import dash_pattern, dash_polylines
+from silhouette.GeometryCache import GeometryCache, JobCache, default_cache_dir
 import silhouette.StrategyMinTraveling
 import silhouette.read_dump
-from silhouette.Geometry import dist_sq, XY_a
+from silhouette.Geometry import dist_sq, flatten_superpath, max_scale, transform_batch, XY_a
 
 # Temporary Monkey Backport Patches to support functions that exist only after v1.2
 # TODO: If support for Inkscape v1.1 is dropped then this backport can be removed
@@ -80,6 +80,9 @@ if not hasattr(inkex, "__version__") or inkex.__version__[0:3] < "1.2":
 # Default Logfile Filename
 LOGFILE_DEFAULT_NAME = "silhouette.log"
 
+# Smaller matfree jobs take less time than starting a process pool
+MATFREE_POOL_POINTS = 100000
+
 # Autogenerated Registration Mark SVG IDs
 REGMARK_LAYERNAME = 'Regmarks'
 REGMARK_LAYER_ID = 'regmark'
@@ -116,7 +119,11 @@ class SendtoSilhouette(EffectExtension):
 
         self.warnings = {}
         self.pathcount = 0
+        self.nodecount = 0
         self.paths = []
+        self.flatcache = {}     # (d, style, smoothness) -> flattened subpaths in local coordinates
+        self.geocache = None    # GeometryCache of flattened subpaths in device coordinates
+        self.primitives = {}    # flattened circles for --native_circles, see SilhouetteCameo.plot()
         self.docTransform = Transform()
         self.cmdfile = None
         self.caffeinate_process = None
@@ -226,8 +233,17 @@ class SendtoSilhouette(EffectExtension):
                 help="Do not send commands to device (queries allowed)")
         pars.add_argument("-g", "--strategy",
                 dest = "strategy", default = "mintravel",
-                choices=("mintravel", "mintravelfull", "mintravelfwd", "matfree", "zorder"),
-                help="Cutting Strategy: mintravel, mintravelfull, mintravelfwd, matfree or zorder")
+                choices=("mintravel", "mintravelfull", "mintravelfwd", "mintravelcells", "matfree", "zorder"),
+                help="Cutting Strategy: mintravel, mintravelfull, mintravelfwd, mintravelcells, matfree or zorder")
+        pars.add_argument("--optimize_seconds",
+                dest = "optimize_seconds", type = float, default = 0.0,
+                help="Time budget [s] for refining the mintravel path order with 2-opt/Or-opt moves. 0 disables. "
+                     "Refined jobs are not cached. Default: 0")
+        pars.add_argument("--matfree_processes",
+                dest = "matfree_processes", type = int, default = 1,
+                help="Processes for the independent y-bands of a matfree job. More than 1 also changes the cut order: "
+                     "each band starts its sweep at the left. 0: one per CPU, for jobs of %d points or more. "
+                     "1: no process pool. Default: 1" % MATFREE_POOL_POINTS)
         pars.add_argument("--orient_paths",
                 dest = "orient_paths", default = "natural",
                 choices=("natural","desy","ascy","desx","ascx"),
@@ -238,6 +254,13 @@ class SendtoSilhouette(EffectExtension):
         pars.add_argument("-l", "--sw_clipping",
                 dest = "sw_clipping", type = Boolean, default = True,
                 help="Enable software clipping")
+        pars.add_argument("--draw_commands",
+                choices=("point", "polyline", "relative", "binary"),
+                dest = "draw_commands", default = "point",
+                help="point: one D command per point. polyline: one D command per run of points. relative: one E command per run of points. binary: BEn binary relative draw commands, on Cameo 4 and Portrait 3 models; experimental, not verified on hardware. Default: point")
+        pars.add_argument("--native_circles",
+                dest = "native_circles", type = Boolean, default = False,
+                help="Experimental: cut whole circles with the native W command of the cutter, instead of flattened.")
         pars.add_argument("-m", "--media", "--media-id", "--media_id",
                 dest = "media", default = "132",
                 choices=("100", "101", "102", "106", "111", "112", "113",
@@ -313,6 +336,15 @@ class SendtoSilhouette(EffectExtension):
         pars.add_argument("--logfile",
                 dest = "logfile", default = None,
                 help="Name of file in which to save log messages.")
+        pars.add_argument("--cache_size", type = int,
+                dest = "cache_size", default = 0,
+                help="Size limit [MB] of the on-disk cache of flattened paths and plot commands. 0 disables. Default: 0")
+        pars.add_argument("--cache_dir",
+                dest = "cache_dir", default = None,
+                help="Directory of the on-disk cache of flattened paths. Default: the user cache directory")
+        pars.add_argument("--bypass_cache",
+                dest = "bypass_cache", type = Boolean, default = False,
+                help="Compute the plot commands even if the same job is in the cache, and store them again")
         pars.add_argument("--cmdfile",
                 dest = "cmdfile", default = None,
                 help="Name of file to save transcript of cutter commands.")
@@ -469,69 +501,89 @@ class SendtoSilhouette(EffectExtension):
 
         # p is now a list of lists of cubic beziers [control pt1, control pt2, endpoint]
         # where the start-point is the last point in the previous segment.
-        for sp in p:
-            # subdivide beziers into smooth curved parts
-            subdiv(sp, self.options.smoothness)
-            # extract path
-            if len(sp) > 1:
-                self.paths.append([tuple(csp[1]) for csp in sp])
+        # Subdivide the beziers of all subpaths into smooth curved parts at once,
+        # and extract the paths.
+        for points in flatten_superpath(p, self.options.smoothness):
+            self.paths.append([tuple(xy) for xy in points.tolist()])
 
 
     def recursivelyTraverseSvg(self, aNodeList,
                 parent_visibility="visible",
                 parent_transform: Transform=None):
         """
-        Recursively traverse the svg file to plot out all of the
-        paths.  The function keeps track of the composite transformation
-        that should be applied to each path.
+        Traverse the svg file to plot out all of the paths.  The function
+        keeps track of the composite transformation that should be applied
+        to each path.
 
         This function handles path, group, line, rect, polyline, polygon,
         circle, ellipse and use (clone) elements.  Notable elements not
         handled include text.  Unhandled elements should be converted to
         paths in Inkscape.
+
+        Despite the name, groups and clones are not handled by recursion, but
+        by an explicit stack of (children, visibility, transform, use) frames,
+        so that deeply nested documents do not hit the recursion limit.
         """
-        for node in aNodeList:
+        stack = [(iter(aNodeList), parent_visibility, parent_transform, None)]
+        uses = set()    # <use> elements on the stack, to break reference cycles
+        while stack:
+            nodes, parent_visibility, parent_transform, use = stack[-1]
+            node = next(nodes, None)
+            if node is None:
+                stack.pop()
+                uses.discard(use)
+                continue
+            self.nodecount += 1
+
             # Ignore invisible nodes
             if isinstance(node, BaseElement):
                 # try:
                 #     # Inkex 1.2: `cascaded_style()` considers CSS (has bad performance!!)
-                #     get = node.cascaded_style().get
+                #     style = node.cascaded_style()
                 # except:
-                get = lambda attr, default: node.style.get(attr, node.get(attr, default))
-                if get("display", "inline") == "none":
+                # Read the raw attributes: the style is parsed only if it can matter.
+                attrib = node.attrib
+                raw = attrib.get("style")
+                if raw and ("display" in raw or "opacity" in raw or "visibility" in raw):
+                    style = node.style
+                else:
+                    style = {}
+                if style.get("display", attrib.get("display", "inline")) == "none":
                     continue
-                if not float(get("opacity", 1.0)):
+                if not float(style.get("opacity", attrib.get("opacity", 1.0))):
                     continue
-                v = get("visibility", parent_visibility)
+                v = style.get("visibility", attrib.get("visibility", parent_visibility))
                 if v == "inherit":
                     v = parent_visibility
 
             # NOTE: inkex 1.1 has composed_transform only on ShapeElement
             if isinstance(node, ShapeElement):
-                if parent_transform==None:
+                if parent_transform is None:
                     # init my_transform // needed for selection by `--id` param
                     my_transform = node.composed_transform()
-                else:
+                elif attrib.get("transform"):
                     # NOTE: <<< transforms operate from right (detail) to left (whole)
                     my_transform = parent_transform @ node.transform
+                else:
+                    my_transform = parent_transform
 
             if isinstance(node, Group):
                 # Check if layer name is referring to cutting mat, registration mark or print layer
-                if node.label:
-                    if "cuttingmat" in node.label.lower():
-                        self.report(f"layer '{node.label}' is a cutting mat layer - skipped", 'log')
-                        continue
-                    if "regmark" in node.label.lower():
-                        self.report(f"layer '{node.label}' is a registration mark layer - skipped", 'log')
-                        continue
-                    if "print" in node.label.lower():
-                        self.report(f"layer '{node.label}' is a print layer - skipped", 'log')
+                label = node.label
+                if label:
+                    label = label.lower()
+                    skip = next((kind for key, kind in (("cuttingmat", "a cutting mat"),
+                                                        ("regmark", "a registration mark"),
+                                                        ("print", "a print"))
+                                 if key in label), None)
+                    if skip:
+                        self.report(f"layer '{node.label}' is {skip} layer - skipped", 'log')
                         continue
-                self.recursivelyTraverseSvg(node, parent_visibility=v, parent_transform=my_transform)
+                stack.append((iter(node), v, my_transform, None))
 
             elif isinstance(node, Use):
                 # A <use> element refers to another element via href="#blah" attribute.
-                # We then recursively process the referenced element.
+                # We then process the referenced element.
                 #
                 # Notes:
                 # . Even if the <use> element has visibility="hidden", SVG still calls
@@ -539,13 +591,18 @@ class SendtoSilhouette(EffectExtension):
                 #   hidden only if its visibility is "inherit" or "hidden".
                 refnode = node.href
                 if refnode is not None:
+                    if node in uses:
+                        self.report(f"<use> element '{node.get_id()}' is part of a reference cycle - skipped", 'error')
+                        continue
                     # apply any necessary (x, y) translation
-                    x = float(node.get("x", 0.0))
-                    y = float(node.get("y", 0.0))
-                    # NOTE: <<< transforms operate from right (detail) to left (whole)
-                    my_transform = my_transform @ Transform(translate=(x, y))
+                    x = float(attrib.get("x", 0.0))
+                    y = float(attrib.get("y", 0.0))
+                    if x or y:
+                        # NOTE: <<< transforms operate from right (detail) to left (whole)
+                        my_transform = my_transform @ Transform(translate=(x, y))
 
-                    self.recursivelyTraverseSvg([refnode], parent_visibility=v, parent_transform=my_transform)
+                    uses.add(node)
+                    stack.append((iter([refnode]), v, my_transform, node))
 
             elif isinstance(node, (PathElement, Rectangle, Circle, Ellipse, Line, Polyline, Polygon)):
                 if v == "hidden" or v == "collapse":
@@ -554,15 +611,47 @@ class SendtoSilhouette(EffectExtension):
                 # NOTE: <<< transforms operate from right (detail) to left (whole)
                 transform = self.docTransform @ my_transform
 
-                # convert element to path
-                node = node.to_path_element()
+                d = attrib.get("d") if isinstance(node, PathElement) else None
+                if d is None:
+                    d = str(node.path)
+                style = attrib.get("style") if self.options.dashes else None
+                self.pathcount += 1
 
-                # apply dashed style
-                if self.options.dashes:
-                    convert2dash(node)
+                # An unchanged element of a document sent before is in the on-disk cache.
+                if self.geocache is not None:
+                    diskkey = self.geocache.key(d, transform.matrix, style,
+                                                self.options.smoothness, self.options.dashes)
+                    subpaths = self.geocache.get(diskkey)
+                    if subpaths is not None:
+                        for points in subpaths:
+                            self.paths.append([tuple(xy) for xy in points.tolist()])
+                        self.addPrimitive(node, transform, subpaths)
+                        continue
 
-                self.pathcount += 1
-                self.plotPath(node.path.transform(transform))
+                # Flatten each distinct path data once, in local coordinates, with
+                # the smoothness scaled down by the transform.  Clones and duplicated
+                # paths only transform the cached points.
+                scale = max_scale(transform.matrix)
+                flat = self.options.smoothness / scale if scale else self.options.smoothness
+                key = (d, style, flat)
+                subpaths = self.flatcache.get(key)
+                if subpaths is None:
+                    # same as node.to_path_element().path, which rounds through
+                    # the d attribute, without copying style and transform.
+                    path = Path(str(node.path))
+                    subpaths = flatten_superpath(path.to_superpath(), flat)
+                    # apply dashed style, along the flattened subpaths
+                    pattern = dash_pattern(node.style) if self.options.dashes else None
+                    if pattern:
+                        subpaths = dash_polylines(subpaths, *pattern)
+                    self.flatcache[key] = subpaths
+
+                subpaths = [transform_batch(points, transform.matrix) for points in subpaths]
+                if self.geocache is not None:
+                    self.geocache.put(diskkey, subpaths)
+                for points in subpaths:
+                    self.paths.append([tuple(xy) for xy in points.tolist()])
+                self.addPrimitive(node, transform, subpaths)
 
             elif isinstance(node, TextElement):
                 texts = []
@@ -692,6 +781,26 @@ class SendtoSilhouette(EffectExtension):
                     'tty')
 
 
+    def addPrimitive(self, node, transform, subpaths):
+        """Record the last path, if it is a flattened circle, in self.primitives,
+           so that it can be cut with a native command. Circles and round ellipses
+           stay circles under a transform without skew or uneven scale.
+        """
+        if not self.options.native_circles or not isinstance(node, (Circle, Ellipse)) or len(subpaths) != 1:
+            return
+        rx, ry = node.rxry()
+        (a, c, e), (b, d, f) = transform.matrix
+        scale = math.sqrt(abs(a * d - b * c))
+        if rx <= 0 or abs(rx - ry) > 1e-9 * rx or not (
+                math.isclose(a, d, abs_tol=1e-9 * scale) and math.isclose(b, -c, abs_tol=1e-9 * scale) or
+                math.isclose(a, -d, abs_tol=1e-9 * scale) and math.isclose(b, c, abs_tol=1e-9 * scale)):
+            return
+        path = self.paths[-1]
+        if len(path) < 3:
+            return
+        cx, cy = transform.apply_to_point(node.center)
+        self.primitives[(path[0], path[1])] = (tuple(path), (cx, cy, rx * scale))
+
     @staticmethod
     def preorientPaths(paths, index, ordered) -> list:
         """Reorder paths along X or Y axis, ascending or descending"""
@@ -747,7 +856,8 @@ class SendtoSilhouette(EffectExtension):
 
             # on a closed path some overlapping doesn't harm, limited to a maximum of one additional round
             overcut = overcut
-            if (overcut > 0) and self.is_closed_path(path):
+            # circles cut with a native command need no overcut
+            if (overcut > 0) and self.is_closed_path(path) and (path[0], path[1]) not in self.primitives:
                 precut = overcut
                 pfrom = path[-1]
                 for pprev in reversed(path[:-1]):
@@ -779,6 +889,73 @@ class SendtoSilhouette(EffectExtension):
             cut.append(multipath)
         return cut
 
+    def matfreeProcesses(self):
+        """The number of processes of a matfree job, with --matfree_processes=0 resolved."""
+        processes = self.options.matfree_processes
+        if processes == 0:
+            # starting the pool does not pay off for small jobs
+            big = sum(len(path) for path in self.paths) >= MATFREE_POOL_POINTS
+            processes = os.cpu_count() if big else 1
+        return processes
+
+    def jobOptions(self):
+        """The options and document settings that affect the cut paths, setup() and plot()."""
+        names = ("orient_paths", "strategy", "matfree_processes", "optimize_seconds", "fuse_paths", "multipass", "reversetoggle",
+                 "overcut", "tool", "media", "toolholder", "cuttingmat", "sharpencorners", "sharpencorners_start",
+                 "sharpencorners_end", "depth", "sw_clipping", "bladediameter", "pressure", "speed", "skip_init",
+                 "x_off", "y_off", "bboxonly", "endposition", "end_offset", "regmark", "regsearch",
+                 "quadregmarks", "skip_reset", "autocrop", "force_hardware", "draw_commands",
+                 "native_circles")
+        options = dict((name, getattr(self.options, name)) for name in names)
+        options["matfree_processes"] = self.matfreeProcesses()    # bands cut in another order
+        return (tuple(options.items()),
+                self.reg_width, self.reg_length, self.reg_origin_X, self.reg_origin_Y,
+                self.svg.viewport_width, self.svg.viewport_height)
+
+    def compileCut(self):
+        """Orient, sort and fuse self.paths, and return the cut with multipass and overcut."""
+        # Reorder paths (except in case of Z-order)
+        if self.options.orient_paths != "natural":
+            index = dict(x=0,y=1)[self.options.orient_paths[-1]]
+            ordered = dict(des=operator.gt, asc=operator.lt)[self.options.orient_paths[0:3]]
+            self.paths = self.preorientPaths(self.paths, index, ordered)
+
+        # Optimize paths
+        if self.options.strategy == "matfree":
+            mf = MatFree("default", scale=1.0, pen=self.pen)
+            mf.verbose = 0    # inkscape crashes whenever something appears in stdout.
+            mf.processes = self.matfreeProcesses()
+            self.paths = mf.apply(self.paths)
+            if mf.bands > 1:
+                self.report("MatFree: %d y-bands on %d processes" % (mf.bands, mf.processes), 'log')
+        elif self.options.strategy == "mintravel":
+            self.paths = silhouette.StrategyMinTraveling.sort(self.paths)
+        elif self.options.strategy == "mintravelfull":
+            self.paths = silhouette.StrategyMinTraveling.sort(self.paths, entrycircular=True)
+        elif self.options.strategy == "mintravelfwd":
+            self.paths = silhouette.StrategyMinTraveling.sort(self.paths, entrycircular=True, reversible=False)
+        elif self.options.strategy == "mintravelcells":
+            self.paths = silhouette.StrategyMinTraveling.sort_cells(self.paths)
+        if self.options.strategy.startswith("mintravel") and self.options.optimize_seconds > 0:
+            before = silhouette.StrategyMinTraveling.travel(self.paths)
+            self.paths = silhouette.StrategyMinTraveling.refine(self.paths, self.options.optimize_seconds,
+                reversible=(self.options.strategy != "mintravelfwd"))
+            self.report("Pen up travel: %.1f mm greedy, %.1f mm refined" % (
+                before, silhouette.StrategyMinTraveling.travel(self.paths)), 'log')
+
+        # Fuse paths
+        if self.paths and self.options.fuse_paths:
+            rest_paths = self.paths[1:]
+            self.paths = [self.paths[0]]
+            for path in rest_paths:
+                if path[0] == self.paths[-1][-1]:
+                    self.paths[-1].extend(path[1:])
+                else:
+                    self.paths.append(path)
+
+        # Handle multipass & overcut
+        return self.multipassOvercut(self.paths, self.options.multipass, self.options.reversetoggle, self.options.overcut)
+
     def effect(self):
         try:
             return self._effect()
@@ -811,6 +988,13 @@ class SendtoSilhouette(EffectExtension):
         self.initDocScale()
 
         # Build a list of paths for the document's graphical elements
+        if self.options.cache_size > 0:
+            try:
+                self.geocache = GeometryCache(os.path.join(self.options.cache_dir or default_cache_dir(),
+                                                           "geometry.sqlite"), self.options.cache_size * 1000000)
+            except Exception as error:
+                self.report("Geometry cache disabled: %s" % error, 'log')
+        start = time.perf_counter()
         if self.options.ids:
             # Traverse the selected objects
             for id in self.options.ids:
@@ -818,6 +1002,17 @@ class SendtoSilhouette(EffectExtension):
         else:
             # Traverse the entire document
             self.recursivelyTraverseSvg(self.document.getroot())
+        self.report("SVG traversal: %d elements, %d paths (%d flattened), %d polylines in %.3fs" % (
+            self.nodecount, self.pathcount, len(self.flatcache), len(self.paths), time.perf_counter() - start), 'log')
+        if self.geocache is not None:
+            hits, misses = self.geocache.hits, self.geocache.misses
+            try:
+                count, size = self.geocache.close()
+                self.report("Geometry cache: %d hits, %d misses, %d evicted, %d entries, %.1fMB in %s" % (
+                    hits, misses, self.geocache.evicted, count, size / 1e6, self.geocache.path), 'log')
+            except Exception as error:
+                self.report("Geometry cache not saved: %s" % error, 'log')
+            self.geocache = None
 
         if self.warnings:
             # stop if there are any known issues with the document
@@ -840,36 +1035,27 @@ class SendtoSilhouette(EffectExtension):
             self.pen=False
             self.autoblade=True
 
-        # Reorder paths (except in case of Z-order)
-        if self.options.orient_paths != "natural":
-            index = dict(x=0,y=1)[self.options.orient_paths[-1]]
-            ordered = dict(des=operator.gt, asc=operator.lt)[self.options.orient_paths[0:3]]
-            self.paths = self.preorientPaths(self.paths, index, ordered)
-
-        # Optimize paths
-        if self.options.strategy == "matfree":
-            mf = MatFree("default", scale=1.0, pen=self.pen)
-            mf.verbose = 0    # inkscape crashes whenever something appears in stdout.
-            self.paths = mf.apply(self.paths)
-        elif self.options.strategy == "mintravel":
-            self.paths = silhouette.StrategyMinTraveling.sort(self.paths)
-        elif self.options.strategy == "mintravelfull":
-            self.paths = silhouette.StrategyMinTraveling.sort(self.paths, entrycircular=True)
-        elif self.options.strategy == "mintravelfwd":
-            self.paths = silhouette.StrategyMinTraveling.sort(self.paths, entrycircular=True, reversible=False)
-
-        # Fuse paths
-        if self.paths and self.options.fuse_paths:
-            rest_paths = self.paths[1:]
-            self.paths = [self.paths[0]]
-            for path in rest_paths:
-                if path[0] == self.paths[-1][-1]:
-                    self.paths[-1].extend(path[1:])
-                else:
-                    self.paths.append(path)
-
-        # Handle multipass & overcut
-        cut = self.multipassOvercut(self.paths, self.options.multipass, self.options.reversetoggle, self.options.overcut)
+        # A job sent before, with the same paths and options, has its plot commands in the job cache.
+        jobcache = jobkey = cached = None
+        # The order refine() finds in its time budget differs from run to run, it is not cached.
+        refined = self.options.strategy.startswith("mintravel") and self.options.optimize_seconds > 0
+        if self.options.cache_size > 0 and refined:
+            self.report("Job cache disabled: --optimize_seconds gives a different order on every run", 'log')
+        elif self.options.cache_size > 0 and not (self.options.preview or self.options.dump_paths or self.options.autocrop):
+            try:
+                jobcache = JobCache(os.path.join(self.options.cache_dir or default_cache_dir(), "geometry.sqlite"),
+                                    self.options.cache_size * 1000000)
+                jobkey = jobcache.key(JobCache.paths_hash(self.paths), self.jobOptions(), __version__,
+                                      sorted(circle for points, circle in self.primitives.values()))
+                if not self.options.bypass_cache:
+                    cached = jobcache.get(jobkey)
+            except Exception as error:
+                self.report("Job cache disabled: %s" % error, 'log')
+                jobcache = None
+
+        cut = None
+        if cached is None:
+            cut = self.compileCut()
 
         if self.options.dump_paths:
             pointcount = 0
@@ -938,6 +1124,12 @@ class SendtoSilhouette(EffectExtension):
             return
         self.report("device version: '%s'" % dev.get_version(), 'log')
 
+        hardware = {'name': dev.hardware.get('name'), 'product_id': dev.product_id()}
+        if cached is not None and cached[2] != hardware:
+            self.report("Job cache: the commands were made for %s - recomputing" % cached[2]['name'], 'log')
+            cached = None
+            cut = self.compileCut()
+
         dev.setup(media=int(self.options.media, 10),
                 pen=self.pen,
                 toolholder=self.options.toolholder,
@@ -951,7 +1143,8 @@ class SendtoSilhouette(EffectExtension):
                 bladediameter=self.options.bladediameter,
                 pressure=self.options.pressure,
                 speed=self.options.speed,
-                skip_init=self.options.skip_init)
+                skip_init=self.options.skip_init,
+                draw_commands=self.options.draw_commands)
 
         if self.options.autocrop:
             # this takes much longer, if we have a complext drawing
@@ -995,7 +1188,18 @@ class SendtoSilhouette(EffectExtension):
             regoriginx=self.reg_origin_X,
             regoriginy=self.reg_origin_Y,
             skip_init=self.options.skip_init,
-            skip_reset=self.options.skip_reset)
+            skip_reset=self.options.skip_reset,
+            cached=cached[:2] if cached else None,
+            primitives=self.primitives if self.options.native_circles else None)
+        if jobcache is not None:
+            if cached is None:
+                jobcache.put(jobkey, bbox["data"], bbox["bbox"], hardware)
+            try:
+                count, size = jobcache.close()
+                self.report("Job cache: %s, %d evicted, %d entries, %.1fMB" % (
+                    "hit" if cached else "miss", jobcache.evicted, count, size / 1e6), 'log')
+            except Exception as error:
+                self.report("Job cache not saved: %s" % error, 'log')
         if len(bbox["bbox"].keys()) == 0:
             self.report("empty page?", 'error')
         else:
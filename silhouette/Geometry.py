@@ -4,6 +4,12 @@
 # Split from silhouette/Strategy.py
 #
 
+import bisect
+import heapq
+import math
+
+import numpy as np
+
 # minimum difference for geometric values to be considered equal.
 _eps = 1e-10
 
@@ -219,6 +225,253 @@ def intersect_y(A,B,y_boundary, limit=False):
   return _intersect_y5(A.x, A.y, B.x, B.y, y_boundary, limit)
 
 
+## numpy batch versions of the functions above.
+##
+## Points are given as numpy arrays of shape (N,2); a single point of shape (2,)
+## is broadcast against the others. The arithmetic is done in the same order as in
+## the scalar functions, so that the results are identical, also in the
+## borderline cases (colinear points, _eps comparisons).
+## Where a scalar function returns None, a batch function returns NaN.
+## The scalar functions remain the faster choice for a single point.
+
+def dist_sq_batch(A,B):
+  """Same as dist_sq(), returns a float array.
+  """
+  dx = B[...,0]-A[...,0]
+  dy = B[...,1]-A[...,1]
+  return dx*dx + dy*dy
+
+
+def _ccw5(Ax,Ay,Bx,By,Cx,Cy):
+  return (Cy-Ay)*(Bx-Ax) > (By-Ay)*(Cx-Ax)
+
+
+def ccw_batch(A,B,C):
+  """Same as ccw(), returns a boolean array.
+  """
+  return _ccw5(A[...,0],A[...,1], B[...,0],B[...,1], C[...,0],C[...,1])
+
+
+def colinear_batch(A,B,C):
+  """Same as colinear(), returns a boolean array.
+  """
+  return np.abs((C[...,1]-A[...,1])*(B[...,0]-A[...,0]) - (B[...,1]-A[...,1])*(C[...,0]-A[...,0])) < _eps
+
+
+def sharp_turn_batch(A,B,C,fwd_ratio):
+  """Same as sharp_turn(), returns a boolean array.
+     Element i tests the corner at B[i].
+  """
+  Ax, Ay = A[...,0], A[...,1]
+  Bx, By = B[...,0], B[...,1]
+  Cx, Cy = C[...,0], C[...,1]
+  dx = Bx-Ax
+  dy = By-Ay
+  if fwd_ratio == 0.0:                                  # sharp_turn_90()
+    Dx = Bx-dy
+    Dy = By+dx
+    return _ccw5(Ax,Ay, Bx,By, Dx,Dy) == _ccw5(Cx,Cy, Bx,By, Dx,Dy)
+
+  ccw_abc = _ccw5(Ax,Ay, Bx,By, Cx,Cy)
+  dx_bd = np.where(ccw_abc, -dy, dy)
+  dy_bd = np.where(ccw_abc, dx, -dx)
+  Fx = Bx+fwd_ratio*dx+dx_bd
+  Fy = By+fwd_ratio*dy+dy_bd
+  return _ccw5(Bx,By, Fx,Fy, Cx,Cy) == ccw_abc
+
+
+def _in_segment_batch(A,B,x,y):
+  """ the _in_segment() test of intersect_lines(), returns a boolean array.
+  """
+  Ax, Ay = A[...,0], A[...,1]
+  Bx, By = B[...,0], B[...,1]
+  in_x = ((Ax <= x+_eps) & (x-_eps <= Bx)) | ((Ax >= x-_eps) & (x+_eps >= Bx))
+  in_y = ((Ay <= y+_eps) & (y-_eps <= By)) | ((Ay >= y-_eps) & (y+_eps >= By))
+  return np.where(np.abs(Ax-Bx) > _eps, in_x, in_y)
+
+
+def intersect_lines_batch(A,B,C,D, limit1=False, limit2=False):
+  """Same as intersect_lines(), returns an (N,2) float array.
+     Rows are NaN, where intersect_lines() returns None.
+  """
+  A, B, C, D = np.broadcast_arrays(A, B, C, D)
+  _a1 = B[...,1] - A[...,1]
+  _b1 = A[...,0] - B[...,0]
+  _c1 = _a1 * A[...,0] + _b1 * A[...,1]
+
+  _a2 = D[...,1] - C[...,1]
+  _b2 = C[...,0] - D[...,0]
+  _c2 = _a2 * C[...,0] + _b2 * C[...,1]
+
+  det = _a1 * _b2 - _a2 * _b1
+  parallel = (det < _eps) & (det > -_eps)
+  with np.errstate(divide='ignore', invalid='ignore'):
+    x = (_b2*_c1 - _b1*_c2) / det
+    y = (_a1*_c2 - _a2*_c1) / det
+
+  hit = ~parallel
+  if limit1: hit &= _in_segment_batch(A,B,x,y)
+  if limit2: hit &= _in_segment_batch(C,D,x,y)
+  result = np.where(hit[...,None], np.stack((x,y), axis=-1), np.nan)
+
+  # the segments may be colinear, with many intersecting points.
+  overlap = parallel & colinear_batch(A,B,C) & colinear_batch(A,B,D)
+  c_in = overlap & _in_segment_batch(A,B,C[...,0],C[...,1])      # A--C--B--D or A--C--D--B
+  d_in = overlap & ~c_in & _in_segment_batch(A,B,D[...,0],D[...,1])        # A--D--B--C
+  a_in = overlap & ~c_in & ~d_in & _in_segment_batch(C,D,A[...,0],A[...,1]) # C--A--B--D
+  result = np.where(c_in[...,None], C, result)
+  result = np.where(d_in[...,None], D, result)
+  return np.where(a_in[...,None], A, result)
+
+
+def _intersect_y5_batch(Ax,Ay,Bx,By,y_boundary, limit=False):
+  """ Same as _intersect_y5(), returns a float array with NaN for None.
+  """
+  dy = By-Ay
+  horizontal = np.abs(dy) < _eps
+  with np.errstate(divide='ignore', invalid='ignore'):
+    ratio = (y_boundary-Ay)/dy
+    x = Ax + ratio*(Bx-Ax)
+  if limit:
+    x = np.where((ratio < 0.0) | (ratio > 1.0), np.nan, x)
+  on_boundary = np.where(np.abs(By-y_boundary) < _eps, 0.5*(Ax+Bx), np.nan)
+  return np.where(horizontal, on_boundary, x)
+
+
+def intersect_x_batch(A,B,x_boundary, limit=False):
+  """Same as intersect_x(), returns a float array with NaN for None.
+  """
+  return _intersect_y5_batch(A[...,1], A[...,0], B[...,1], B[...,0], x_boundary, limit)
+
+
+def intersect_y_batch(A,B,y_boundary, limit=False):
+  """Same as intersect_y(), returns a float array with NaN for None.
+  """
+  return _intersect_y5_batch(A[...,0], A[...,1], B[...,0], B[...,1], y_boundary, limit)
+
+
+## Flattening of cubic beziers, a batch version of inkex.bezier.subdiv().
+##
+## Beziers are given as numpy arrays of shape (N,4,2): start, two control points, end.
+## Like subdiv(), a bezier is split in halves until both control points are
+## within flat of the chord [start, end]. The arithmetic is that of
+## inkex.bezier.maxdist() and beziersplitatt(), so that the same points result.
+
+def _bezier_maxdist_batch(P):
+  """Same as inkex.bezier.maxdist(), returns a float array.
+     The distance of a control point is measured to the chord as a segment,
+     i.e. to the nearer end, if the foot of the perpendicular is outside.
+  """
+  Sx, Sy = P[:,0,0], P[:,0,1]
+  dx = P[:,3,0]-Sx
+  dy = P[:,3,1]-Sy
+  vv = dx*dx + dy*dy
+  length = np.hypot(dx, dy)
+  dist = []
+  for k in (1, 2):
+    x, y = P[:,k,0], P[:,k,1]
+    dot2 = (x-Sx)*dx + (y-Sy)*dy
+    with np.errstate(divide='ignore', invalid='ignore'):
+      perp = np.abs((dx*(Sy-y)) - ((Sx-x)*dy)) / length
+    dist.append(np.where(dot2 <= 0, np.hypot(Sx-x, Sy-y),
+                np.where(vv <= dot2, np.hypot(P[:,3,0]-x, P[:,3,1]-y), perp)))
+  return np.maximum(dist[0], dist[1])
+
+
+def _bezier_halves_batch(P):
+  """Same as inkex.bezier.beziersplitatt(bez, 0.5), returns two (N,4,2) arrays."""
+  m1 = P[:,0] + 0.5*(P[:,1]-P[:,0])
+  m2 = P[:,1] + 0.5*(P[:,2]-P[:,1])
+  m3 = P[:,2] + 0.5*(P[:,3]-P[:,2])
+  m4 = m1 + 0.5*(m2-m1)
+  m5 = m2 + 0.5*(m3-m2)
+  m = m4 + 0.5*(m5-m4)
+  return np.stack((P[:,0], m1, m4, m), axis=1), np.stack((m, m5, m3, P[:,3]), axis=1)
+
+
+def flatten_beziers_batch(P, flat, max_depth=16):
+  """Split all beziers of the (N,4,2) array P in halves, until each piece is
+     flat. All pieces of one level are tested and split at once.
+     Returns (ends, owner): the end points of the pieces as an (M,2) array, in
+     path order, and for each piece the index of the bezier in P it came from.
+     A bezier is split max_depth times at most, where subdiv() would loop
+     forever for flat <= 0.
+  """
+  owner = np.arange(len(P))
+  done = np.zeros(len(P), dtype=bool)
+  for depth in range(max_depth):
+    todo = np.flatnonzero(~done)
+    if not len(todo):
+      break
+    is_flat = _bezier_maxdist_batch(P[todo]) <= flat
+    done[todo[is_flat]] = True
+    split = todo[~is_flat]
+    if not len(split):
+      break
+    # each split bezier is replaced by its two halves, in place.
+    count = np.ones(len(P), dtype=np.intp)
+    count[split] = 2
+    first = np.cumsum(count) - count
+    one, two = _bezier_halves_batch(P[split])
+    P = np.repeat(P, count, axis=0)
+    P[first[split]] = one
+    P[first[split]+1] = two
+    owner = np.repeat(owner, count)
+    done = np.repeat(done, count)
+  return P[:,3], owner
+
+
+def flatten_superpath(csp, flat, max_depth=16):
+  """Flatten a cubic super path, as returned by inkex.Path.to_superpath():
+     a list of subpaths, each a list of [control1, point, control2] nodes.
+     flat is the allowed distance of the curve from its chords. Paths are in mm
+     here, so there is no gain in values below the device resolution.
+     Returns a list of (N,2) point arrays, one per subpath with two or more
+     nodes. The points are the same as those left by inkex.bezier.subdiv(sp, flat).
+  """
+  subpaths = [sp for sp in csp if len(sp) > 1]
+  if not subpaths:
+    return []
+  nodes = np.array([node for sp in subpaths for node in sp], dtype=float)   # (K,3,2)
+  sizes = np.array([len(sp) for sp in subpaths])
+  starts = np.cumsum(sizes) - sizes
+  last = np.ones(len(nodes), dtype=bool)              # no segment from the last node of a subpath
+  last[starts[1:]-1] = False
+  last[-1] = False
+  a = np.flatnonzero(last)
+  P = np.stack((nodes[a,1], nodes[a,2], nodes[a+1,0], nodes[a+1,1]), axis=1)
+  ends, owner = flatten_beziers_batch(P, flat, max_depth)
+  # segments are in subpath order: subpath i has sizes[i]-1 segments.
+  pieces = np.bincount(owner, minlength=len(P))
+  bounds = np.cumsum(np.add.reduceat(pieces, starts - np.arange(len(starts))))
+  result = []
+  lo = 0
+  for i, hi in enumerate(bounds.tolist()):
+    result.append(np.vstack((nodes[starts[i],1], ends[lo:hi])))
+    lo = hi
+  return result
+
+
+def transform_batch(points, matrix):
+  """Apply an affine matrix ((a, c, e), (b, d, f)), as in inkex.Transform.matrix,
+     to an (N,2) point array. Returns a new array.
+  """
+  (a, c, e), (b, d, f) = matrix
+  return points @ np.array([[a, b], [c, d]], dtype=float) + (e, f)
+
+
+def max_scale(matrix):
+  """The largest factor by which an affine matrix ((a, c, e), (b, d, f))
+     stretches a distance, i.e. the largest singular value of its linear part.
+     A distance tolerance in the target space is tolerance/max_scale(matrix)
+     in the source space.
+  """
+  (a, c, e), (b, d, f) = matrix
+  s = a*a + b*b + c*c + d*d
+  det = a*d - b*c
+  return math.sqrt(0.5*(s + math.sqrt(max(s*s - 4*det*det, 0.0))))
+
+
 class XY_Grid_Factory:
   def __init__(self, spacing=0.5):
     self.serial = 0
@@ -244,6 +497,294 @@ class XY_Grid_Factory:
     return xy
 
 
+class XY_Hash:
+  def __init__(self, epsilon=0.05, slack=0.01):
+    """Map point locations to values, at a resolution of epsilon.
+       Locations are quantized to a grid of epsilon. All locations in the
+       same grid cell are considered identical, and so are locations closer
+       than slack*epsilon across a cell border.
+       Each cell holds one value, and the location that came first.
+       Cells are keyed by their integer column and row, packed into one int,
+       locations are kept as complex numbers. Neither needs formatting, and
+       neither is tracked by the garbage collector, which matters with
+       hundreds of thousands of points.
+       With epsilon 0, only exactly equal locations are identical.
+    """
+    self.epsilon = epsilon if epsilon > 0 else 0
+    self.inv = 1.0 / self.epsilon if self.epsilon else 0
+    self.slack = slack
+    self.cells = {}             # key -> value
+    self.locs = {}              # key -> complex(x, y)
+
+  def __len__(self):
+    return len(self.cells)
+
+  def _cell(self, x, y):
+    """column and row of the cell holding (x, y), and the position relative to that cell."""
+    fx = x * self.inv + 0.5
+    fy = y * self.inv + 0.5
+    ix = int(fx)
+    iy = int(fy)
+    if fx < ix: ix -= 1
+    if fy < iy: iy -= 1
+    return ix, iy, fx-ix, fy-iy
+
+  def _neighbours(self, x, y, ix, iy, rx, ry):
+    """Search the cells next to cell ix, iy for a location closer than
+       slack*epsilon to (x, y), which is at rx, ry relative to its cell.
+       Return its value or None.
+    """
+    s = self.slack
+    nx = ny = None
+    if rx < s: nx = ix-1
+    elif rx > 1.0-s: nx = ix+1
+    if ry < s: ny = iy-1
+    elif ry > 1.0-s: ny = iy+1
+    found = None
+    found_d = s * self.epsilon
+    for cx, cy in ((nx, iy), (ix, ny), (nx, ny)):
+      if cx is None or cy is None:
+        continue
+      key = (cx << 32) + cy
+      if key in self.locs:
+        d = abs(self.locs[key] - complex(x, y))
+        if d < found_d:
+          found = self.cells[key]
+          found_d = d
+    return found
+
+  def lookup(self, x, y):
+    """Return the value stored for the location (x, y). None, if there is none."""
+    if not self.inv:
+      return self.cells.get(complex(x, y))
+    ix, iy, rx, ry = self._cell(x, y)
+    value = self.cells.get((ix << 32) + iy)
+    if value is not None:
+      return value
+    s = self.slack
+    if s <= rx <= 1.0-s and s <= ry <= 1.0-s:
+      return None
+    return self._neighbours(x, y, ix, iy, rx, ry)
+
+  def setdefault(self, x, y, value):
+    """Like dict.setdefault(): return the value stored for the location (x, y).
+       If there is none, store value for (x, y) and return it.
+    """
+    if not self.inv:
+      return self.cells.setdefault(complex(x, y), value)
+    # _cell() inlined, this is the hot path of MatFree.load()
+    fx = x * self.inv + 0.5
+    fy = y * self.inv + 0.5
+    ix = int(fx)
+    iy = int(fy)
+    if fx < ix: ix -= 1
+    if fy < iy: iy -= 1
+    key = (ix << 32) + iy
+    found = self.cells.get(key)
+    if found is not None:
+      return found
+    rx = fx-ix
+    ry = fy-iy
+    s = self.slack
+    if not (s <= rx <= 1.0-s and s <= ry <= 1.0-s):
+      found = self._neighbours(x, y, ix, iy, rx, ry)
+      if found is not None:
+        return found
+    self.cells[key] = value
+    self.locs[key] = complex(x, y)
+    return value
+
+  def remove(self, x, y):
+    """Forget the value of the cell holding (x, y)."""
+    if not self.inv:
+      del self.cells[complex(x, y)]
+    else:
+      ix, iy, rx, ry = self._cell(x, y)
+      key = (ix << 32) + iy
+      del self.cells[key]
+      del self.locs[key]
+
+  def discard(self, x, y, value):
+    """Forget the cell holding (x, y), if it holds value. Points that were
+       never stored, or that share the cell of an earlier location, are ignored.
+       Returns True, if the cell was forgotten.
+    """
+    if not self.inv:
+      key = complex(x, y)
+    else:
+      ix, iy, rx, ry = self._cell(x, y)
+      key = (ix << 32) + iy
+    if key not in self.cells or self.cells[key] != value:
+      return False
+    del self.cells[key]
+    self.locs.pop(key, None)
+    return True
+
+  def setdefault_many(self, xy, first):
+    """Same as calling setdefault(x, y, value) for each row of the (N,2) array xy
+       in turn, with value counting up from first for each location that is new.
+       Returns the values as an int array.
+    """
+    values = np.empty(len(xy), dtype=np.int64)
+    setdefault = self.setdefault
+    for i, (x, y) in enumerate(xy.tolist()):
+      value = values[i] = setdefault(x, y, first)
+      if value == first: first += 1
+    return values
+
+
+class KDTree:
+  def __init__(self, points, leafsize=8):
+    """Build a static 2d-tree over a list of (x, y) points for nearest neighbour
+       queries. Points are referred to by their index into the given list.
+       Points can be removed with remove(idx), but not added. Removed points are
+       skipped by nearest(); subtrees without live points are pruned entirely,
+       so queries stay fast while the tree drains.
+    """
+    self.xs = [float(p[0]) for p in points]
+    self.ys = [float(p[1]) for p in points]
+    self.alive = [True] * len(points)
+    self.live = len(points)
+    self.leafsize = max(1, leafsize)
+
+    # flat node arrays. Leaves have left == -1 and own perm[lo:hi].
+    self.left = []
+    self.right = []
+    self.parent = []
+    self.dim = []
+    self.split = []
+    self.lo = []
+    self.hi = []
+    self.count = []
+    self.leaf_of = [0] * len(points)
+    self.perm = list(range(len(points)))
+    self._build(0, len(points), -1, 0)
+
+  def _new_node(self, parent, lo, hi):
+    n = len(self.left)
+    self.left.append(-1)
+    self.right.append(-1)
+    self.parent.append(parent)
+    self.dim.append(0)
+    self.split.append(0.0)
+    self.lo.append(lo)
+    self.hi.append(hi)
+    self.count.append(hi-lo)
+    return n
+
+  def _build(self, lo, hi, parent, depth):
+    """Median split of perm[lo:hi], alternating x and y. Returns the node id.
+       Points equal to the split value may end up on either side, which is fine
+       for pruning: left holds coordinates <= split, right holds >= split.
+    """
+    n = self._new_node(parent, lo, hi)
+    if hi - lo <= self.leafsize:
+      for i in range(lo, hi):
+        self.leaf_of[self.perm[i]] = n
+      return n
+    coord = self.xs if depth % 2 == 0 else self.ys
+    part = sorted(self.perm[lo:hi], key=lambda i: coord[i])
+    self.perm[lo:hi] = part
+    mid = (lo + hi) // 2
+    self.dim[n] = depth % 2
+    self.split[n] = coord[self.perm[mid]]
+    l = self._build(lo, mid, n, depth+1)
+    r = self._build(mid, hi, n, depth+1)
+    self.left[n] = l
+    self.right[n] = r
+    return n
+
+  def __len__(self):
+    return self.live
+
+  def remove(self, idx):
+    """Remove point idx from further queries. Removing twice is a no-op.
+    """
+    if not self.alive[idx]: return
+    self.alive[idx] = False
+    self.live -= 1
+    n = self.leaf_of[idx]
+    while n >= 0:
+      self.count[n] -= 1
+      n = self.parent[n]
+
+  def nearest(self, pos):
+    """Return (dist_sq, idx) of the live point nearest to pos.
+       Ties are broken towards the lowest idx, so that callers can encode a
+       preference order in the indices. Returns (inf, None) if no point is left.
+    """
+    qx = float(pos[0])
+    qy = float(pos[1])
+    xs, ys, alive, perm = self.xs, self.ys, self.alive, self.perm
+    left, right, dim, split = self.left, self.right, self.dim, self.split
+    lo, hi, count = self.lo, self.hi, self.count
+    best = [float("inf"), None]
+
+    def search(n):
+      if count[n] == 0: return
+      if left[n] < 0:
+        bd = best[0]
+        for k in range(lo[n], hi[n]):
+          i = perm[k]
+          if not alive[i]: continue
+          dx = qx-xs[i]
+          dy = qy-ys[i]
+          d = dx*dx + dy*dy
+          if d < bd or (d == bd and i < best[1]):
+            bd = best[0] = d
+            best[1] = i
+        return
+      diff = (qx if dim[n] == 0 else qy) - split[n]
+      if diff <= 0:
+        search(left[n])
+        if diff*diff <= best[0]: search(right[n])
+      else:
+        search(right[n])
+        if diff*diff <= best[0]: search(left[n])
+
+    if self.live: search(0)
+    return best[0], best[1]
+
+  def knearest(self, pos, k):
+    """Return a list of up to k (dist_sq, idx) tuples of the live points
+       nearest to pos, nearest first. Ties are ordered by idx.
+    """
+    qx = float(pos[0])
+    qy = float(pos[1])
+    xs, ys, alive, perm = self.xs, self.ys, self.alive, self.perm
+    left, right, dim, split = self.left, self.right, self.dim, self.split
+    lo, hi, count = self.lo, self.hi, self.count
+    heap = []     # max-heap of the k best, as (-dist_sq, -idx)
+
+    def bound():
+      return -heap[0][0] if len(heap) >= k else float("inf")
+
+    def search(n):
+      if count[n] == 0: return
+      if left[n] < 0:
+        for j in range(lo[n], hi[n]):
+          i = perm[j]
+          if not alive[i]: continue
+          dx = qx-xs[i]
+          dy = qy-ys[i]
+          item = (-(dx*dx + dy*dy), -i)
+          if len(heap) < k:
+            heapq.heappush(heap, item)
+          elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+        return
+      diff = (qx if dim[n] == 0 else qy) - split[n]
+      if diff <= 0:
+        search(left[n])
+        if diff*diff <= bound(): search(right[n])
+      else:
+        search(right[n])
+        if diff*diff <= bound(): search(left[n])
+
+    if self.live and k > 0: search(0)
+    return sorted((-d, -i) for d, i in heap)
+
+
 class XY_a(tuple):
   def __init__(self,t):
     # super(XY_a, self).__init__(tuple(t))
@@ -268,6 +809,63 @@ class XY_a(tuple):
     return _a
 
 
+class XY_s:
+  """A compact XY_a() for the MatFree pipeline.
+     XY_a() carries a dict per point for its attributes. XY_s() has a fixed set
+     of attributes in __slots__ instead, and all of them are always present:
+     seg, id are None, dup is 0 and the flags sharp, seen, sub, obsolete are
+     False, until set. Test them directly, e.g. 'if pt.sharp:'.
+     The attr property and att() build a dict of the attributes that are set,
+     for code that still expects XY_a(). Changes to that dict are not stored.
+     XY_s() behaves like the tuple (x, y) for indexing, iteration, equality,
+     hashing and repr, so that its users can treat it as a plain point.
+  """
+  __slots__ = ('x', 'y', 'id', 'seg', 'dup', 'sharp', 'seen', 'sub', 'obsolete')
+
+  def __init__(self, t, id=None):
+    self.x = t[0]
+    self.y = t[1]
+    self.id = id
+    self.seg = None
+    self.dup = 0
+    self.sharp = False
+    self.seen = False
+    self.sub = False
+    self.obsolete = False
+
+  def __getitem__(self, i):
+    return (self.x, self.y)[i]
+
+  def __len__(self):
+    return 2
+
+  def __iter__(self):
+    return iter((self.x, self.y))
+
+  def __eq__(self, other):
+    if isinstance(other, (tuple, XY_s)):
+      return (self.x, self.y) == tuple(other)
+    return NotImplemented
+
+  def __hash__(self):
+    return hash((self.x, self.y))
+
+  def __repr__(self):
+    return repr((self.x, self.y))
+
+  @property
+  def attr(self):
+    a = {}
+    for k in ('id', 'seg'):
+      if getattr(self, k) is not None: a[k] = getattr(self, k)
+    for k in ('dup', 'sharp', 'seen', 'sub', 'obsolete'):
+      if getattr(self, k): a[k] = getattr(self, k)
+    return a
+
+  def att(self):
+    return self.attr
+
+
 class Barrier:
   def __init__(self, points, key):
     """Initialize a barrier by sorting the points according to the given
@@ -276,9 +874,12 @@ class Barrier:
        find(point). All these method return an index into the sorted list
        that can be used in pos(idx) or pslice(idx1, idx2).
        Additional points can be added to an existing barrier with insert(point).
+       The keys are kept in a sorted list next to the points, so that find(),
+       insert() and index() can bisect.
     """
     self.key=key
     self.points = sorted(points, key=key)
+    self.keys = [key(p) for p in self.points]
     self.idx = 0
 
   def first(self):
@@ -356,13 +957,23 @@ class Barrier:
        range, and uses a user provided predicate match instead of self.key() with a point.
        Use lookup() when one particular point is sought, and find()
        could return another point that happens to share the same key() value.
+       lookup() is a linear scan: a predicate cannot be hashed or bisected. For a
+       point that is known by identity, index() bisects and is much faster.
     """
-    ## SPEEDUP:  provide the lambda function to __init__ and build a hash
-    ## that we can lookup by value here. (Would need a rebuild after insert(), but hey).
     for i in range(0, len(self.points)):
       if match(self.points[i]): return i
     return None
 
+  def index(self, point):
+    """Return the index of point (the very same object), or None.
+       Only the points that share its key() value are compared.
+       Does not alter self.idx.
+    """
+    k = self.key(point)
+    for i in range(bisect.bisect_left(self.keys, k), bisect.bisect_right(self.keys, k)):
+      if self.points[i] is point: return i
+    return None
+
   def find(self, targetpoint, backwards=False, start=None, id=None):
     """Advance the barrier so that it cuts through targetpoint. This
        targetpoint need not be amongst the set of points for which the barrier
@@ -373,30 +984,26 @@ class Barrier:
        If the targetpoint is beyond the the end, the barrier remains at the last point.
        Note: 'point(find(target)) == target' may or may not be true.
     """
-    ## SPEEDUP: uses a linear search. Look into bisect, just as with insert().
     saved_idx = self.idx
     if start is not None: self.idx = start
 
     key_limit = self.key(targetpoint)
     if backwards == True:
-      for i in reversed(range(0, self.idx+1)):
-        if self.key(self.points[i]) <= key_limit:
-          return self.idx
+      # any point up to self.idx within the barrier? The first one has the lowest key.
+      if self.idx >= 0 and len(self.keys) and self.keys[0] <= key_limit:
+        return self.idx
       self.idx = 0
       return self.idx     # stick at first point.
 
-    prev_idx = None
-    for i in range(self.idx, len(self.points)):
-      if self.key(self.points[i]) > key_limit:
-        if prev_idx is None:
-          if start is not None: self.idx = saved_idx
-          return None
-        else:
-          self.idx = prev_idx
-          return self.idx
-      prev_idx = i
-    self.idx = prev_idx
-    return self.idx     # stick at last point.
+    if self.idx >= len(self.points):
+      self.idx = None     # nothing to search. Same as the former linear scan.
+      return None
+    i = bisect.bisect_right(self.keys, key_limit, self.idx)
+    if i == self.idx:     # the barrier is already beyond the targetpoint.
+      if start is not None: self.idx = saved_idx
+      return None
+    self.idx = i-1
+    return self.idx       # sticks at last point, if beyond the end.
 
 
   def ahead(self, point):
@@ -413,26 +1020,12 @@ class Barrier:
        current barrier position (to be reached with next() ).
        Otherwise the current barrier position is incremented to refer to the same
        element and True is returned.
+       A new point goes behind all points with the same key() value.
     """
-    ## SPEEDUP: A sequential scan is used.
-    ##  * Should use bisect and __cmp__, __lt__, __eq__.
-    ##  * Should call find() for doing all the bisecting.
-    ## http://bugs.python.org/issue4356 asks for adding a key= parameter to bisect,
-    ## one of the reasons says:
-    ##   The lack of key may as well encourage you to continue using linear searches,
-    ##   or other sub-optimal solutions.
-    ## I chose the linear search for simplicity, as I fear hidden complexity while
-    ## tweaking compare functions.
-
-    insert_idx = len(self.points)       # if none is before, let insert become append.
     insert_key = self.key(point)
-    for i in range(0,len(self.points)):
-      if self.key(self.points[i]) > insert_key:
-        insert_idx = i
-        break
-
-    # print "Barrier.insert", point, insert_idx, self.points
+    insert_idx = bisect.bisect_right(self.keys, insert_key)
     self.points.insert(insert_idx, point)
+    self.keys.insert(insert_idx, insert_key)
     if insert_idx > self.idx:
       return False      # ahead
     self.idx += 1
@@ -0,0 +1,151 @@
+# GeometryCache.py -- on-disk caches of flattened paths and plot commands for sendto_silhouette.py
+#
+# Re-sending the same document is common: a re-cut after a jam, the next color
+# of silhouette_multi.py, another pressure. The flattened points of unchanged
+# elements, and the plot commands of an unchanged job, are found here instead
+# of being computed again.
+#
+# Entries are keyed by a hash of everything that affects them. They live in
+# tables of an sqlite database, and the least recently used ones are evicted
+# when a table grows above its size limit.
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+# Bump this when the flattening or the plot commands change, so that old entries are not used anymore.
+VERSION = 2
+
+
+def default_cache_dir():
+    """The user cache directory of appdirs, or the same place without it."""
+    try:
+        import appdirs
+        return appdirs.user_cache_dir('inkscape-silhouette')
+    except ImportError:
+        pass
+    platform = sys.platform.lower()
+    if platform.startswith('win'):
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser(r'~\AppData\Local')
+        return os.path.join(base, 'inkscape-silhouette', 'inkscape-silhouette', 'Cache')
+    if platform.startswith('darwin'):
+        return os.path.expanduser('~/Library/Caches/inkscape-silhouette')
+    return os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'inkscape-silhouette')
+
+
+class GeometryCache:
+    """Flattened paths of an element: lists of (N,2) point arrays."""
+    table = "paths"
+    columns = ("sizes BLOB", "points BLOB")
+
+    def __init__(self, path, max_bytes):
+        """Open or create the cache database at path, limited to max_bytes of data in this table."""
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.used = []          # keys of the hits, to refresh their time of use
+        self.added = {}         # key -> (column values..., nbytes), written on close()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=10)
+        self.db.execute("CREATE TABLE IF NOT EXISTS %s (key BLOB PRIMARY KEY, %s, nbytes INTEGER, used REAL)" % (
+            self.table, ", ".join(self.columns)))
+
+    @staticmethod
+    def key(*parts):
+        """A 16 byte hash of the repr() of parts."""
+        return hashlib.blake2b(repr((VERSION,) + parts).encode(), digest_size=16).digest()
+
+    def _get_row(self, key):
+        names = ", ".join(column.split()[0] for column in self.columns)
+        row = self.db.execute("SELECT %s FROM %s WHERE key=?" % (names, self.table), (key,)).fetchone()
+        if row is None:
+            row = self.added.get(key)
+            if row is None:
+                self.misses += 1
+                return None
+        self.hits += 1
+        self.used.append(key)
+        return row
+
+    def _put_row(self, key, *values):
+        self.added[key] = values + (sum(len(value) for value in values),)
+
+    def get(self, key):
+        """Return the list of (N,2) point arrays stored under key, or None."""
+        row = self._get_row(key)
+        if row is None:
+            return None
+        sizes = np.frombuffer(row[0], dtype=np.int64)
+        points = np.frombuffer(row[1], dtype=float).reshape(-1, 2)
+        return np.split(points, np.cumsum(sizes)[:-1]) if len(sizes) else []
+
+    def put(self, key, subpaths):
+        """Store a list of (N,2) point arrays under key."""
+        sizes = np.array([len(points) for points in subpaths], dtype=np.int64).tobytes()
+        points = np.concatenate(subpaths).astype(float).tobytes() if subpaths else b''
+        self._put_row(key, sizes, points)
+
+    def stats(self):
+        """Return the number of entries and their size in bytes."""
+        count, size = self.db.execute("SELECT COUNT(*), SUM(nbytes) FROM %s" % self.table).fetchone()
+        return count, size or 0
+
+    def close(self):
+        """Write the new entries, refresh the hits and evict the least recently
+           used entries above max_bytes. Returns the stats() after that.
+        """
+        now = time.time()
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO %s VALUES (?, %s?, ?)" % (self.table, "?, " * len(self.columns)),
+                                ((key,) + row + (now,) for key, row in self.added.items()))
+            self.db.executemany("UPDATE %s SET used=? WHERE key=?" % self.table, ((now, key) for key in self.used))
+            count, size = self.stats()
+            if size > self.max_bytes:
+                evict = []
+                for key, nbytes in self.db.execute("SELECT key, nbytes FROM %s ORDER BY used" % self.table):
+                    if size <= self.max_bytes:
+                        break
+                    evict.append((key,))
+                    size -= nbytes
+                self.db.executemany("DELETE FROM %s WHERE key=?" % self.table, evict)
+                self.evicted = len(evict)
+                count -= len(evict)
+        self.db.close()
+        self.added = {}
+        self.used = []
+        return count, size
+
+
+class JobCache(GeometryCache):
+    """Plot commands of a whole job: the command bytes, the bounding box and
+       the hardware they were made for.
+    """
+    table = "jobs"
+    columns = ("data BLOB", "bbox TEXT", "hardware TEXT")
+
+    @staticmethod
+    def paths_hash(paths):
+        """A 16 byte hash of a list of paths, each a list of (x, y) points."""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(np.array([len(path) for path in paths], dtype=np.int64).tobytes())
+        h.update(np.array([xy for path in paths for xy in path], dtype=float).tobytes())
+        return h.digest()
+
+    def get(self, key):
+        """Return (data, bbox, hardware) stored under key, or None."""
+        row = self._get_row(key)
+        if row is None:
+            return None
+        return bytes(row[0]), json.loads(row[1]), json.loads(row[2])
+
+    def put(self, key, data, bbox, hardware):
+        """Store the command bytes, with the bbox and hardware dicts, under key."""
+        self._put_row(key, bytes(data), json.dumps(bbox), json.dumps(hardware, sort_keys=True))
@@ -23,14 +23,20 @@
 # 2021-06-05  Allow commands to be transcribed to file, for later (re-)sending
 # 2025-06-30  Add Portrait4 and matching 8.5x12 cutting mat definition
 
+import bisect
+import itertools
+import math
 import os
 import re
 import socket
 import sys
 import time
 
+import numpy as np
+
 from silhouette.Transport import USBTransport, BluetoothTransport
 from silhouette.BLETransport import BLETransport
+from silhouette.beutil import BE_HALF, BE_SIZE, to_BE_batch
 
 usb_reset_needed = False  # https://github.com/fablabnbg/inkscape-silhouette/issues/10
 
@@ -205,12 +211,14 @@ SILHOUETTE_CAMEO4_TOOL_ERROR = 255
 
 DEVICE = [
  # CAUTION: keep in sync with sendto_silhouette.inx
+ # 'binary_draw': Silhouette Studio sends this model BEn binary relative draw commands, see Commands.md.
+ #                draw_commands='binary' is not verified on hardware yet.
  { 'vendor_id': VENDOR_ID_GRAPHTEC, 'product_id': PRODUCT_ID_SILHOUETTE_PORTRAIT, 'name': 'Silhouette_Portrait',
    'width_mm':  206, 'length_mm': 3000, 'regmark': True },
  { 'vendor_id': VENDOR_ID_GRAPHTEC, 'product_id': PRODUCT_ID_SILHOUETTE_PORTRAIT2, 'name': 'Silhouette_Portrait2',
    'width_mm':  203, 'length_mm': 3000, 'regmark': True },
  { 'vendor_id': VENDOR_ID_GRAPHTEC, 'product_id': PRODUCT_ID_SILHOUETTE_PORTRAIT3, 'name': 'Silhouette_Portrait3',
-   'width_mm':  203, 'length_mm': 18290, 'regmark': True },
+   'width_mm':  203, 'length_mm': 18290, 'regmark': True, 'binary_draw': True },
  { 'vendor_id': VENDOR_ID_GRAPHTEC, 'product_id': PRODUCT_ID_SILHOUETTE_PORTRAIT4, 'name': 'Silhouette_Portrait4',
    'width_mm':  216, 'length_mm': 18290, 'regmark': True },
  { 'vendor_id': VENDOR_ID_GRAPHTEC, 'product_id': PRODUCT_ID_SILHOUETTE_CAMEO_PRO_MK_II, 'name': 'Silhouette_Cameo_Pro_MK-II',
@@ -230,7 +238,7 @@ DEVICE = [
  { 'vendor_id': VENDOR_ID_GRAPHTEC, 'product_id': PRODUCT_ID_SILHOUETTE_CAMEO4, 'name': 'Silhouette_Cameo4',
    # margin_top_mm is just for safety when moving backwards with thin media
    # margin_left_mm is a physical limit, but is relative to width_mm!
-   'width_mm':  304.8, 'length_mm': 3000, 'margin_left_mm':0.0, 'margin_top_mm':0.0, 'regmark': True },
+   'width_mm':  304.8, 'length_mm': 3000, 'margin_left_mm':0.0, 'margin_top_mm':0.0, 'regmark': True, 'binary_draw': True },
 { 'vendor_id': VENDOR_ID_GRAPHTEC,
   'product_id': PRODUCT_ID_SILHOUETTE_CAMEO4PLUS,
   'name': 'Silhouette_Cameo4_Plus',
@@ -316,6 +324,13 @@ def _match_bluetooth_hardware(model_string):
   return None
 
 
+def _bbox_extend_batch(bb, x, y):
+    """_bbox_extend() with all points of the arrays x and y."""
+    if len(x):
+        _bbox_extend(bb, float(x.min()), float(y.min()))
+        _bbox_extend(bb, float(x.max()), float(y.max()))
+
+
 def _bbox_extend(bb, x, y):
     # The coordinate system origin is in the top lefthand corner.
     # Downwards and rightwards we count positive. Just like SVG or HPGL.
@@ -346,6 +361,10 @@ def _mm_2_SU(mm):
   """
   return int(round(mm * 20.0))
 
+def _mm_2_SU_batch(mm):
+  """_mm_2_SU() for an array of mm. Like round(), np.rint() rounds half to even."""
+  return np.rint(mm * 20.0).astype(np.int64)
+
 def _inch_2_SU(inch):
   """Convert inch to SU (SilhuetteUnit) using round
 
@@ -375,6 +394,62 @@ def delimit_commands(cmd_or_list):
   lst = cmd_or_list if isinstance(cmd_or_list, list) else [cmd_or_list]
   return b''.join(to_bytes(c) + CMD_ETX for c in lst)
 
+class CommandBuffer:
+  """
+     Commands, each terminated by ETX, appended into one bytearray. The offset
+     after each command is recorded as it is appended, so that safe_write() can
+     cut the data at command boundaries without searching it.
+  """
+  def __init__(self, cmds=()):
+    self.data = bytearray()
+    self.ends = []
+    self.extend(cmds)
+
+  @classmethod
+  def from_bytes(cls, data):
+    """ A buffer of already delimited commands, e.g. those of a job cache entry. """
+    buf = cls()
+    buf.data += data
+    ends = np.flatnonzero(np.frombuffer(buf.data, dtype=np.uint8) == CMD_ETX[0]) + 1
+    buf.ends = ends.tolist()
+    if len(buf.data) and (not buf.ends or buf.ends[-1] != len(buf.data)):
+      buf.ends.append(len(buf.data))    # an unterminated command at the end
+    return buf
+
+  def append(self, cmd):
+    self.data += to_bytes(cmd)
+    self.data += CMD_ETX
+    self.ends.append(len(self.data))
+
+  def extend(self, cmds):
+    data = self.data
+    ends = self.ends
+    for cmd in cmds:
+      data += cmd.encode() if isinstance(cmd, str) else cmd
+      data += CMD_ETX
+      ends.append(len(data))
+
+  def chunks(self, size):
+    """
+       Read only memoryview slices of the data, each of complete commands and at
+       most size bytes long. A single command longer than size is its own chunk.
+    """
+    view = memoryview(self.data).toreadonly()
+    start = 0
+    i = 0
+    while i < len(self.ends):
+      j = bisect.bisect_right(self.ends, start + size, i) - 1
+      if j < i: j = i
+      yield view[start:self.ends[j]]
+      start = self.ends[j]
+      i = j + 1
+
+  def __len__(self):
+    return len(self.data)
+
+  def __bytes__(self):
+    return bytes(self.data)
+
 
 
 class SilhouetteCameoTool:
@@ -416,6 +491,9 @@ class SilhouetteCameoTool:
       "FF%d,%d,%d" % (start, end, self.toolholder)]
 
 class SilhouetteCameo:
+  # the largest write of safe_write(); no single command may be longer
+  safe_chunk_size = 1024
+
   def __init__(self, log=sys.stderr, cmdfile=None, inc_queries=False,
                dry_run=False, progress_cb=None, force_hardware=None,
                bluetooth_addr=None, bluetooth_channel=None,
@@ -502,6 +580,7 @@ class SilhouetteCameo:
       self.leftaligned = True
     self.enable_sw_clipping = True
     self.clip_fuzz = 0.05
+    self.draw_commands = 'point'
 
   def _find_usb_device(self):
     """Probe the USB bus for a known Graphtec/Silhouette device.
@@ -727,7 +806,7 @@ Alternatively, you can add yourself to group 'lp' and logout/login.""" % (self.h
     """Send a command to the device. Long commands are sent in chunks of 4096 bytes.
        A nonblocking read() is attempted before write(), to find spurious diagnostics."""
 
-    data = to_bytes(data)
+    if not isinstance(data, memoryview): data = to_bytes(data)
 
     # Capture command to transcript if there is one:
     if self.commands and ((not is_query) or self.inc_queries):
@@ -736,7 +815,8 @@ Alternatively, you can add yourself to group 'lp' and logout/login.""" % (self.h
     # If there is no device, the only thing we might need to do is mock
     # a response:
     if self.transport is None:
-      if data in SilhouetteCameo.mock_responses:
+      # chunks of safe_write() are memoryviews, and never queries
+      if not isinstance(data, memoryview) and data in SilhouetteCameo.mock_responses:
         self.mock_response = SilhouetteCameo.mock_responses[data]
       return None
 
@@ -748,7 +828,7 @@ Alternatively, you can add yourself to group 'lp' and logout/login.""" % (self.h
     try:
       resp = self.read(timeout=10) # poll the inbound buffer
       if resp:
-        print("response before write('%s'): '%s'" % (data, resp), file=self.log)
+        print("response before write('%s'): '%s'" % (bytes(data), resp), file=self.log)
     except:
       pass
     endpoint = 0x01
@@ -830,28 +910,23 @@ Alternatively, you can add yourself to group 'lp' and logout/login.""" % (self.h
         Wrapper for write with special emphasis not overloading the cutter
         with long commands.
         Use this only for commands, not queries.
+        data is a CommandBuffer, or delimited commands as bytes.
     """
 
-    data = to_bytes(data)
+    if not isinstance(data, CommandBuffer):
+      data = CommandBuffer.from_bytes(to_bytes(data))
 
     # Silhouette Studio uses packet size of maximal 3k, 1k is default
-    safemaxchunksz = 1024
-    so = 0
-    while so < len(data):
-      safechunksz = min(safemaxchunksz, len(data)-so)
-      candidate = data[so:so+safechunksz]
-      # strip string candidate of unfinished command at its end
-      safechunk = candidate[0:(candidate.rfind(CMD_ETX) + 1)]
+    for safechunk in data.chunks(self.safe_chunk_size):
       self.write(data = safechunk, is_query = False)
       self.wait_for_ready(timeout=120, poll_interval=0.05)
-      so += len(safechunk)
 
   def send_command(self, cmd, is_query = False, timeout=10000):
     """ Sends a command or a list of commands """
     self.write(delimit_commands(cmd), is_query=is_query, timeout=timeout)
 
   def safe_send_command(self, cmd):
-    data = delimit_commands(cmd)
+    data = CommandBuffer(cmd if isinstance(cmd, list) else [cmd])
     if len(data) == 0: return
     self.safe_write(data)
 
@@ -1061,7 +1136,7 @@ Alternatively, you can add yourself to group 'lp' and logout/login.""" % (self.h
       right = _mm_2_SU(self.hardware['width_mm'] if 'width_mm' in self.hardware else mediawidth)
       self.set_boundary(0, 0, bottom, right)
 
-  def setup(self, media=132, speed=None, pressure=None, toolholder=None, pen=None, cuttingmat=None, sharpencorners=False, sharpencorners_start=0.1, sharpencorners_end=0.1, autoblade=False, depth=None, sw_clipping=True, clip_fuzz=0.05, trackenhancing=False, bladediameter=0.9, landscape=False, leftaligned=None, mediawidth=210.0, mediaheight=297.0, skip_init=False):
+  def setup(self, media=132, speed=None, pressure=None, toolholder=None, pen=None, cuttingmat=None, sharpencorners=False, sharpencorners_start=0.1, sharpencorners_end=0.1, autoblade=False, depth=None, sw_clipping=True, clip_fuzz=0.05, trackenhancing=False, bladediameter=0.9, landscape=False, leftaligned=None, mediawidth=210.0, mediaheight=297.0, skip_init=False, draw_commands='point'):
     """Setup the Silhouette Device
 
     Parameters
@@ -1107,6 +1182,13 @@ Alternatively, you can add yourself to group 'lp' and logout/login.""" % (self.h
             Defaults to 297.0.
         skip_init : bool, optional
             Defaults to False.
+        draw_commands : str, optional
+            'point': one absolute D command per point.
+            'polyline': multi-point absolute D commands, one per run of draws.
+            'relative': multi-point relative E commands, one per run of draws.
+            'binary': experimental, not verified on hardware. BEn binary relative
+            draw commands, on models with 'binary_draw'; others fall back to
+            'point'. Defaults to 'point'.
     """
 
 
@@ -1274,6 +1356,11 @@ Alternatively, you can add yourself to group 'lp' and logout/login.""" % (self.h
     self.enable_sw_clipping = sw_clipping
     self.clip_fuzz = clip_fuzz
 
+    if draw_commands == 'binary' and not self.hardware.get('binary_draw', False):
+      print("%s does not support binary draw commands, using D commands" % self.hardware.get('name', 'the device'), file=self.log)
+      draw_commands = 'point'
+    self.draw_commands = draw_commands
+
     # if enabled, rollers three times forward and back.
     # needs a pressure of 19 or more, else nothing will happen
     if trackenhancing is not None and not skip_init:
@@ -1345,6 +1432,66 @@ Alternatively, you can add yourself to group 'lp' and logout/login.""" % (self.h
     """ Dy,x """
     return "D%d,%d" % (_mm_2_SU(mmy), _mm_2_SU(mmx))
 
+  def run_cmds(self, letter, items):
+    """ letter followed by the comma separated items, e.g. Dya,xa,yb,xb,... for
+        the "y,x" items of a run of draws. The run is split into several commands,
+        if needed, so that each fits into one safe_write() chunk.
+    """
+    cmds = []
+    first = 0
+    size = len(letter) + 1          # with ETX
+    for i, item in enumerate(items):
+      if i > first and size + 1 + len(item) > self.safe_chunk_size:
+        cmds.append(letter + ",".join(items[first:i]))
+        first = i
+        size = len(letter) + 1
+      size += len(item) + (1 if i > first else 0)
+    if first < len(items):
+      cmds.append(letter + ",".join(items[first:]))
+    return cmds
+
+  def circle_cmds(self, cx, cy, r, p0, p1, pen=None):
+    """ My,x Wcy,cx,r,r,ta,tb: a whole circle in mm, starting near p0 and
+        going on towards p1, as the flattened circle does. The move is left
+        out if the pen is at the start already, as (y, x) in SU.
+        Returns the commands and the start of the circle, where it also ends.
+    """
+    # W takes the center as y,x like D; the angles go from the first axis to the second.
+    ta = int(round(math.degrees(math.atan2(p0[0] - cx, p0[1] - cy))))
+    cross = (p0[1] - cy) * (p1[0] - cx) - (p0[0] - cx) * (p1[1] - cy)
+    tb = ta + 360 if cross > 0 else ta - 360
+    # W takes whole degrees, so the circle starts up to r*pi/360 away from p0.
+    start = (_mm_2_SU(cy + r * math.cos(math.radians(ta))), _mm_2_SU(cx + r * math.sin(math.radians(ta))))
+    cmds = [] if pen == start else ["M%d,%d" % start]
+    cmds.append("W%d,%d,%d,%d,%d,%d" % (_mm_2_SU(cy), _mm_2_SU(cx), _mm_2_SU(r), _mm_2_SU(r), ta, tb))
+    return cmds, start
+
+  def split_native(self, plist, primitives):
+    """Split the paths of plist at the flattened circles in primitives, see plot().
+       Returns a list of (path, circle, shared) triples. circle is the (cx, cy, r)
+       in mm of a path that is a whole flattened circle, else None. shared is true
+       if the path starts at the last point of the one before.
+    """
+    result = []
+    for path in plist:
+      start = 0
+      i = 0
+      while i < len(path) - 1:
+        found = primitives.get((tuple(path[i]), tuple(path[i + 1])))
+        if found is not None:
+          points, circle = found
+          end = i + len(points)
+          if tuple(tuple(p) for p in path[i:end]) == points:
+            if i > start:
+              result.append((path[start:i + 1], None, start > 0))
+            result.append((path[i:end], circle, i > 0))
+            start = i = end - 1
+            continue
+        i += 1
+      if start == 0 or start < len(path) - 1:
+        result.append((path[start:], None, start > 0))
+    return result
+
   def upper_left_mm_cmd(self, mmy, mmx):
     r""" \y,x """
     return "\\%d,%d" % (_mm_2_SU(mmy), _mm_2_SU(mmx))
@@ -1396,12 +1543,32 @@ Alternatively, you can add yourself to group 'lp' and logout/login.""" % (self.h
     return x, y, inside
 
 
-  def plot_cmds(self, plist, bbox, x_off, y_off):
+  def clip_points(self, x, y, clip):
+    """
+        clip_point() for arrays of x and y, and the 'clip' element of bbox.
+        Returns the clipped x, clipped y, and an array of flags which are true
+        where no actual clipping took place. The clip count is not changed.
+    """
+    lo = clip['llx'] - x > self.clip_fuzz
+    x = np.where(lo, clip['llx'], x)
+    hi = x - clip['urx'] > self.clip_fuzz
+    x = np.where(hi, clip['urx'], x)
+    outside = lo | hi
+    lo = clip['ury'] - y > self.clip_fuzz
+    y = np.where(lo, clip['ury'], y)
+    hi = y - clip['lly'] > self.clip_fuzz
+    y = np.where(hi, clip['lly'], y)
+    outside |= lo | hi
+    return x, y, ~outside
+
+
+  def plot_cmds(self, plist, bbox, x_off, y_off, primitives=None):
     """
         bbox coordinates are in mm
         bbox *should* contain a proper { 'clip': {'llx': , 'lly': , 'urx': , 'ury': } }
         otherwise a hardcoded flip width is used to make the coordinate system left aligned.
         x_off, y_off are in mm, relative to the clip urx, ury.
+        primitives: see plot().
     """
 
     # Change by Alexander Senger:
@@ -1438,42 +1605,121 @@ Alternatively, you can add yourself to group 'lp' and logout/login.""" % (self.h
     if 'clip' in bbox and 'ury' in bbox['clip']:
       y_off += bbox['clip']['ury']
 
-    last_inside = True
-    plotcmds=[]
-    for path in plist:
-      if len(path) < 2: continue
-      x = path[0][0] + x_off
-      y = path[0][1] + y_off
-      _bbox_extend(bbox, x, y)
-      bbox['count'] += 1
-
-      x, y, last_inside = self.clip_point(x, y, bbox)
-
-      if bbox['only'] is False:
-        plotcmds.append(self.move_mm_cmd(y, x))
-
-      for j in range(1,len(path)):
-        x = path[j][0] + x_off
-        y = path[j][1] + y_off
-        _bbox_extend(bbox, x, y)
-        bbox['count'] += 1
-
-        x, y, inside = self.clip_point(x, y, bbox)
+    if self.draw_commands == 'binary': bbox['binary_saved'] = 0     # bytes saved against D commands
+    if primitives:
+      items = self.split_native(plist, primitives)
+      bbox['native'] = 0
+    else:
+      items = [(path, None, False) for path in plist]
 
-        if bbox['only'] is False:
-          if not self.enable_sw_clipping or (inside and last_inside):
-            plotcmds.append(self.draw_mm_cmd(y, x))
-          else:
-            # // if outside the range just move
-            plotcmds.append(self.move_mm_cmd(y, x))
-        last_inside = inside
+    # the paths between native circles are handled together by path_cmds()
+    plotcmds = []
+    paths = []
+    pen = None          # where the last circle left the pen, in SU
+    for path, circle, shared in items:
+      if len(path) < 2: continue
+      if shared: bbox['count'] -= 1     # counted with the path before
+      if circle is not None and bbox['only'] is False:
+        points = np.array(path, dtype=float) + (x_off, y_off)
+        # a clipped circle is cut flattened
+        if 'clip' not in bbox or self.clip_points(points[:, 0], points[:, 1], bbox['clip'])[2].all():
+          cmds, pen = self.path_cmds(paths, bbox, x_off, y_off, pen)
+          plotcmds += cmds
+          paths = []
+          _bbox_extend_batch(bbox, points[:, 0], points[:, 1])
+          bbox['count'] += len(points)
+          cmds, pen = self.circle_cmds(circle[0] + x_off, circle[1] + y_off, circle[2], points[0], points[1], pen)
+          plotcmds += cmds
+          bbox['native'] += 1
+          continue
+      paths.append(path)
+    plotcmds += self.path_cmds(paths, bbox, x_off, y_off, pen)[0]
     return plotcmds
 
+  def path_cmds(self, paths, bbox, x_off, y_off, pen=None):
+    """
+        The commands of plot_cmds() for paths of at least two points each. The
+        offset, bbox, clipping and conversion to SU are done on all points at
+        once; only the commands are formatted point by point.
+        The first move is left out if the pen is there already, as (y, x) in SU.
+        Returns the commands and the pen position after them.
+    """
+    if not paths:
+      return [], pen
+    sizes = np.array([len(path) for path in paths])
+    xy = np.array(list(itertools.chain.from_iterable(paths)), dtype=float).reshape(-1, 2)
+    x = xy[:, 0] + x_off
+    y = xy[:, 1] + y_off
+    _bbox_extend_batch(bbox, x, y)
+    bbox['count'] += len(xy)
+
+    if 'clip' in bbox:
+      if 'count' not in bbox['clip']:
+        bbox['clip']['count'] = 0
+      x, y, inside = self.clip_points(x, y, bbox['clip'])
+      bbox['clip']['count'] += int(np.count_nonzero(~inside))
+    if bbox['only'] is not False:
+      return [], None
+
+    # draw from the first point of a path on, move where the line leaves or enters the clip
+    draw = np.ones(len(xy), dtype=bool)
+    draw[np.cumsum(sizes) - sizes] = False
+    if self.enable_sw_clipping and 'clip' in bbox:
+      draw[1:] &= inside[1:] & inside[:-1]
+    sy = _mm_2_SU_batch(y)
+    sx = _mm_2_SU_batch(x)
+
+    # BEn and E commands draw relative to the point before, in SU. The deltas are
+    # taken between rounded positions, so that rounding errors do not add up.
+    if self.draw_commands in ('relative', 'binary'):
+      dy = np.diff(sy, prepend=0)
+      dx = np.diff(sx, prepend=0)
+
+    cmds = []
+    if self.draw_commands in ('polyline', 'relative'):
+      if self.draw_commands == 'relative':
+        letter, vy, vx = "E", dy, dx
+      else:
+        letter, vy, vx = "D", sy, sx
+      items = ["%d,%d" % v for v in zip(vy.tolist(), vx.tolist())]
+      moves = np.flatnonzero(~draw).tolist() + [len(draw)]
+      for m, end in zip(moves[:-1], moves[1:]):
+        cmds.append("M%d,%d" % (sy[m], sx[m]))
+        if end > m + 1:
+          cmds += self.run_cmds(letter, items[m + 1:end])
+    elif self.draw_commands == 'binary':
+      # BE3 takes deltas below 375482 SU, longer ones are sent as D
+      far = np.maximum(np.abs(dy), np.abs(dx)) >= BE_HALF[-1]
+      enc, digits = to_BE_batch(np.where(far, 0, dy), np.where(far, 0, dx))
+      enc[far] = 0
+      raw = digits.tobytes()
+      prefix = (None, b"BE1", b"BE2", b"BE3")
+      size = (0,) + tuple(BE_SIZE.tolist())
+      saved = 0
+      for i, (d, e, yy, xx) in enumerate(zip(draw.tolist(), enc.tolist(), sy.tolist(), sx.tolist())):
+        if not d:
+          cmds.append("M%d,%d" % (yy, xx))
+          continue
+        cmd = "D%d,%d" % (yy, xx)
+        if e and 3 + size[e] < len(cmd):
+          cmds.append(prefix[e] + raw[5 * i:5 * i + size[e]])
+          saved += len(cmd) - 3 - size[e]
+        else:
+          # long draws are shorter as D command
+          cmds.append(cmd)
+      bbox['binary_saved'] += saved
+    else:
+      cmds = [("D%d,%d" if d else "M%d,%d") % yx for d, yx in zip(draw.tolist(), zip(sy.tolist(), sx.tolist()))]
+    if pen == (sy[0], sx[0]):
+      del cmds[0]                       # the move to the first point, which starts each mode
+    return cmds, (int(sy[-1]), int(sx[-1]))
+
 
   def plot(self, mediawidth=210.0, mediaheight=297.0, margintop=None,
            marginleft=None, pathlist=None, offset=None, bboxonly=False,
            end_paper_offset=0, endposition='below', regmark=False, regsearch=False,
-           regwidth=180, reglength=230, regoriginx=15.0, regoriginy=20.0, quadregmarks=False, skip_init=False, skip_reset=False):
+           regwidth=180, reglength=230, regoriginx=15.0, regoriginy=20.0, quadregmarks=False, skip_init=False, skip_reset=False,
+           cached=None, primitives=None):
     """plot sends the pathlist to the device (real or dummy) and computes the
        bounding box of the pathlist, which is returned.
 
@@ -1497,6 +1743,14 @@ Alternatively, you can add yourself to group 'lp' and logout/login.""" % (self.h
                 'start': The media is returned to the position where the cut started.
        Example: The letter Y (20mm tall, 9mm wide) can be generated with
                 pathlist=[[(0,0),(4.5,10),(4.5,20)],[(9,0),(4.5,10)]]
+       cached: (data, bbox) of an earlier plot() of the same job with the same
+                arguments, as returned in 'data' and 'bbox'. The path commands in data
+                are sent as they are, pathlist is not used.
+       primitives: experimental. A dict of the flattened whole circles that may be
+                cut with a native W command: (first point, second point) ->
+                (tuple of all points, (cx, cy, r)), in mm like pathlist. Where these
+                points still appear in a path of pathlist, unclipped, they are cut
+                with W instead.
     """
     bbox = { }
     if margintop  is None and 'margin_top_mm'  in self.hardware: margintop  = self.hardware['margin_top_mm']
@@ -1610,22 +1864,42 @@ Alternatively, you can add yourself to group 'lp' and logout/login.""" % (self.h
         "FE0,0",
         "FF0,0,0"])
 
-    bbox['clip'] = {'urx':width, 'ury':top, 'llx':left, 'lly':height}
-    bbox['only'] = bboxonly
-    cmd_list = self.plot_cmds(pathlist,bbox,offset[0],offset[1])
+    if cached is None:
+      bbox['clip'] = {'urx':width, 'ury':top, 'llx':left, 'lly':height}
+      bbox['only'] = bboxonly
+      cmd_list = self.plot_cmds(pathlist,bbox,offset[0],offset[1],primitives)
+      if primitives and bboxonly is False:
+        # the same job with the circles flattened, for comparison
+        flat_bbox = {'clip': dict(bbox['clip'], count=0), 'only': False}
+        flat_size = len(CommandBuffer(self.plot_cmds(pathlist,flat_bbox,offset[0],offset[1])))
+        print("Native circles: %d W commands, %d bytes of plot commands, %d with the circles flattened" % (
+          bbox['native'], len(CommandBuffer(cmd_list)), flat_size), file=self.log)
+
+      if bboxonly == True:
+        # move the bounding box
+        cmd_list = [
+          self.move_mm_cmd(bbox['ury'], bbox['llx']),
+          self.draw_mm_cmd(bbox['ury'], bbox['urx']),
+          self.draw_mm_cmd(bbox['lly'], bbox['urx']),
+          self.draw_mm_cmd(bbox['lly'], bbox['llx']),
+          self.draw_mm_cmd(bbox['ury'], bbox['llx'])]
+      data = CommandBuffer(cmd_list)
+    else:
+      data, bbox = CommandBuffer.from_bytes(cached[0]), dict(cached[1])
     print("Final bounding box and point counts: " + str(bbox), file=self.log)
 
-    if bboxonly == True:
-      # move the bounding box
-      cmd_list = [
-        self.move_mm_cmd(bbox['ury'], bbox['llx']),
-        self.draw_mm_cmd(bbox['ury'], bbox['urx']),
-        self.draw_mm_cmd(bbox['lly'], bbox['urx']),
-        self.draw_mm_cmd(bbox['lly'], bbox['llx']),
-        self.draw_mm_cmd(bbox['ury'], bbox['llx'])]
-
     # potentially long command string needs extra care
-    self.safe_send_command(cmd_list)
+    if len(data):
+      start = time.time()
+      self.safe_write(data)
+      elapsed = time.time() - start
+      msg = "Plot commands: %d bytes sent in %.2fs" % (len(data), elapsed)
+      if 'binary_saved' in bbox:
+        # the same job with one D command per draw, for comparison
+        ascii_bytes = len(data) + bbox['binary_saved']
+        msg += ", %d bytes as D commands (%.0f%%), about %.2fs" % (
+          ascii_bytes, 100. * len(data) / ascii_bytes, elapsed * ascii_bytes / len(data))
+      print(msg, file=self.log)
 
     # Silhouette Cameo2 does not start new job if not properly parked on left side
     # Attention: This needs the media to not extend beyond the left stop
@@ -1655,7 +1929,8 @@ Alternatively, you can add yourself to group 'lp' and logout/login.""" % (self.h
     return {
         'bbox': bbox,
         'unit' : 1,
-        'trailer': new_home
+        'trailer': new_home,
+        'data': data.data
       }
 
 
@@ -31,10 +31,15 @@
 #                          ccw() and sharp_turn*() now global. No class needed.
 #                          Using class Barrier from Geomentry in the main loop of pyramids_barrier()
 
+import concurrent.futures
 import copy     # deepcopy
+import itertools
 import math     # sqrt
+import operator
 import sys      # maxsize
 
+import numpy as np
+
 from silhouette.Geometry import *
 
 
@@ -71,6 +76,16 @@ presets = {
 }
 
 
+def split_at(flat, ends):
+  """Cut the list flat into consecutive pieces, that end at the given offsets."""
+  pieces = []
+  start = 0
+  for end in ends.tolist():
+    pieces.append(flat[start:end])
+    start = end
+  return pieces
+
+
 class MatFree:
   def __init__(self, preset="default", scale=1.0, pen=None):
     """This initializer defines settings for the apply() method.
@@ -86,10 +101,14 @@ class MatFree:
     self.overshoot = 0.0
     self.min_subdivide = 0.5            # may subdivide. if needed.
     self.min_segmentlen = 0.1           # drop segments shorter than this.
+    self.dedup_epsilon = 0.05           # points in the same cell of this grid are one point. 0: exact match only.
     self.monotone_back_travel = 3.0     # used in both, simple_barrier() and pyramids_barrier()
     self.sharp_turn_fwd_ratio = 0.99    # 0.5 == 63 deg, 1.0 == 45 deg
     self.input_scale = scale
     self.pyramids_algorithm = False
+    self.processes = None               # apply() runs independent y-bands on a process pool, if > 1
+    self.bands = 1                      # the number of y-bands of the last apply()
+    self.tracer = None                  # receives the trace() messages, instead of stderr.
 
     self.preset(preset)
 
@@ -102,10 +121,23 @@ class MatFree:
     if self.min_segmentlen < 0.001: self.min_segmentlen = 0.001
 
     self.points = []
-    self.points_dict = {}
+    self.points_dict = XY_Hash(self.dedup_epsilon)
     self.paths = []
 
 
+  def trace(self, *args):
+    """Emit one line of debug output, like print(*args, file=sys.stderr) would.
+       If self.tracer is set, it is called with the line instead.
+       Callers check self.verbose before calling, so that arguments are not even
+       formatted when tracing is off: there are trace points in the inner loops.
+    """
+    line = " ".join(str(a) for a in args)
+    if self.tracer is not None:
+      self.tracer(line)
+    else:
+      print(line, file=sys.stderr)
+
+
   def list_presets(self):
     return copy.deepcopy(presets)
 
@@ -139,22 +171,40 @@ class MatFree:
        is at a different locations. All points also have attributes
        stored with in the point object itself. Points that appear for the second
        time receive an attribute 'dup':1, which is incremented on further reoccurences.
+       Locations are quantized to a grid of dedup_epsilon, a point in the
+       same grid cell as a known point counts as a reoccurence.
     """
 
-    k = str(x)+','+str(y)
-    if k in self.points_dict:
-      idx = self.points_dict[k]
+    n = len(self.points)
+    idx = self.points_dict.setdefault(x, y, n)
+    if idx < n:
       if self.verbose:
-        print("%d found as dup" % idx, file=sys.stderr)
-      if 'dup' in self.points[idx].attr:
-        self.points[idx].dup += 1
-      else:
-        self.points[idx].dup = 1
+        self.trace("%d found as dup" % idx)
+      self.points[idx].dup += 1
     else:
-      idx = len(self.points)
-      self.points.append(XY_a((x,y)))
-      self.points_dict[k] = idx
-      self.points[idx].id = idx
+      pt = XY_s((x,y))
+      pt.id = idx
+      self.points.append(pt)
+    return idx
+
+
+  def pts2idx(self, xy):
+    """pt2idx() for all rows of the (N,2) array xy at once.
+       Returns the point indices as an int array.
+    """
+    n = len(self.points)
+    idx = self.points_dict.setdefault_many(xy, n)
+    if self.verbose:
+      for i in idx[idx < np.maximum.accumulate(np.append(n, idx+1))[:-1]].tolist():
+        self.trace("%d found as dup" % i)
+    count = np.bincount(idx, minlength=n)
+    new = np.flatnonzero(idx >= n)
+    new = new[np.unique(idx[new], return_index=True)[1]]      # the rows that made new points
+    self.points.extend(map(XY_s, zip(xy[new,0].tolist(), xy[new,1].tolist()), range(n, n+len(new))))
+    count[n:] -= 1
+    dup = np.flatnonzero(count)
+    for i, c in zip(dup.tolist(), count[dup].tolist()):
+      self.points[i].dup += c
     return idx
 
 
@@ -165,71 +215,115 @@ class MatFree:
        element to the tuple. Typical attributes to be added by other methods
        id, seg[] by method link_points(), sharp by method mark_sharp_segs(),
        ...
+       All nodes are deduplicated in one batch by pts2idx().
     """
 
-    for path in cut:
-      new_path = []
-      for point in path:
-        idx = self.pt2idx(self.input_scale * point[0], self.input_scale * point[1])
+    lengths = np.array([len(path) for path in cut], dtype=np.int64)
+    xy = np.array([(point[0], point[1]) for path in cut for point in path], dtype=float).reshape(-1, 2)
+    idx = self.pts2idx(self.input_scale * xy)
+
+    keep = np.ones(len(idx), dtype=bool)
+    if self.do_dedup != False:
+      # weed out repeated points
+      keep[1:] = idx[1:] != idx[:-1]
+      keep[(np.cumsum(lengths) - lengths)[lengths > 0]] = True      # first of each path
+    kept = np.concatenate(([0], np.cumsum(keep)))
+    self.paths.extend(split_at(idx[keep].tolist(), kept[np.cumsum(lengths)]))
 
-        if len(new_path) == 0 or new_path[-1] != idx or self.do_dedup == False:
-          # weed out repeated points
-          new_path.append(idx)
-          # self.points[idx].refcount += 1
-      self.paths.append(new_path)
+
+  def segment_ends(s):
+    """Return two index arrays A, B of all segments [AB] in s.paths, in path order.
+       Also returns the concatenated paths, the start and the length of each path,
+       and a mask of the path elements that end a segment.
+    """
+    lengths = np.array([len(path) for path in s.paths], dtype=np.int64)
+    flat = np.fromiter(itertools.chain.from_iterable(s.paths), dtype=np.int64, count=int(lengths.sum()))
+    starts = np.cumsum(lengths) - lengths
+    inner = np.ones(len(flat), dtype=bool)
+    inner[starts[lengths > 0]] = False          # no segment towards the first point of a path
+    B = np.flatnonzero(inner)
+    return flat[B-1], flat[B], flat, starts, lengths, inner
+
+
+  def points_xy(s):
+    """The coordinates of s.points as an (N,2) array."""
+    n = len(s.points)
+    xy = np.empty((n, 2))
+    xy[:,0] = np.fromiter(map(operator.attrgetter('x'), s.points), dtype=float, count=n)
+    xy[:,1] = np.fromiter(map(operator.attrgetter('y'), s.points), dtype=float, count=n)
+    return xy
 
 
   def link_points(s):
     """add segments (back and forth) between connected points.
+       The adjacency is built as CSR arrays (indptr, indices) with numpy,
+       then handed out as the per point seg lists that the barrier code uses.
     """
-    for path in s.paths:
-      A = None
-      for pt in path:
-        if A is not None:
-          if 'seg' in s.points[A].attr:
-            s.points[A].seg.append(pt)
-          else:
-            s.points[A].seg = [ pt ]
-
-          if 'seg' in s.points[pt].attr:
-            s.points[pt].seg.append(A)
-          else:
-            s.points[pt].seg = [ A ]
-        A = pt
+    A, B = s.segment_ends()[:2]
+    n = len(s.points)
+    src = np.empty(2*len(A), dtype=np.int64)
+    dst = np.empty(2*len(A), dtype=np.int64)
+    src[0::2] = A
+    src[1::2] = B
+    dst[0::2] = B
+    dst[1::2] = A
+    indices = dst[np.argsort(src, kind='stable')].tolist()
+    indptr = np.zeros(n+1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    indptr = indptr.tolist()
+    for pt, a, b in zip(s.points, indptr, indptr[1:]):
+      if a == b:
+        continue
+      if pt.seg is not None:
+        pt.seg.extend(indices[a:b])
+      else:
+        pt.seg = indices[a:b]
 
 
   def subdivide_segments(s, maxlen):
     """Insert addtional points along the paths, so that
        no segment is longer than maxlen
+       The lengths and the new points of all segments are computed at once.
     """
     if s.do_subdivide == False:
       return
     maxlen_sq = maxlen * maxlen
-    for path_idx in range(len(s.paths)):
-      path = s.paths[path_idx]
-      new_path = []
-      for pt in path:
-        if len(new_path):
-          A = new_path[-1]
-          dist_a_pt_sq = dist_sq(s.points[A], s.points[pt])
-          if dist_a_pt_sq > maxlen_sq:
-            dist = math.sqrt(dist_a_pt_sq)
-            nsub = int(dist/maxlen)
-            seg_len = dist/float(nsub+1)
-            dx = (s.points[pt].x - s.points[A].x)/float(nsub+1)
-            dy = (s.points[pt].y - s.points[A].y)/float(nsub+1)
-            if s.verbose > 1:
-              print("pt%d -- pt%d: need nsub=%d, seg_len=%g" % (A,pt,nsub,seg_len), file=sys.stderr)
-              print("dxdy", dx, dy, "to", (s.points[pt].x, s.points[pt].y), "from", (s.points[A].x,s.points[A].y), file=sys.stderr)
-            for subdiv in range(nsub):
-              sub_pt =s.pt2idx(s.points[A].x+dx+subdiv*dx,
-                               s.points[A].y+dy+subdiv*dy)
-              new_path.append(sub_pt)
-              s.points[sub_pt].sub = True
-              if s.verbose > 1:
-                print("   sub", (s.points[sub_pt].x, s.points[sub_pt].y), file=sys.stderr)
-        new_path.append(pt)
-      s.paths[path_idx] = new_path
+    A, B, flat, starts, lengths, inner = s.segment_ends()
+    xy = s.points_xy()
+    dist_a_pt_sq = dist_sq_batch(xy[A], xy[B])
+    long_seg = np.flatnonzero(dist_a_pt_sq > maxlen_sq)
+    if not len(long_seg):
+      return
+    dist = np.sqrt(dist_a_pt_sq[long_seg])
+    nsub = (dist/maxlen).astype(np.int64)
+    dxy = (xy[B[long_seg]] - xy[A[long_seg]]) / (nsub+1)[:,None]
+    if s.verbose > 1:
+      for a, pt, ns, sl, d in zip(A[long_seg].tolist(), B[long_seg].tolist(), nsub.tolist(),
+                                  (dist/(nsub+1)).tolist(), dxy.tolist()):
+        s.trace("pt%d -- pt%d: need nsub=%d, seg_len=%g" % (a,pt,ns,sl))
+        s.trace("dxdy", d[0], d[1], "to", (s.points[pt].x, s.points[pt].y), "from", (s.points[a].x,s.points[a].y))
+
+    # sub point subdiv of a segment is at A+dxy+subdiv*dxy, just like one by one.
+    rep = np.repeat(np.arange(len(long_seg)), nsub)
+    subdiv = np.arange(len(rep)) - np.repeat(np.cumsum(nsub) - nsub, nsub)
+    sub_xy = xy[A[long_seg]][rep] + dxy[rep] + subdiv[:,None] * dxy[rep]
+    sub_idx = s.pts2idx(sub_xy)
+    for i in np.unique(sub_idx).tolist():
+      s.points[i].sub = True
+    if s.verbose > 1:
+      for i in sub_idx.tolist():
+        s.trace("   sub", (s.points[i].x, s.points[i].y))
+
+    # the sub points go in front of the end point B of their segment.
+    before = np.zeros(len(flat), dtype=np.int64)
+    before[np.flatnonzero(inner)[long_seg]] = nsub
+    pos = np.arange(len(flat)) + np.cumsum(before)
+    new_flat = np.empty(len(flat) + len(sub_idx), dtype=np.int64)
+    new_flat[pos] = flat
+    at_b = np.repeat(pos[np.flatnonzero(inner)[long_seg]], nsub)
+    new_flat[at_b - np.repeat(nsub, nsub) + subdiv] = sub_idx
+    total = np.concatenate(([0], np.cumsum(1 + before)))
+    s.paths = split_at(new_flat.tolist(), total[starts + lengths])
 
 
   def mark_sharp_segs(s):
@@ -243,15 +337,21 @@ class MatFree:
        TODO: can honor corner_detect_min_jump? Even if so, what should we do in the case
        where multiple points are so close together that the paper is likely to tear?
     """
+    ## collect all (A, pt, B) triples first, and test them in one batch.
+    ## The coordinates are array backed, indexed by point id.
+    ia = []
+    ib = []
+    ic = []
     for pt in s.points:
-      if 'sharp' in pt.attr:
+      if pt.sharp:
         ## shortcut existing flags. One sharp turn per point is enough to make us careful.
         ## we don't want to track which pair of turns actually is a sharp turn, if there
         ## are more than two segments per point. Those cases are rare enough
         ## to handle them inefficiently.
         continue
-      if 'seg' in pt.attr:
-        ll = len(pt.seg)
+      if pt.seg is not None:
+        seg = pt.seg
+        ll = len(seg)
         # if ll > 4:
         #   ## You cannot attach 5 lines to a point without creating one sharp angle.
         #   ## This is true for sharp turn defined as >90 degree.
@@ -259,15 +359,23 @@ class MatFree:
         #   continue
         ## look at each pair of segments once, check their angle.
         for l1 in range(ll):
-          A = s.points[pt.seg[l1]]
           for l2 in range(l1+1, ll):
-            B = s.points[pt.seg[l2]]
-            if sharp_turn(A,pt,B, s.sharp_turn_fwd_ratio):
-              pt.sharp = True
-          if 'sharp' in pt.attr:
-            break
-      else:
-        print("warning: no segments in point %d. Run link_points() before mark_sharp_segs()" % (pt.id), file=sys.stderr)
+            ia.append(seg[l1])
+            ib.append(pt.id)
+            ic.append(seg[l2])
+      elif s.verbose:
+        s.trace("warning: no segments in point %d. Run link_points() before mark_sharp_segs()" % (pt.id))
+
+    if not ib:
+      return
+    n = len(s.points)
+    xy = np.empty((n, 2))
+    xy[:,0] = np.fromiter((pt.x for pt in s.points), dtype=float, count=n)
+    xy[:,1] = np.fromiter((pt.y for pt in s.points), dtype=float, count=n)
+    ib = np.array(ib)
+    sharp = sharp_turn_batch(xy[ia], xy[ib], xy[ic], s.sharp_turn_fwd_ratio)
+    for i in np.unique(ib[sharp]).tolist():
+      s.points[i].sharp = True
 
 
 
@@ -322,7 +430,7 @@ class MatFree:
     """
     if not 'output' in s.__dict__: s.output = []
     if len(s.output) and s.verbose > 1:
-      print("append_or_extend_hard...", s.output[-1][-1], seg, file=sys.stderr)
+      s.trace("append_or_extend_hard...", s.output[-1][-1], seg)
     if (len(s.output) > 0 and len(s.output[-1]) >= 2 and
          'sharp' not in s.output[-1][0] and
          'sharp' not in s.output[-1][-1]):
@@ -332,29 +440,29 @@ class MatFree:
         # yes, flipping the previous segment, will help below. do it.
         s.output[-1] = list(reversed(s.output[-1]))
         if s.verbose:
-          print("late flip ", len(s.output), len(s.output[-1]), file=sys.stderr)
+          s.trace("late flip ", len(s.output), len(s.output[-1]))
       #
     #
 
     if len(s.output) > 0 and s.output[-1][-1].id == seg[0].id:
       s.output[-1].extend(seg[1:])
       if s.verbose > 1:
-        print("... extend", file=sys.stderr)
+        s.trace("... extend")
     elif len(s.output) > 0 and s.output[-1][-1].id == seg[-1].id:
       ## check if we can turn it around
-      if 'sharp' not in s.output[-1][-1].attr and 'sharp' not in seg[-1].attr and 'sharp' not in seg[0].attr:
+      if not s.output[-1][-1].sharp and not seg[-1].sharp and not seg[0].sharp:
         s.output[-1].extend(list(reversed(seg))[1:])
         if s.verbose > 1:
-          print("... extend reveresed", file=sys.stderr)
+          s.trace("... extend reveresed")
       else:
         s.output.append(seg)
         if s.verbose > 1:
-          print("... append", file=sys.stderr)
+          s.trace("... append")
       #
     else:
       s.output.append(seg)
       if s.verbose > 1:
-        print("... append", file=sys.stderr)
+        s.trace("... append")
     #
 
 
@@ -366,16 +474,16 @@ class MatFree:
     """
     if not 'output' in s.__dict__: s.output = []
     if len(s.output) and s.verbose > 2:
-      print("append_or_extend_simple...", s.output[-1][-1], seg, file=sys.stderr)
+      s.trace("append_or_extend_simple...", s.output[-1][-1], seg)
 
     if len(s.output) > 0 and s.output[-1][-1].id == seg[0].id:
       s.output[-1].extend(seg[1:])
       if s.verbose > 1:
-        print("... extend", file=sys.stderr)
+        s.trace("... extend")
     else:
       s.output.append(seg)
       if s.verbose > 1:
-        print("... append", file=sys.stderr)
+        s.trace("... append")
     #
 
 
@@ -406,14 +514,13 @@ class MatFree:
     # CAUTION: is this really helpful?:
     ## it prevents points from a slice to go into process_simple_barrier()'s segment list,
     ## but it also hides information....
+    ## Points added by subdivide_segment() are not in points_dict, or share a cell there.
     if not a_seg_todo:
       s.points[iA] = None
-      k = str(A.x)+','+str(A.y)
-      del(s.points_dict[k])
+      s.points_dict.discard(A.x, A.y, iA)
     if not b_seg_todo:
       s.points[iB] = None
-      k = str(B.x)+','+str(B.y)
-      del(s.points_dict[k])
+      s.points_dict.discard(B.x, B.y, iB)
 
 
 
@@ -451,9 +558,10 @@ class MatFree:
     C.seg[c_a_seg_idx] = -A.id or -sys.maxsize
     C.seg[c_b_seg_idx] = -B.id or -sys.maxsize
     if len(C.seg) == 2:
-      C.attr['obsolete'] = True
+      C.obsolete = True
       self.points[C.id] = None
-      print("shortcut_segment: point C obsoleted. A,B,C:", A, B, C, C.att(), file=sys.stderr)
+      if self.verbose > 2:
+        self.trace("shortcut_segment: point C obsoleted. A,B,C:", A, B, C, C.att())
 
 
   def subdivide_segment(self, A, B, C):
@@ -463,11 +571,12 @@ class MatFree:
         Returns True, if subdivision was done.
         Returns False, if [AB] was shorter than min_subdivide.
     """
-    print("subdivide_segment A,B,C: ", A,A.att(), B,B.att(), C,C.att(), file=sys.stderr)
+    if self.verbose > 2:
+      self.trace("subdivide_segment A,B,C: ", A,A.att(), B,B.att(), C,C.att())
     if dist_sq(A, B) < self.min_subdivide_sq:
-      print(" ---- too short, nothing done.", file=sys.stderr)
-      # should be caught earlier!
-      sys.exit(0)
+      if self.verbose > 2:
+        self.trace(" ---- too short, nothing done.")
+      return False
 
     a_seg_idx = None
     for n in range(0,len(A.seg)):
@@ -507,15 +616,8 @@ class MatFree:
        * recombine segments into paths.
     """
     if not 'output' in s.__dict__: s.output = []
-    if s.verbose >= 1:
-      if len(s.output):
-        print("output_add", s.output[-1][-1], A, B, file=sys.stderr)
-      else:
-        print("output_add", None, A, B, file=sys.stderr)
-    #
-    print("\t....................................", file=sys.stderr)
-    if len(s.output) > 30:
-      sys.exit(2)
+    if s.verbose > 1:
+      s.trace("output_add", s.output[-1][-1] if len(s.output) else None, A, B)
 
     if cut:
       s.output.append([A,B])
@@ -633,6 +735,9 @@ class MatFree:
     if not left2right:                                        # forward:   \ moving <-
       Xf_bar,Xb_bar = Xb_bar,Xf_bar                           # backwards: / moving ->
 
+    # a D or F sitting on A would cut off nothing, but subdivide [AB] over and over.
+    min_cut_sq = s.min_segmentlen * s.min_segmentlen
+
     A = Xf_bar.point()
     while True:
       if A is None:
@@ -640,7 +745,8 @@ class MatFree:
         if Ai is None: break
         A = Xf_bar.point()
         continue
-      print("process_pyramids_barrier", left2right, A, A.att(), file=sys.stderr)
+      if s.verbose > 1:
+        s.trace("process_pyramids_barrier", left2right, A, A.att())
 
       B = None
       a_todo = 0
@@ -662,48 +768,41 @@ class MatFree:
                 B = pt
 
       if B is None:
-        print("no more forward segments", A, a_todo)
+        if s.verbose > 2:
+          s.trace("no more forward segments", A, a_todo)
         Xb_bar.find(A, start=0)
         if a_todo == 0:
           s.points[A.id] = None                 # drop A
         while True:
           Ai = Xf_bar.next()
           A = None
-          print("xx next Ai candidate", Ai, file=sys.stderr)
           if Ai is None: break
           A = Xf_bar.point()
-          print("xx next A candidate", A, file=sys.stderr)
           if A is None: break
           if not Xb_bar.ahead(A):
             break
-          else:
-            print("process_pyramids_barrier jump: Ignored A, ahead of Xb_bar", A, file=sys.stderr)
-        print("process_pyramids_barrier jump to next A", A, file=sys.stderr)
+          elif s.verbose > 2:
+            s.trace("process_pyramids_barrier jump: Ignored A, ahead of Xb_bar", A)
+        if s.verbose > 2:
+          s.trace("process_pyramids_barrier jump to next A", A)
         continue                                # just advance Xf_bar: jump
-      print("segment to check a), b)", A, B)
-
-      if False:                                  # fake to trigger check a)
-        b_id = B.id
-        B = XY_a((1.3,20-2.1))
-        B.id = b_id
-        B.seg = [1,2,A.id,3,4]
-        print("faked segment to check a), b)", A, B)
-      #
+      if s.verbose > 2:
+        s.trace("segment to check a), b)", A, B)
 
       subdividable_ab = bool(dist_sq(A,B) > s.min_subdivide_sq)
 
       C = None
       E = None
       if subdividable_ab and B.y > max_y:        # check a)
-        C = XY_a((intersect_y(A,B, max_y), max_y))
+        C = XY_s((intersect_y(A,B, max_y), max_y))
         ## same, but more expensive:
         # C2 = intersect_lines(A,B,XY_a((0,max_y)),XY_a((.5,max_y)))
-        print("B below barrier, C=", C)
+        if s.verbose > 2:
+          s.trace("B below barrier, C=", C)
         s.subdivide_segment(A,B,C)
         Xf_bar.insert(C)
         Xb_bar.insert(C)
         B,C = C,B
-        # print(A.seg, B.seg, C.seg)
       #
 
       # All of the following shortens [AB] sufficiently, so that B does not
@@ -716,21 +815,28 @@ class MatFree:
           (left2right and B.x-A.x < B.y-A.y) or (not left2right and A.x-B.x < B.y-A.y))):
         Xb_a_idx = Xb_bar.find(A, start=0)      # could also use lookup() here. It does not matter.
         Xb_b_idx = Xb_bar.find(B)               # could also use lookup() here. It does not matter.
-        print("check b), moving Xb_bar from A to B", A, B, Xb_a_idx, Xb_b_idx, Xb_bar.key(A), Xb_bar.key(B))
+        if s.verbose > 2:
+          s.trace("check b), moving Xb_bar from A to B", A, B, Xb_a_idx, Xb_b_idx, Xb_bar.key(A), Xb_bar.key(B))
         D = None
         for n in range(Xb_a_idx, Xb_b_idx+1):   # sweep from A to B
           pt = Xb_bar.point(n)
-          if pt.id != A.id and pt.id != B.id and ccw(A,B,pt) == True:
-            D = pt                              # found a D that is clearly left of AB.
+          if pt.id != A.id and pt.id != B.id and ccw(A,B,pt) == left2right:
+            D = pt                              # found a D that is clearly behind AB.
             break
-          else:
-            print("backsweep ignoring pt", pt, Xb_bar.key(pt))
         #
         if D is not None:                       # compute intersection of Xb_bar with [AB]
-          E = intersect_lines(D,XY_a((D.x+1,D.y+1)),A,B,limit2=True)
-          if E is None: raise ValueError("finding a shadowed D failed:", A, B, D)
-          E = XY_a(E)
-          s.subdivide_segment(A,B,E)
+          _D_back = (D.x+1,D.y+1) if left2right else (D.x-1,D.y+1)
+          E = intersect_lines(D,XY_a(_D_back),A,B,limit2=True)
+          if E is None:
+            if s.verbose:
+              s.trace("finding a shadowed D failed:", A, B, D)
+          elif dist_sq(A,XY_a(E)) < min_cut_sq:
+            E = None
+          else:
+            E = XY_s(E)
+            if not s.subdivide_segment(A,B,E):  # [AB] was shortened by a), keep it.
+              E = None
+        if E is not None:
           Xf_bar.insert(E)
           Xb_bar.insert(E)
           if C is not None:
@@ -740,11 +846,13 @@ class MatFree:
 
       # tentatively advance Xf_bar from A to B
       Xf_a_idx = Xf_bar.pos()                   # unused, we never move back to A.
-      Xf_b_idx = Xf_bar.lookup(lambda b: b.id==B.id if b else False)
+      Xf_b_idx = Xf_bar.index(B)
       if Xf_b_idx is None:                      # Should never happen!
-        print("Xf_bar.lookup(B)=None. B=",B)    # Okayish fallback, but find() may return
-        Xf_b_idx = Xf_bar.find(B)               # a different point with the same key().
-      print("line A,B:", A, B, Xf_a_idx, Xf_b_idx, Xf_bar.point(Xf_b_idx))
+        if s.verbose:                           # Okayish fallback, but find() may return
+          s.trace("Xf_bar.index(B)=None. B=",B) # a different point with the same key().
+        Xf_b_idx = Xf_bar.find(B)
+      if s.verbose > 2:
+        s.trace("line A,B:", A, B, Xf_a_idx, Xf_b_idx, Xf_bar.point(Xf_b_idx))
       F = None
       Xf_f_idx = None
       for n in range(Xf_a_idx, Xf_b_idx+1):     # sweep from A to B (inclusive)
@@ -754,15 +862,21 @@ class MatFree:
           F = pt                                # found an F that is clearly right of AB.
           Xf_f_idx = n
           break
-        else:
-          print("forward sweep ignoring pt", n, pt, pt.id, Xf_bar.key(pt))
       #
       if F is not None:                       # compute intersection of Xb_bar with [AB]
         _F_back = (F.x-1,F.y+1) if left2right else (F.x+1,F.y+1)
         G = intersect_lines(F,XY_a(_F_back),A,B,limit2=True)
-        if G is None: raise ValueError("finding a shadowed G failed:", A, B, F, _F_back)
-        G = XY_a(G)
-        s.subdivide_segment(A,B,G)
+        if G is None:
+          if s.verbose:
+            s.trace("finding a shadowed G failed:", A, B, F, _F_back)
+          F = None
+        elif dist_sq(A,XY_a(G)) < min_cut_sq:
+          F = None
+        else:
+          G = XY_s(G)
+          if not s.subdivide_segment(A,B,G):    # [AB] was shortened by a) or b), cut it all.
+            F = None
+      if F is not None:
         Xf_bar.insert(G)
         Xb_bar.insert(G)
         if E is not None:
@@ -778,10 +892,12 @@ class MatFree:
         s.unlink_segment(A,B)
         Xf_bar.pos(Xf_b_idx)                  # advance
         A = Xf_bar.point()
-      print("advanced A to", A, file=sys.stderr)
+      if s.verbose > 2:
+        s.trace("advanced A to", A)
 
     ##  barrier has moved all the way to the other end.
-    print("barrier moved all the way", Xf_bar.points, max_y, A.att() if A else None, A.seg if A else None, file=sys.stderr)
+    if s.verbose > 2:
+      s.trace("barrier moved all the way", max_y)
 
 
   def process_simple_barrier(s, y_slice, max_y, last_x=0.0):
@@ -798,8 +914,8 @@ class MatFree:
        with its value on the next call.
     """
     if s.verbose:
-      print("process_simple_barrier limit=%g, points=%d, %s" % (max_y, len(y_slice), last_x), file=sys.stderr)
-      print("                max_y=%g" % (y_slice[-1].y), file=sys.stderr)
+      s.trace("process_simple_barrier limit=%g, points=%d, %s" % (max_y, len(y_slice), last_x))
+      s.trace("                max_y=%g" % (y_slice[-1].y))
 
     min_x = None
     max_x = None
@@ -808,7 +924,7 @@ class MatFree:
     for pt in y_slice:
       if pt is None:            # all segments to that point are done.
         continue
-      if not 'seg' in pt.attr:  # shit happens
+      if pt.seg is None:        # shit happens
         continue
       for iC in pt.seg:
         if iC < 0:              # this segment is done.
@@ -816,7 +932,7 @@ class MatFree:
         C = s.points[iC]
         if C is not None and C.y <= max_y:
           if s.verbose > 1:
-            print("   segments.append", C, pt, file=sys.stderr)
+            s.trace("   segments.append", C, pt)
           segments.append((C,pt))
           if min_x is None or min_x >  C.x: min_x =  C.x
           if min_x is None or min_x > pt.x: min_x = pt.x
@@ -827,6 +943,9 @@ class MatFree:
       #
     #
 
+    if not segments:            # nothing below max_y, that is still to do.
+      return last_x
+
     left2right = s.decide_left2right(min_x, max_x, last_x)
     xsign = -1.0
     if left2right: xsign = 1.0
@@ -843,8 +962,8 @@ class MatFree:
       ##   midpoint to each end, in the order indicated by decide_left2right().
       A = segment[0]
       B = segment[1]
-      if 'sharp' in A.attr and 'seen' in A.attr:
-        if 'sharp' in B.attr and 'seen' in B.attr:              # both sharp
+      if A.sharp and A.seen:
+        if B.sharp and B.seen:                                  # both sharp
           iM = s.pt2idx((A.x+B.x)*.5, (A.y+B.y)*.5 )
           M = s.points[iM]
           if xsign*A.x <= xsign*B.x:
@@ -856,7 +975,7 @@ class MatFree:
         else:                                                   # only A sharp
           s.append_or_extend_hard([B, A])
       else:
-        if 'sharp' in B.attr and 'seen' in B.attr:              # only B sharp
+        if B.sharp and B.seen:                                  # only B sharp
           s.append_or_extend_hard([A, B])
         else:                                                   # none sharp
           if xsign*A.x <= xsign*B.x:
@@ -897,6 +1016,9 @@ class MatFree:
 
        While obeying this shadow rule, we also sweep left and right through the data, similar to the
        simple_barrier() algorithm below.
+
+       When a pair of sweeps cuts nothing, the segments of the lowest point are cut as they
+       are, so that every segment is cut eventually. Such a cut may cross the barrier.
     """
     s.output = []
     if not s.do_slicing:
@@ -913,24 +1035,41 @@ class MatFree:
     dir_toggle = True
     old_min_y = -1e10
     old_len_output = len(s.output)
+    ## The barrier is sorted once. Points added by subdivision are inserted on
+    ## each sweep, dropped points (None in s.points) are skipped.
+    Y_bar = Barrier([p for p in s.points if p is not None and p.seg], key=lambda a: a[1] if a else 0)
+    y_seen = len(s.points)                                # s.points[y_seen:] are not yet in Y_bar
+    y_min_idx = 0                                         # dropped points never return, skip them for good.
     while True:
-      ## always recreate the barrier, so that newly added subdivision points are seen.
-      Y_bar = Barrier(s.points, key=lambda a: a[1] if a else 0)
-      while Y_bar.point() is None:                        # skip forward dropped points
-        # print("Y_bar skipping idx", Y_bar.pos(), file=sys.stderr)
-        if Y_bar.next() is None:                          # next() returns an idx, except when hitting the end.
-          break
-      min_y = Y_bar.point().y
+      for p in s.points[y_seen:]:
+        if p is not None:
+          Y_bar.insert(p)
+          y_min_idx = min(y_min_idx, Y_bar.index(p))      # a new point may start below the old minimum
+      y_seen = len(s.points)
+      while y_min_idx < len(Y_bar.points) and s.points[Y_bar.point(y_min_idx).id] is None:
+        y_min_idx += 1
+      if y_min_idx >= len(Y_bar.points):
+        break                                             # all points are dropped.
+      min_y = Y_bar.point(y_min_idx).y
       barrier_y = min_y + s.monotone_back_travel
-      print("\t>>>>>>>>>>>>>>> new Y-slice between", min_y, barrier_y, file=sys.stderr)
-      y_max_idx = Y_bar.find((0, barrier_y))
-      s.process_pyramids_barrier(Y_bar.pslice(), barrier_y, left2right=dir_toggle)
-      # print("process_pyramids_barrier returns", len(s.output), y_max_idx, len(s.points), file=sys.stderr)
-      # print("output so far: ", s.output, file=sys.stderr)
+      if s.verbose:
+        s.trace("pyramids_barrier: new Y-slice between", min_y, barrier_y)
+      y_max_idx = Y_bar.find((0, barrier_y), start=y_min_idx)
+      y_slice = [p for p in Y_bar.pslice(y_min_idx) if s.points[p.id] is not None]
+      s.process_pyramids_barrier(y_slice, barrier_y, left2right=dir_toggle)
 
       if old_len_output == len(s.output) and old_min_y == min_y:
-        print("pyramids_barrier aborted: no progress, stuck at min_y=", min_y, file=sys.stderr)
-        break;
+        ## Both sweep directions passed the lowest point without cutting: its
+        ## segments are shadowed one way and lead backwards the other way.
+        ## Cut them as they are, so that every sweep makes progress.
+        A = Y_bar.point(y_min_idx)
+        if s.verbose:
+          s.trace("pyramids_barrier: no progress, forced cuts at min_y=", min_y, A, A.att())
+        for Bi in list(A.seg or []):
+          if Bi >= 0 and s.points[A.id] is not None:
+            s.output_add(A, s.points[Bi], cut=True)
+            s.unlink_segment(A, s.points[Bi])
+        s.points[A.id] = None
 
       old_len_output = len(s.output)
       old_min_y = min_y
@@ -947,7 +1086,7 @@ class MatFree:
        A point that has all segments with negative signs is removed.
 
        Input is read from s.paths[] -- having lists of point indices.
-       The output is placed into s.output[] as lists of XY_a() objects
+       The output is placed into s.output[] as lists of XY_s() objects
        by calling process_simple_barrier() and friends.
     """
 
@@ -967,6 +1106,10 @@ class MatFree:
       return a.y
     sy = sorted(s.points, key=by_y_key)
 
+    ## The active set holds the points that the barrier has passed, and that
+    ## still have segments to do, in ascending y order. Points enter when
+    ## the barrier passes them, and leave once unlink_segment() dropped them.
+    active = []
     barrier_y = s.barrier_increment
     barrier_idx = 0     # pointing to the first element that is beyond.
     last_x = 0.0        # we start at home.
@@ -977,7 +1120,10 @@ class MatFree:
         if barrier_idx >= len(sy):
           break
       if barrier_idx > old_idx:
-        last_x = s.process_simple_barrier(sy[0:barrier_idx], barrier_y, last_x=last_x)
+        active.extend(pt for pt in sy[old_idx:barrier_idx] if s.points[pt.id] is not None and pt.seg is not None)
+        if active:
+          last_x = s.process_simple_barrier(active, barrier_y, last_x=last_x)
+          active = [pt for pt in active if s.points[pt.id] is not None]
       if barrier_idx >= len(sy):
         break
       barrier_y += s.barrier_increment
@@ -997,8 +1143,8 @@ class MatFree:
       ratio = travel/d
       dx = B.x-A.x
       dy = B.y-A.y
-      C = XY_a((B.x+dx*ratio,  B.y+dy*ratio))
-      if 'sharp' in B.attr: C.sharp = True
+      C = XY_s((B.x+dx*ratio,  B.y+dy*ratio))
+      if B.sharp: C.sharp = True
       return C
 
     for path in paths:
@@ -1010,7 +1156,68 @@ class MatFree:
     return paths
 
 
+  def split_bands(self, cut):
+    """Split the paths of cut into y-bands, that can be processed independently.
+       Paths whose y ranges overlap are in the same band, so every connected
+       component is. A new band starts only after a gap wider than
+       barrier_increment and monotone_back_travel: a barrier line of simple_barrier()
+       lies in that gap, and no slice of pyramids_barrier() spans it. Points in
+       different bands are never deduplicated into one.
+       Returns a list of cuts in ascending y order, each keeping the input order
+       of its paths.
+    """
+    gap = max(self.barrier_increment, self.monotone_back_travel) + 2*self.dedup_epsilon
+    ranges = []
+    for i, path in enumerate(cut):
+      if len(path):
+        ys = [self.input_scale * point[1] for point in path]
+        ranges.append((min(ys), max(ys), i))
+    ranges.sort()
+
+    band_of = [0] * len(cut)             # empty paths go with the first band.
+    band = 0
+    top = None
+    for lo, hi, i in ranges:
+      if top is not None and lo > top + gap:
+        band += 1
+      if top is None or hi > top:
+        top = hi
+      band_of[i] = band
+
+    bands = [[] for b in range(band+1)]
+    for i, path in enumerate(cut):
+      bands[band_of[i]].append(path)
+    return bands
+
+
+  def settings(self):
+    """The settings of the apply() method, as set by __init__() and preset()."""
+    return dict((k, v) for k, v in self.__dict__.items() if isinstance(v, (bool, int, float, str, type(None))))
+
+
+  def apply_bands(self, bands):
+    """Run apply() for each band on a process pool, and stitch the outputs in
+       sweep order. Each band starts its sweep at x=0, where apply() on
+       all paths would continue from where the previous band left the head.
+    """
+    self.bands = len(bands)
+    settings = self.settings()
+    settings['processes'] = None
+    with concurrent.futures.ProcessPoolExecutor(self.processes) as pool:
+      outputs = pool.map(_apply_band, [(settings, band) for band in bands])
+      self.output = []
+      for output in outputs:
+        self.output.extend(output)
+    return self.output
+
+
   def apply(self, cut):
+    self.bands = 1
+    if self.processes and self.processes > 1 and self.do_slicing:
+      bands = self.split_bands(cut)
+      if len(bands) > 1:
+        return self.apply_bands(bands)
+
     self.load(cut)
     if self.pyramids_algorithm:
       self.link_points()
@@ -1025,3 +1232,12 @@ class MatFree:
       self.output = self.apply_overshoot(self.output, self.overshoot, self.overshoot)
 
     return self.output
+
+
+def _apply_band(job):
+  """Process one band of MatFree.apply_bands(). At module level, so that a process pool can pickle it."""
+  settings, cut = job
+  mf = MatFree()
+  mf.__dict__.update(settings)
+  mf.points_dict = XY_Hash(mf.dedup_epsilon)
+  return mf.apply(cut)
@@ -6,6 +6,12 @@
 # At each end of a cut search the nearest starting point for the next cut.
 # This will probably not find find the global optimum, but works well enough.
 
+import math
+import multiprocessing
+import time
+
+from silhouette.Geometry import KDTree
+
 
 # Calculates the distance between two given points.
 # The result does not calculate the root for performance reasons,
@@ -44,7 +50,8 @@ def findnearestpath(paths, pos, entrycircular, reversible):
 
 # Sort paths to approximate minimal traveling times
 # (greedy algorithm not necessarily optimal)
-def sort(paths, entrycircular=False, reversible=True):
+# This is the plain O(n^2) version, kept as the reference for sort().
+def sort_linear(paths, entrycircular=False, reversible=True):
     pos=(0,0)
     sortedpaths=[]
     while (len(paths) > 0):
@@ -53,3 +60,233 @@ def sort(paths, entrycircular=False, reversible=True):
         pos = path[-1]           # endpoint is next start point for search
         sortedpaths.append(path) # append to output list
     return sortedpaths
+
+
+# Sort paths to approximate minimal traveling times
+# (greedy algorithm not necessarily optimal)
+#
+# Same result as repeatedly calling findnearestpath(), but the candidate
+# entry points are kept in a KDTree, so that each pick costs about O(log n)
+# instead of a scan over all remaining paths (and all vertices of closed paths
+# with entrycircular).
+# The entry points of each path are numbered in the order findnearestpath()
+# tests them, thus the tie breaking of KDTree.nearest() (lowest index wins)
+# reproduces the linear scan exactly. A closed path is rotated only once it
+# is selected.
+def sort(paths, entrycircular=False, reversible=True, pos=(0,0)):
+    entries=[]  # (path index, vertex index) per entry point; vertex -1 means reversed
+    points=[]
+    first=[]    # first entry index of each path
+    for index,path in enumerate(paths):
+        first.append(len(entries))
+        entries.append((index,0))
+        points.append(path[0])
+        if reversible:
+            entries.append((index,-1))
+            points.append(path[-1])
+        if entrycircular and path[0] == path[-1]:
+            # the first and last vertex coincide with the start point, which wins the tie.
+            for i in range(1,len(path)-1):
+                entries.append((index,i))
+                points.append(path[i])
+    first.append(len(entries))
+
+    tree=KDTree(points)
+    sortedpaths=[]
+    while len(tree) > 0:
+        distance,i = tree.nearest(pos)
+        index,vertex = entries[i]
+        for e in range(first[index],first[index+1]):
+            tree.remove(e)       # all entries of the found path are done
+        path = paths[index]
+        if vertex == -1:
+            path = path[::-1]
+        elif vertex > 0:         # break up circular path
+            path = path[vertex:] + path[1:vertex+1]
+        pos = path[-1]           # endpoint is next start point for search
+        sortedpaths.append(path) # append to output list
+    return sortedpaths
+
+
+# Solve one cell of sort_cells(). At module level, so that a process pool can pickle it.
+def _sort_cell(job):
+    paths, pos, entrycircular, reversible = job
+    return sort(paths, entrycircular, reversible, pos)
+
+
+# Cluster first, route second. Meant for very large jobs.
+#
+# Paths are bucketed by their start point into square grid cells holding
+# about per_cell paths each. Each cell is sorted on its own, starting at the
+# corner where the sweep enters it, and the cells are chained in a serpentine
+# sweep: row by row, alternating left to right and right to left.
+# The cost is about O(n log per_cell), and the cells can be solved on a
+# process pool; the result does not depend on processes.
+def sort_cells(paths, entrycircular=False, reversible=True, per_cell=1000, processes=None):
+    n = len(paths)
+    if n <= per_cell:
+        return sort(paths, entrycircular, reversible)
+    xs = [path[0][0] for path in paths]
+    ys = [path[0][1] for path in paths]
+    x0, y0 = min(xs), min(ys)
+    w, h = max(xs)-x0, max(ys)-y0
+    side = max(math.sqrt(w*h*per_cell/n), max(w,h)*per_cell/n, 1e-9)
+
+    cells = {}
+    for path,x,y in zip(paths,xs,ys):
+        cells.setdefault((int((y-y0)/side), int((x-x0)/side)), []).append(path)
+
+    rows = {}
+    for row,col in sorted(cells):
+        rows.setdefault(row, []).append(col)
+    jobs = []
+    for rank,row in enumerate(sorted(rows)):
+        cols = rows[row]
+        if rank % 2:
+            cols.reverse()
+        for col in cols:
+            entry = (x0 + (col + rank % 2)*side, y0 + row*side)
+            jobs.append((cells[(row,col)], entry if jobs else (0,0), entrycircular, reversible))
+
+    if processes and processes > 1 and len(jobs) > 1:
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(_sort_cell, jobs)
+    else:
+        results = map(_sort_cell, jobs)
+    sortedpaths = []
+    for result in results:
+        sortedpaths.extend(result)
+    return sortedpaths
+
+
+# Pen up distance of a sequence of paths, starting at pos.
+def travel(paths, pos=(0,0)):
+    total = 0.0
+    for path in paths:
+        total += math.sqrt(dist_sq(pos,path[0]))
+        pos = path[-1]
+    return total
+
+
+# Improve the order of paths (usually the output of sort()) with 2-opt and
+# Or-opt moves, until no move helps or the time budget of seconds runs out.
+#
+# 2-opt reverses a run of consecutive paths, which also reverses the cut
+# direction of each path; it is only done if reversible. Or-opt moves a run
+# of up to 3 paths elsewhere, optionally reversed (if reversible).
+# Candidate moves come from the neighbours of path endpoints, so each pass
+# costs about O(n log n). Only strictly improving moves are applied, so the
+# result is never longer than the input.
+def refine(paths, seconds, reversible=True, pos=(0,0), neighbours=8):
+    n = len(paths)
+    if n < 3 or seconds <= 0:
+        return paths
+    deadline = time.time() + seconds
+
+    seq = list(range(n))        # path index per position
+    where = list(range(n))      # position per path index
+    rev = [False] * n           # path index is cut backwards
+
+    # endpoint 2*p is paths[p][0], 2*p+1 is paths[p][-1]
+    ends = []
+    for path in paths:
+        ends.append(path[0])
+        ends.append(path[-1])
+    tree = KDTree(ends)
+    near = []
+    for pt in ends:
+        near.append([e for d,e in tree.knearest(pt, neighbours+2)])
+    near_origin = [e for d,e in tree.knearest(pos, neighbours)]
+
+    def head(p):                # where the cut of path p starts
+        return ends[2*p+1] if rev[p] else ends[2*p]
+    def tail(p):                # where the cut of path p ends
+        return ends[2*p] if rev[p] else ends[2*p+1]
+    def dist(a,b):
+        return math.sqrt(dist_sq(a,b))
+    def before(i):              # point where the head moves from to reach position i
+        return tail(seq[i-1]) if i > 0 else pos
+    def tail_endpoint(p):
+        return 2*p if rev[p] else 2*p+1
+
+    def two_opt(a):
+        """reverse seq[a..b] for a b found near the point before position a."""
+        p = before(a)
+        cands = near[tail_endpoint(seq[a-1])] if a > 0 else near_origin
+        for e in cands:
+            q = e // 2
+            b = where[q]
+            if b < a or e != tail_endpoint(q):
+                continue
+            delta = dist(p,tail(q)) - dist(p,head(seq[a]))
+            if b+1 < n:
+                nxt = head(seq[b+1])
+                delta += dist(head(seq[a]),nxt) - dist(tail(q),nxt)
+            if delta < -1e-9:
+                seg = seq[a:b+1]
+                seg.reverse()
+                seq[a:b+1] = seg
+                for i in range(a,b+1):
+                    where[seq[i]] = i
+                    rev[seq[i]] = not rev[seq[i]]
+                return True
+        return False
+
+    def or_opt(s, length):
+        """move seq[s..s+length-1] behind a path whose tail is near its ends."""
+        e = s+length-1
+        if e >= n:
+            return False
+        first, last = seq[s], seq[e]
+        prv = before(s)
+        gain = dist(prv,head(first))
+        if e+1 < n:
+            nxt = head(seq[e+1])
+            gain += dist(tail(last),nxt) - dist(prv,nxt)
+        options = [(False, head(first), tail(last), 2*first+int(rev[first]))]
+        if reversible:
+            options.append((True, tail(last), head(first), 2*last+1-int(rev[last])))
+        for flip, entry, leave, endpoint in options:
+            for c in near[endpoint]:
+                r = c // 2
+                t = where[r]
+                if s-1 <= t <= e or c != tail_endpoint(r):
+                    continue
+                cost = dist(tail(r),entry)
+                if t+1 < n:
+                    succ = head(seq[t+1])
+                    cost += dist(leave,succ) - dist(tail(r),succ)
+                if cost - gain < -1e-9:
+                    seg = seq[s:e+1]
+                    if flip:
+                        seg.reverse()
+                        for p in seg:
+                            rev[p] = not rev[p]
+                    if t < s:
+                        seq[t+1:e+1] = seg + seq[t+1:s]
+                        lo, hi = t+1, e+1
+                    else:
+                        seq[s:t+1] = seq[e+1:t+1] + seg
+                        lo, hi = s, t+1
+                    for i in range(lo,hi):
+                        where[seq[i]] = i
+                    return True
+        return False
+
+    improved = True
+    while improved and time.time() < deadline:
+        improved = False
+        for a in range(n):
+            if a % 64 == 0 and time.time() >= deadline:
+                break
+            if reversible and two_opt(a):
+                improved = True
+            for length in (1,2,3):
+                if or_opt(a, length):
+                    improved = True
+                    break
+
+    refined = [paths[p][::-1] if rev[p] else paths[p] for p in seq]
+    if travel(refined, pos) > travel(paths, pos):
+        return paths            # rounding noise. Never return something worse.
+    return refined
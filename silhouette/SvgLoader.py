@@ -0,0 +1,211 @@
+# SvgLoader.py -- headless loading of the cut paths of an SVG file
+#
+# sendto_silhouette.py builds an inkex extension and an inkex element object
+# for every node before its traversal starts. For scripts and batch jobs that
+# only need the paths, load_paths() parses the file with plain lxml and walks
+# it the same way recursivelyTraverseSvg() does, for the elements the plugin
+# supports: g, use, path, rect, circle, ellipse, line, polyline and polygon.
+# The values that depend on inkex -- the document scale, the path data of the
+# shapes and the parsed style -- come from inkex itself: shapes are adopted one
+# at a time into an inkex document with the attributes of the root, so that
+# the paths are the same as those of sendto_silhouette.py.
+#
+# Known differences from sendto_silhouette.py:
+# - The whole document is loaded: there is no selection as with --id, and
+#   no --dashes.
+# - The inkex document has the attributes of the root but no children, so
+#   inkex code that looks up other elements of the document, e.g. the
+#   sodipodi:namedview, sees the defaults. The shape conversions and the
+#   _base_scale() of inkex 1.4 do not.
+# - Of duplicated ids, the last one wins for <use>, as in inkex.
+#
+# Usage:
+#   from silhouette.SvgLoader import load_paths
+#   paths = load_paths("examples/testcut_matfree.svg", smoothness=0.05)
+
+import inkex
+from lxml import etree
+from inkex import Line, SvgDocumentElement
+from inkex.elements import SVG_PARSER
+from inkex.paths import Path
+from inkex.styles import Style
+from inkex.transforms import Transform
+from inkex.units import convert_unit
+
+from silhouette.Geometry import flatten_superpath, max_scale, transform_batch
+
+# Temporary Monkey Backport Patches to support functions that exist only after v1.2
+# TODO: If support for Inkscape v1.1 is dropped then this backport can be removed
+if not hasattr(inkex, "__version__") or inkex.__version__[0:3] < "1.2":
+    from inkex import BaseElement
+    # backport https://gitlab.com/inkscape/extensions/-/merge_requests/433
+    Line.get_path = lambda self: 'M{0[x1]},{0[y1]} L{0[x2]},{0[y2]}'.format(self.attrib)
+    # backport @ matmul operator
+    Transform.__matmul__ = Transform.__mul__
+    SvgDocumentElement.viewport_width = property(lambda self: convert_unit(self.get("width"), "px") or self.get_viewbox()[2])
+    SvgDocumentElement.viewport_height = property(lambda self: convert_unit(self.get("height"), "px") or self.get_viewbox()[3])
+    SvgDocumentElement._base_scale = lambda self, unit="px": (convert_unit(1, unit) or 1.0) if not all(self.get_viewbox()[2:]) else max([convert_unit(self.viewport_width, unit) / self.get_viewbox()[2], convert_unit(self.viewport_height, unit) / self.get_viewbox()[3]]) or convert_unit(1, unit) or 1.0
+    BaseElement.to_dimensional = staticmethod(lambda value, to_unit="px": convert_unit(value, to_unit))
+    BaseElement.to_dimensionless = staticmethod(lambda value: convert_unit(value, "px"))
+
+SVG = "{http://www.w3.org/2000/svg}"
+XLINK_HREF = "{http://www.w3.org/1999/xlink}href"
+INKSCAPE_LABEL = "{http://www.inkscape.org/namespaces/inkscape}label"
+
+SHAPES = (SVG + "path", SVG + "rect", SVG + "circle", SVG + "ellipse", SVG + "line",
+          SVG + "polyline", SVG + "polygon")
+
+
+def parse(source):
+    """Parse an SVG file name or stream. Returns the root element and a dict of
+       the elements by id, where the last of duplicated ids wins, as in inkex.
+    """
+    ids = {}
+    context = etree.iterparse(source, events=("start",), huge_tree=True, remove_comments=True)
+    for event, elem in context:
+        eid = elem.get("id")
+        if eid is not None:
+            ids[eid] = elem
+    return context.root, ids
+
+
+def inkex_document(root):
+    """An empty inkex SvgDocumentElement with the attributes of the root element."""
+    return SVG_PARSER.makeelement(root.tag, dict(root.attrib), nsmap=root.nsmap)
+
+
+def doc_scale(root, unit="mm"):
+    """Document units per unit: inkex SvgDocumentElement._base_scale(unit) of the root."""
+    return inkex_document(root)._base_scale(unit)
+
+
+def shape_d(node, document=None):
+    """The path data of a shape element: the .path of the inkex shape element,
+       adopted into document, an inkex_document() of its root by default.
+    """
+    if document is None:
+        document = inkex_document(node.getroottree().getroot())
+    element = etree.SubElement(document, node.tag, dict(node.attrib))
+    try:
+        return str(element.path)
+    finally:
+        document.remove(element)
+
+
+def load_paths(source, smoothness=0.05, report=None):
+    """Return the cut paths of an SVG file name or stream, in mm, as lists of
+       (x, y) tuples. They are the same as the paths recursivelyTraverseSvg() of
+       sendto_silhouette.py collects without --dashes.
+
+       report(message, level) is called for skipped layers and elements, with
+       level 'log' or 'error', like SendtoSilhouette.report(). Text and images
+       are 'error's, as sendto_silhouette.py aborts on them.
+    """
+    if report is None:
+        report = lambda message, level: None
+    root, ids = parse(source)
+    document = inkex_document(root)
+    docTransform = Transform(scale=document._base_scale("mm"))
+    superpaths = {}     # (d, flat) -> superpath, flattened together after the traversal
+    shapes = []         # (d, flat), matrix of each shape in document order
+    warned = set()
+
+    stack = [(iter(root), "visible", Transform(root.get("transform")), None)]
+    uses = set()    # <use> elements on the stack, to break reference cycles
+    while stack:
+        nodes, parent_visibility, parent_transform, use = stack[-1]
+        node = next(nodes, None)
+        if node is None:
+            stack.pop()
+            uses.discard(use)
+            continue
+        tag = node.tag
+        if not isinstance(tag, str):
+            continue    # processing instruction
+
+        # Ignore invisible nodes
+        attrib = node.attrib
+        raw = attrib.get("style")
+        if raw and ("display" in raw or "opacity" in raw or "visibility" in raw):
+            style = Style(raw)
+        else:
+            style = {}
+        if style.get("display", attrib.get("display", "inline")) == "none":
+            continue
+        if not float(style.get("opacity", attrib.get("opacity", 1.0))):
+            continue
+        v = style.get("visibility", attrib.get("visibility", parent_visibility))
+        if v == "inherit":
+            v = parent_visibility
+
+        transform = attrib.get("transform")
+        # NOTE: <<< transforms operate from right (detail) to left (whole)
+        my_transform = parent_transform @ Transform(transform) if transform else parent_transform
+
+        if tag == SVG + "g":
+            # Check if layer name is referring to cutting mat, registration mark or print layer
+            label = attrib.get(INKSCAPE_LABEL)
+            if label:
+                lower = label.lower()
+                skip = next((kind for key, kind in (("cuttingmat", "a cutting mat"),
+                                                    ("regmark", "a registration mark"),
+                                                    ("print", "a print"))
+                             if key in lower), None)
+                if skip:
+                    report(f"layer '{label}' is {skip} layer - skipped", 'log')
+                    continue
+            stack.append((iter(node), v, my_transform, None))
+
+        elif tag == SVG + "use":
+            ref = attrib.get("href") or attrib.get(XLINK_HREF)
+            refnode = ids.get(ref.strip("#")) if ref else None
+            if refnode is not None:
+                if node in uses:
+                    report(f"<use> element '{attrib.get('id')}' is part of a reference cycle - skipped", 'error')
+                    continue
+                x = float(attrib.get("x", 0.0))
+                y = float(attrib.get("y", 0.0))
+                if x or y:
+                    my_transform = my_transform @ Transform(translate=(x, y))
+                uses.add(node)
+                stack.append((iter([refnode]), v, my_transform, node))
+
+        elif tag in SHAPES:
+            if v == "hidden" or v == "collapse":
+                continue
+            transform = docTransform @ my_transform
+            d = attrib.get("d") if tag == SVG + "path" else None
+            if d is None:
+                d = shape_d(node, document)
+            # flattened once per path data, see recursivelyTraverseSvg()
+            scale = max_scale(transform.matrix)
+            flat = smoothness / scale if scale else smoothness
+            if (d, flat) not in superpaths:
+                path = Path(str(Path(d))) if tag == SVG + "path" else Path(d)
+                superpaths[(d, flat)] = path.to_superpath()
+            shapes.append(((d, flat), transform.matrix))
+
+        elif tag == SVG + "text" or tag == SVG + "image":
+            kind = tag[len(SVG):]
+            if kind == "text" and not any(t.text is not None for t in node.iterfind(".//")):
+                continue
+            if kind not in warned:
+                report(f"Warning: unable to draw <{kind}> object, please convert it to a path first.", 'error')
+                warned.add(kind)
+
+    # Flatten all shapes with the same tolerance in one batch, and split the
+    # subpaths back by shape.
+    flattened = {}
+    by_flat = {}
+    for key in superpaths:
+        by_flat.setdefault(key[1], []).append(key)
+    for flat, keys in by_flat.items():
+        subpaths = iter(flatten_superpath([sp for key in keys for sp in superpaths[key]], flat))
+        for key in keys:
+            flattened[key] = [next(subpaths) for sp in superpaths[key] if len(sp) > 1]
+
+    paths = []
+    for key, matrix in shapes:
+        for points in flattened[key]:
+            paths.append([tuple(xy) for xy in transform_batch(points, matrix).tolist()])
+    return paths
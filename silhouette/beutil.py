@@ -5,6 +5,8 @@
 
 import sys
 
+import numpy as np
+
 
 def to_BE(x, y):
     if abs(x) < 112 and abs(y) < 112:
@@ -45,6 +47,29 @@ def to_BE(x, y):
 # end def to_BE
 
 
+BE_HALF = np.array([112, 1676, 375482])    # per BE1, BE2, BE3: coordinates are below this
+BE_SIZE = np.array([2, 3, 5])              # digits of BE1, BE2, BE3
+
+
+def to_BE_batch(x, y):
+    """to_BE() for integer arrays x and y. Returns the encoding 1, 2 or 3 of each
+    pair, and its digits as an (N, 5) uint8 array, of which the first 2, 3 or 5 are used."""
+    x = np.asarray(x, dtype=np.int64)
+    y = np.asarray(y, dtype=np.int64)
+    m = np.maximum(np.abs(x), np.abs(y))
+    if len(m) and m.max() >= BE_HALF[-1]:
+        raise ValueError("Invalid coordinate")
+    enc = np.searchsorted(BE_HALF, m, side='right') + 1
+    half = BE_HALF[enc - 1]
+    index = 2 * half * (x + half) + (y + half)
+    digits = np.empty((len(index), 5), dtype=np.uint8)
+    for k in range(5):
+        digits[:, k] = index % 224 + 0x20
+        index //= 224
+    return enc, digits
+# end def to_BE_batch
+
+
 def from_BE(be_stream):
 
     if len(be_stream) == 4:
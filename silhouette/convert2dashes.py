@@ -23,6 +23,9 @@
 This extension converts a path into a dashed line using 'stroke-dasharray'
 It is a modification of the file addnodes.py
 """
+import re
+
+import numpy as np
 from inkex import bezier, CubicSuperPath
 
 
@@ -70,3 +73,70 @@ def convert2dash(node):
         node.pop('sodipodi:type')
         node.path = CubicSuperPath(new)
         node.style = style
+
+
+def dash_pattern(style):
+    """Return the (dashes, offset) of a style, or None if the stroke is not dashed.
+    dashes is the stroke-dasharray, repeated once if it has an odd count of values,
+    as SVG does, and offset the stroke-dashoffset."""
+    value = style.get('stroke-dasharray', 'none').strip()
+    if value == 'none':
+        return None
+    try:
+        dashes = [float(dash) for dash in re.split(r'[\s,]+', value) if dash]
+        offset = float(style.get('stroke-dashoffset', 0) or 0)
+    except ValueError:
+        return None
+    if not dashes or sum(dashes) <= 0 or min(dashes) < 0:
+        return None
+    if len(dashes) % 2:
+        dashes = dashes * 2
+    return dashes, offset
+
+
+def dash_polyline(points, dashes, offset=0.0):
+    """Cut a polyline, an (N,2) array, into dashes: a list of (M,2) arrays.
+    The dash pattern starts offset along the line. The cumulative arc length
+    is searched for all dash ends at once, so the cost is O(N + dashes)."""
+    seglen = np.hypot(*np.diff(points, axis=0).T)
+    cum = np.concatenate(([0.0], np.cumsum(seglen)))
+    total = cum[-1]
+    period = sum(dashes)
+    bounds = np.concatenate(([0.0], np.cumsum(dashes)))
+    phase = offset % period
+    # the dashes are [start, end) intervals, repeated every period along the line
+    repeats = np.arange(int((total + phase) // period) + 1) * period - phase
+    start = (repeats[:, None] + bounds[0:-1:2]).ravel()
+    end = (repeats[:, None] + bounds[1::2]).ravel()
+    start = np.maximum(start, 0.0)
+    end = np.minimum(end, total)
+    keep = end > start
+    start, end = start[keep], end[keep]
+    if not len(start):
+        return []
+
+    def at(t):
+        i = np.clip(np.searchsorted(cum, t, side='right'), 1, len(points) - 1)
+        length = seglen[i - 1]
+        f = np.divide(t - cum[i - 1], length, out=np.zeros_like(t), where=length > 0)
+        return points[i - 1] + (points[i] - points[i - 1]) * f[:, None]
+
+    # the vertices strictly inside each dash, between its two cut points
+    first = np.searchsorted(cum, start, side='right')
+    last = np.searchsorted(cum, end, side='left')
+    inner = np.maximum(last - first, 0)
+    size = inner + 2
+    ends = np.cumsum(size)
+    out = np.empty((ends[-1], 2))
+    out[ends - size] = at(start)
+    out[ends - 1] = at(end)
+    if inner.sum():
+        dash = np.repeat(np.arange(len(size)), inner)
+        k = np.arange(inner.sum()) - np.repeat(np.cumsum(inner) - inner, inner)
+        out[np.repeat(ends - size + 1, inner) + k] = points[first[dash] + k]
+    return np.split(out, ends[:-1])
+
+
+def dash_polylines(subpaths, dashes, offset=0.0):
+    """dash_polyline() for each of a list of polylines. Each starts the pattern anew."""
+    return [dash for points in subpaths for dash in dash_polyline(points, dashes, offset)]
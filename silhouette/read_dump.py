@@ -2,11 +2,6 @@
 # this script reads inkscape dumpfiles and shows the plotter path
 
 import sys
-try:
-    import matplotlib.pyplot as plt
-    from matplotlib.widgets import Button
-except:
-    plt = None
 from pathlib import Path
 
 
@@ -35,6 +30,12 @@ def show_plotcuts(cuts, buttons=False, extraText=None):
           2: matplotlib missing
           3: cut path empty
     """
+    # imported here, as pyplot takes longer to import than everything else sendto_silhouette.py needs
+    try:
+        import matplotlib.pyplot as plt
+        from matplotlib.widgets import Button
+    except:
+        plt = None
     if plt is None:
         print("Install matplotlib for python to allow graphical display of cuts",
               file=sys.stderr)
@@ -0,0 +1,66 @@
+import copy
+import os
+import unittest
+
+import numpy as np
+import inkex
+from inkex import Style
+
+from silhouette.Geometry import flatten_superpath
+from silhouette.convert2dashes import convert2dash, dash_pattern, dash_polyline, dash_polylines
+
+
+class DashPatternTest(unittest.TestCase):
+    def test_parse(self):
+        self.assertIsNone(dash_pattern(Style("stroke:#000")))
+        self.assertIsNone(dash_pattern(Style("stroke-dasharray:none")))
+        self.assertIsNone(dash_pattern(Style("stroke-dasharray:0,0")))
+        self.assertIsNone(dash_pattern(Style("stroke-dasharray:4,x")))
+        self.assertEqual(dash_pattern(Style("stroke-dasharray:2,3")), ([2.0, 3.0], 0.0))
+        self.assertEqual(dash_pattern(Style("stroke-dasharray:2 3;stroke-dashoffset:1")), ([2.0, 3.0], 1.0))
+        # an odd count is repeated
+        self.assertEqual(dash_pattern(Style("stroke-dasharray:1, 2, 3")), ([1.0, 2.0, 3.0, 1.0, 2.0, 3.0], 0.0))
+
+
+class DashPolylineTest(unittest.TestCase):
+    # 10 along x, then 10 along y
+    corner = np.array([(0.0, 0.0), (10.0, 0.0), (10.0, 10.0)])
+
+    def assertDashes(self, dashes, expected):
+        self.assertEqual(len(dashes), len(expected))
+        for dash, points in zip(dashes, expected):
+            np.testing.assert_allclose(dash, points, atol=1e-12)
+
+    def test_corner(self):
+        self.assertDashes(dash_polyline(self.corner, [2, 3]), [
+            [(0, 0), (2, 0)], [(5, 0), (7, 0)], [(10, 0), (10, 2)], [(10, 5), (10, 7)]])
+
+    def test_offset(self):
+        self.assertDashes(dash_polyline(self.corner, [2, 3], 1), [
+            [(0, 0), (1, 0)], [(4, 0), (6, 0)], [(9, 0), (10, 0), (10, 1)], [(10, 4), (10, 6)], [(10, 9), (10, 10)]])
+        # a negative offset, or one of more than a period, wraps around
+        self.assertDashes(dash_polyline(self.corner, [2, 3], -4), dash_polyline(self.corner, [2, 3], 1))
+        self.assertDashes(dash_polyline(self.corner, [2, 3], 6), dash_polyline(self.corner, [2, 3], 1))
+
+    def test_degenerate(self):
+        self.assertEqual(dash_polyline(np.array([(1.0, 1.0), (1.0, 1.0)]), [2, 3]), [])
+        # repeated points do not divide by zero
+        points = np.array([(0.0, 0.0), (0.0, 0.0), (4.0, 0.0)])
+        self.assertDashes(dash_polyline(points, [1, 1]), [[(0, 0), (1, 0)], [(2, 0), (3, 0)]])
+        self.assertEqual(dash_polylines([], [1, 1]), [])
+
+    def test_close_to_curve_splitting(self):
+        # the dashes of the flattened curve end close to those of the curve split by convert2dash()
+        svg = inkex.load_svg(os.path.join(os.path.dirname(__file__), "data", "curved_dashes.test.svg")).getroot()
+        for node in svg.descendants().filter(inkex.ShapeElement):
+            pattern = dash_pattern(node.style)
+            if pattern is None or isinstance(node, inkex.Group):
+                continue
+            path = node.to_path_element()
+            new = dash_polylines(flatten_superpath(path.path.to_superpath(), 0.01), *pattern)
+            path = copy.deepcopy(path)
+            convert2dash(path)
+            old = flatten_superpath(path.path.to_superpath(), 0.01)
+            self.assertEqual(len(new), len(old), node.get_id())
+            for a, b in zip(new, old):
+                np.testing.assert_allclose(a[[0, -1]], b[[0, -1]], atol=0.05, err_msg=node.get_id())
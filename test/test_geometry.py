@@ -0,0 +1,186 @@
+import copy
+import math
+import random
+import unittest
+
+import numpy as np
+from inkex.bezier import subdiv
+
+from silhouette import Geometry
+from silhouette.Geometry import XY_a
+from silhouette.Strategy import presets
+
+
+def random_points(seed, count):
+    """small integers give lots of colinear, parallel and right angle cases."""
+    rnd = random.Random(seed)
+    coord = lambda: rnd.choice([rnd.uniform(-5, 5), rnd.randint(-2, 2)])
+    return np.array([(coord(), coord()) for i in range(count)])
+
+
+def as_xy(a):
+    return [XY_a((x, y)) for x, y in a.tolist()]
+
+
+def nan_to_none(values):
+    return [None if math.isnan(v) else v for v in values.tolist()]
+
+
+class BatchKernelTest(unittest.TestCase):
+    N = 3000
+
+    def setUp(self):
+        self.arrays = [random_points(seed, self.N) for seed in range(4)]
+        self.points = [as_xy(a) for a in self.arrays]
+
+    def test_dist_sq(self):
+        A, B = self.arrays[:2]
+        expected = [Geometry.dist_sq(a, b) for a, b in zip(*self.points[:2])]
+        self.assertEqual(Geometry.dist_sq_batch(A, B).tolist(), expected)
+
+    def test_ccw_colinear(self):
+        A, B, C = self.arrays[:3]
+        triples = list(zip(*self.points[:3]))
+        self.assertEqual(Geometry.ccw_batch(A, B, C).tolist(), [Geometry.ccw(*t) for t in triples])
+        self.assertEqual(Geometry.colinear_batch(A, B, C).tolist(), [Geometry.colinear(*t) for t in triples])
+
+    def test_sharp_turn(self):
+        A, B, C = self.arrays[:3]
+        triples = list(zip(*self.points[:3]))
+        ratios = set(p.get('sharp_turn_fwd_ratio', 0.99) for p in presets.values()) | {-0.5, 1.0, 2.0}
+        for ratio in ratios:
+            self.assertEqual(Geometry.sharp_turn_batch(A, B, C, ratio).tolist(),
+                             [Geometry.sharp_turn(*t, ratio) for t in triples])
+
+    def test_intersect_lines(self):
+        A, B, C, D = self.arrays
+        for limit1, limit2 in ((False, False), (True, False), (False, True), (True, True)):
+            result = Geometry.intersect_lines_batch(A, B, C, D, limit1, limit2)
+            for row, pts in zip(result.tolist(), zip(*self.points)):
+                expected = Geometry.intersect_lines(*pts, limit1=limit1, limit2=limit2)
+                if expected is None:
+                    self.assertTrue(math.isnan(row[0]) and math.isnan(row[1]))
+                else:
+                    self.assertEqual(row, [expected[0], expected[1]])
+
+    def test_intersect_lines_colinear(self):
+        # A--C--B--D, A--D--B--C, C--A--B--D, A--B--C--D and parallel.
+        cases = [((0, 0), (2, 2), (1, 1), (3, 3)),
+                 ((0, 0), (2, 0), (3, 0), (1, 0)),
+                 ((1, 1), (2, 2), (0, 0), (3, 3)),
+                 ((0, 0), (0, 1), (0, 2), (0, 3)),
+                 ((0, 0), (1, 0), (0, 1), (1, 1))]
+        A, B, C, D = (np.array([case[i] for case in cases], dtype=float) for i in range(4))
+        result = Geometry.intersect_lines_batch(A, B, C, D)
+        expected = [(1, 1), (1, 0), (1, 1), None, None]
+        for row, exp in zip(result.tolist(), expected):
+            if exp is None:
+                self.assertTrue(math.isnan(row[0]))
+            else:
+                self.assertEqual(row, list(exp))
+        for case, exp in zip(cases, expected):
+            r = Geometry.intersect_lines(*(XY_a(p) for p in case))
+            self.assertEqual(r if r is None else tuple(r), exp)
+
+    def test_intersect_x_y(self):
+        A, B = self.arrays[:2]
+        pairs = list(zip(*self.points[:2]))
+        for boundary in (0.0, 1.0, -2.5):
+            for limit in (False, True):
+                self.assertEqual(nan_to_none(Geometry.intersect_y_batch(A, B, boundary, limit)),
+                                 [Geometry.intersect_y(a, b, boundary, limit) for a, b in pairs])
+                self.assertEqual(nan_to_none(Geometry.intersect_x_batch(A, B, boundary, limit)),
+                                 [Geometry.intersect_x(a, b, boundary, limit) for a, b in pairs])
+
+    def test_broadcast_single_point(self):
+        A = self.arrays[0]
+        origin = np.array((0.0, 0.0))
+        self.assertEqual(Geometry.dist_sq_batch(A, origin).tolist(),
+                         [Geometry.dist_sq(a, XY_a((0.0, 0.0))) for a in self.points[0]])
+        result = Geometry.intersect_lines_batch(A, self.arrays[1], origin, np.array((1.0, 1.0)))
+        self.assertEqual(result.shape, (self.N, 2))
+
+
+class DegenerateBatchKernelTest(BatchKernelTest):
+    """The same comparisons, with every row of A, B, C, D forced into one of
+       A == B, C == D, C and D on the line AB, or all four points equal.
+    """
+    def setUp(self):
+        rnd = random.Random(4)
+        A, B, C, D = (random_points(seed, self.N) for seed in range(4, 8))
+        for i in range(self.N):
+            kind = i % 4
+            if kind == 0:
+                B[i] = A[i]
+            elif kind == 1:
+                D[i] = C[i]
+            elif kind == 2:
+                A[i] = rnd.randint(-2, 2), rnd.randint(-2, 2)
+                step = np.array((rnd.randint(-2, 2), rnd.randint(-2, 2)))
+                B[i], C[i], D[i] = (A[i] + rnd.choice([-2, -1, 0, 0.5, 1, 2, 3]) * step for j in range(3))
+            else:
+                B[i] = C[i] = D[i] = A[i]
+        self.arrays = [A, B, C, D]
+        self.points = [as_xy(a) for a in self.arrays]
+
+
+class FlattenTest(unittest.TestCase):
+    @staticmethod
+    def random_superpath(seed, subpaths=5):
+        rnd = random.Random(seed)
+        coord = lambda: [rnd.uniform(0, 50), rnd.uniform(0, 50)]
+        csp = []
+        for i in range(subpaths):
+            sp = []
+            for n in range(rnd.randint(1, 6)):
+                p = coord()
+                kind = rnd.random()
+                if kind < 0.2:
+                    sp.append([p[:], p[:], p[:]])           # a straight line node
+                elif kind < 0.3:
+                    sp.append([p[:], coord(), coord()])     # a cusp
+                else:
+                    sp.append([coord(), p[:], coord()])
+            csp.append(sp)
+        return csp
+
+    @staticmethod
+    def subdiv_points(csp, flat):
+        points = []
+        for sp in copy.deepcopy(csp):
+            subdiv(sp, flat)
+            if len(sp) > 1:
+                points.append([tuple(node[1]) for node in sp])
+        return points
+
+    def test_same_as_subdiv(self):
+        for seed in range(20):
+            csp = self.random_superpath(seed)
+            for flat in (0.05, 0.5, 3.0):
+                self.assertEqual([[tuple(p) for p in a.tolist()] for a in Geometry.flatten_superpath(csp, flat)],
+                                 self.subdiv_points(csp, flat))
+
+    def test_degenerate(self):
+        self.assertEqual(Geometry.flatten_superpath([], 0.1), [])
+        self.assertEqual(Geometry.flatten_superpath([[[[1, 1], [1, 1], [1, 1]]]], 0.1), [])
+        # a closed loop, start == end: the chord has no length.
+        loop = [[[0, 0], [0, 0], [10, 0]], [[10, 10], [0, 0], [0, 0]]]
+        result = Geometry.flatten_superpath([loop], 0.1)
+        self.assertEqual([tuple(p) for p in result[0].tolist()], self.subdiv_points([loop], 0.1)[0])
+        # subdiv() never ends with flat 0 on a curve, we stop after max_depth.
+        result = Geometry.flatten_superpath([loop], 0.0, max_depth=5)
+        self.assertEqual(len(result[0]), 2**5 + 1)
+
+
+    def test_transform(self):
+        rnd = random.Random(3)
+        points = np.array([[rnd.uniform(-9, 9), rnd.uniform(-9, 9)] for i in range(20)])
+        matrix = ((0.5, -2.0, 3.0), (1.5, 0.25, -4.0))
+        expected = [(0.5*x - 2.0*y + 3.0, 1.5*x + 0.25*y - 4.0) for x, y in points.tolist()]
+        np.testing.assert_allclose(Geometry.transform_batch(points, matrix), expected)
+        self.assertAlmostEqual(Geometry.max_scale(matrix), np.linalg.norm(np.array(matrix)[:,:2], 2))
+        self.assertAlmostEqual(Geometry.max_scale(((0.0, -3.0, 7.0), (3.0, 0.0, 1.0))), 3.0)   # rotate and scale
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from silhouette.GeometryCache import GeometryCache, default_cache_dir
+
+
+class GeometryCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, "sub", "geometry.sqlite")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_roundtrip(self):
+        subpaths = [np.array([[0.0, 1.0], [2.0, 3.0]]), np.array([[4.0, 5.0], [6.0, 7.5], [8.0, 9.0]])]
+        key = GeometryCache.key("M 0,0 L 1,1", ((1.0, 0.0, 0.0), (0.0, 1.0, 0.0)), None, 0.05, False)
+        self.assertEqual(key, GeometryCache.key("M 0,0 L 1,1", ((1.0, 0.0, 0.0), (0.0, 1.0, 0.0)), None, 0.05, False))
+        self.assertNotEqual(key, GeometryCache.key("M 0,0 L 1,1", ((1.0, 0.0, 0.0), (0.0, 1.0, 0.0)), None, 0.1, False))
+
+        cache = GeometryCache(self.path, 1000)
+        self.assertIsNone(cache.get(key))
+        cache.put(key, subpaths)
+        cache.put(b"empty", [])
+        self.assertEqual(cache.close(), (2, 16 + 5*16 + 0))
+
+        cache = GeometryCache(self.path, 1000)
+        result = cache.get(key)
+        self.assertEqual([p.tolist() for p in result], [p.tolist() for p in subpaths])
+        self.assertEqual(cache.get(b"empty"), [])
+        self.assertEqual((cache.hits, cache.misses), (2, 0))
+        cache.close()
+
+    @mock.patch.dict(sys.modules, {"appdirs": None})
+    def test_default_cache_dir_without_appdirs(self):
+        # the places appdirs.user_cache_dir() would choose
+        with mock.patch.dict(os.environ, {"LOCALAPPDATA": "C:/Users/u/AppData/Local"}), \
+             mock.patch("sys.platform", "win32"):
+            self.assertEqual(default_cache_dir(), os.path.join("C:/Users/u/AppData/Local", "inkscape-silhouette",
+                                                               "inkscape-silhouette", "Cache"))
+        with mock.patch("sys.platform", "darwin"):
+            self.assertEqual(default_cache_dir(), os.path.expanduser("~/Library/Caches/inkscape-silhouette"))
+        with mock.patch.dict(os.environ, {"XDG_CACHE_HOME": "/tmp/xdg"}), mock.patch("sys.platform", "linux"):
+            self.assertEqual(default_cache_dir(), os.path.join("/tmp/xdg", "inkscape-silhouette"))
+
+    def test_lru_eviction(self):
+        points = [np.zeros((4, 2))]                 # 8 + 64 bytes
+        cache = GeometryCache(self.path, 72 * 3)
+        for key in (b"a", b"b", b"c"):
+            cache.put(key, points)
+        cache.close()
+        cache = GeometryCache(self.path, 72 * 3)
+        cache.db.execute("UPDATE paths SET used=used-10 WHERE key!=?", (b"b",))   # b is the most recent
+        cache.get(b"a")                             # a is used again now
+        cache.put(b"d", points)
+        self.assertEqual(cache.close(), (3, 72 * 3))
+        self.assertEqual(cache.evicted, 1)
+        cache = GeometryCache(self.path, 72 * 3)
+        self.assertIsNone(cache.get(b"c"))
+        self.assertIsNotNone(cache.get(b"a"))
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,46 @@
+import io
+import math
 import unittest
+from unittest import mock
 
+import numpy as np
+
+from silhouette.beutil import from_BE
 from silhouette.Graphtec import (
+    CMD_ETX,
+    CommandBuffer,
     PRODUCT_ID_SILHOUETTE_CAMEO5ALPHA,
     PRODUCT_ID_SILHOUETTE_CAMEO5ALPHA_PLUS,
+    SilhouetteCameo,
     _hardware_by_product_id,
+    delimit_commands,
 )
 
 
+def dummy_cameo(hardware, draw_commands):
+    dev = SilhouetteCameo(log=io.StringIO(), dry_run=True, force_hardware=hardware)
+    dev.setup(media=None, skip_init=True, draw_commands=draw_commands)
+    return dev
+
+
+def absolute_positions(data):
+    """The command letter and position in SU of each point of the M, D, E and BEn commands.
+    E and BEn are returned as D."""
+    result = []
+    for cmd in data.split(CMD_ETX)[:-1]:
+        if cmd.startswith(b"BE"):
+            dy, dx = from_BE(cmd[3:].hex().upper())[1]
+            result.append(("D", (result[-1][1][0] + dy, result[-1][1][1] + dx)))
+            continue
+        letter = cmd[:1].decode()
+        values = [int(v) for v in cmd[1:].split(b",")]
+        for y, x in zip(values[0::2], values[1::2]):
+            if letter == "E":
+                y, x = result[-1][1][0] + y, result[-1][1][1] + x
+            result.append(("M" if letter == "M" else "D", (y, x)))
+    return result
+
+
 class RegistrationMarkSettingsTest(unittest.TestCase):
     def test_cameo5_alpha_profiles_have_no_horizontal_margin(self):
         for product_id in (
@@ -18,5 +52,118 @@ class RegistrationMarkSettingsTest(unittest.TestCase):
             )
 
 
+class DrawCommandsTest(unittest.TestCase):
+    paths = [[(0, 0), (1, 0.5), (1, 30.33), (200, 290.07), (12.3, 4.56)], [(5, 5), (5.04, 5.02)]]
+
+    def plot_cmds(self, dev):
+        bbox = {'clip': {'urx': 300, 'ury': 0, 'llx': 0, 'lly': 300}}
+        return delimit_commands(dev.plot_cmds(self.paths, bbox, 1.0, 2.0)), bbox
+
+    def test_binary_same_positions(self):
+        point, bbox = self.plot_cmds(dummy_cameo("Silhouette_Cameo4", "point"))
+        binary, bbox = self.plot_cmds(dummy_cameo("Silhouette_Cameo4", "binary"))
+        self.assertIn(b"BE1", binary)
+        self.assertEqual(absolute_positions(binary), absolute_positions(point))
+        self.assertEqual(len(binary) + bbox['binary_saved'], len(point))
+        self.assertLess(len(binary), len(point))
+
+    def test_binary_far_draw(self):
+        # BE3 takes deltas below 375482 SU (18774 mm), longer draws are D commands
+        dev = dummy_cameo("Silhouette_Cameo4", "binary")
+        bbox = {}
+        data = delimit_commands(dev.plot_cmds([[(0, 0), (0.1, 0), (20000, 0), (20000.1, 0)]], bbox, 0, 0))
+        self.assertEqual(data.split(CMD_ETX)[2], b"D0,400000")
+        self.assertEqual(absolute_positions(data), [("M", (0, 0)), ("D", (0, 2)), ("D", (0, 400000)), ("D", (0, 400002))])
+
+    def test_runs_same_positions(self):
+        point, bbox = self.plot_cmds(dummy_cameo("Silhouette_Cameo3", "point"))
+        for mode in ("polyline", "relative"):
+            runs, bbox = self.plot_cmds(dummy_cameo("Silhouette_Cameo3", mode))
+            self.assertEqual(absolute_positions(runs), absolute_positions(point))
+            # one command per move and per run of draws
+            self.assertEqual(runs.count(CMD_ETX), 4)
+
+    def test_runs_fit_safe_chunks(self):
+        dev = dummy_cameo("Silhouette_Cameo3", "relative")
+        dev.safe_chunk_size = 16
+        path = [(i * 0.05, (i % 3) * 0.05) for i in range(100)]
+        bbox = {'clip': {'urx': 300, 'ury': 0, 'llx': 0, 'lly': 300}}
+        data = delimit_commands(dev.plot_cmds([path], bbox, 0, 0))
+        cmds = data.split(CMD_ETX)[:-1]
+        self.assertGreater(len(cmds), 2)
+        self.assertLessEqual(max(len(cmd) + 1 for cmd in cmds), 16)
+        self.assertEqual(absolute_positions(data), [("M", (0, 0))] + [("D", (i % 3, i)) for i in range(1, 100)])
+
+    def test_native_circle(self):
+        dev = dummy_cameo("Silhouette_Cameo3", "point")
+        circle = [(20 + 5 * math.sin(t), 30 - 5 * math.cos(t)) for t in np.linspace(0, 2 * math.pi, 33)]
+        circle[-1] = circle[0]
+        primitives = {(circle[0], circle[1]): (tuple(circle), (20, 30, 5))}
+        bbox = {'clip': {'urx': 300, 'ury': 0, 'llx': 0, 'lly': 300}}
+        # the circle, drawn on from its start with an overcut, without moves to where the pen is
+        path = [(10, 10)] + circle + circle[1:3]
+        cmds = dev.plot_cmds([path], bbox, 1.0, 2.0, primitives)
+        self.assertEqual(cmds, ["M240,220", "D540,420", "W640,420,100,100,180,-180", "D542,440", "D548,458"])
+        self.assertEqual((bbox['native'], bbox['count']), (1, len(path)))
+        # clipped circles are flattened
+        bbox = {'clip': {'urx': 300, 'ury': 0, 'llx': 0, 'lly': 35}}
+        cmds = dev.plot_cmds([circle], bbox, 1.0, 2.0, primitives)
+        self.assertEqual(bbox['native'], 0)
+        self.assertEqual(len(cmds), len(circle))
+
+    def test_native_circle_start_angle(self):
+        # a start at 162.8 degrees: W starts at 163 degrees, a move away from the first point and back
+        dev = dummy_cameo("Silhouette_Cameo3", "point")
+        circle = [(20 + 20 * math.sin(t), 30 - 20 * math.cos(t)) for t in np.linspace(0.3, 0.3 + 2 * math.pi, 65)]
+        circle[-1] = circle[0]
+        primitives = {(circle[0], circle[1]): (tuple(circle), (20, 30, 20))}
+        bbox = {'clip': {'urx': 300, 'ury': 0, 'llx': 0, 'lly': 300}}
+        path = [(10, 10)] + circle + circle[1:3]
+        cmds = dev.plot_cmds([path], bbox, 1.0, 2.0, primitives)
+        self.assertEqual(cmds, ["M240,220", "D258,538", "M257,537", "W640,420,400,400,163,-197",
+                                "M258,538", "D271,575", "D288,610"])
+
+    def test_binary_needs_support(self):
+        dev = dummy_cameo("Silhouette_Cameo3", "binary")
+        self.assertEqual(dev.draw_commands, "point")
+        self.assertIn("does not support binary draw commands", dev.log.getvalue())
+        self.assertNotIn(b"BE", self.plot_cmds(dev)[0])
+
+
+class CommandBufferTest(unittest.TestCase):
+    cmds = ["M0,0", b"BE1AB", "D100,200", "W1,2,3,4,5,6"]
+
+    def test_same_as_delimit_commands(self):
+        buf = CommandBuffer(self.cmds)
+        self.assertEqual(bytes(buf), delimit_commands(self.cmds))
+        self.assertEqual(buf.ends, CommandBuffer.from_bytes(bytes(buf)).ends)
+        self.assertEqual(buf.ends, [5, 11, 20, 33])
+
+    def test_chunks(self):
+        buf = CommandBuffer(self.cmds)
+        self.assertEqual([bytes(c) for c in buf.chunks(11)], [b"M0,0\x03BE1AB\x03", b"D100,200\x03", b"W1,2,3,4,5,6\x03"])
+        self.assertEqual([bytes(c) for c in buf.chunks(1024)], [bytes(buf)])
+        # a command longer than a chunk is sent on its own, an unterminated one at the end too
+        buf = CommandBuffer.from_bytes(b"M0,0\x03D12345678\x03M1")
+        self.assertEqual([bytes(c) for c in buf.chunks(6)], [b"M0,0\x03", b"D12345678\x03", b"M1"])
+
+    def test_safe_write(self):
+        dev = dummy_cameo("Silhouette_Cameo3", "point")
+        dev.safe_chunk_size = 12
+        dev.commands = io.BytesIO()
+        dev.wait_for_ready = lambda **kwargs: None
+        dev.safe_write(delimit_commands(self.cmds))
+        self.assertEqual(dev.commands.getvalue(), delimit_commands(self.cmds))
+
+    def test_write_logs_response_before_write(self):
+        dev = dummy_cameo("Silhouette_Cameo3", "point")
+        dev.dry_run = False
+        dev.transport = mock.Mock()
+        dev.transport.read_bytes.return_value = b"0\x03"
+        dev.transport.write_bytes.side_effect = lambda chunk, timeout: len(chunk)
+        dev.write(memoryview(b"M0,0\x03"))
+        self.assertIn("response before write('b'M0,0\\x03''): 'b'0\\x03''", dev.log.getvalue())
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -5,6 +5,7 @@ import subprocess
 import sys
 import os
 
+import tempfile
 from tempfile import gettempdir
 
 class TestRun(unittest.TestCase):
@@ -160,3 +161,56 @@ class TestRun(unittest.TestCase):
             print(e)
             self.assertEqual(e.returncode, 0)
             assert False
+
+    def test_11job_cache(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            cmds = []
+            for run, expected in enumerate(("Job cache: miss", "Job cache: hit", "Job cache: miss")):
+                cmdfile = os.path.join(tempdir, "run%d.cmd" % run)
+                logfile = os.path.join(tempdir, "run%d.log" % run)
+                try:
+                    subprocess.check_output([sys.executable, "sendto_silhouette.py", "--dry_run=True", "--preview=False",
+                                             "--cmdfile=" + cmdfile, "--logfile=" + logfile, "--cache_dir=" + tempdir,
+                                             "--cache_size=64", "--bypass_cache=%s" % (run == 2), "--force_hardware=Silhouette SD 1",
+                                             "examples/testcut_square_triangle_o.svg"], stderr=subprocess.STDOUT)
+                except subprocess.CalledProcessError as e:
+                    print(e.output.decode())
+                    print(e)
+                    self.assertEqual(e.returncode, 0)
+                with open(logfile, 'r') as f:
+                    self.assertIn(expected, f.read())
+                with open(cmdfile, 'rb') as f:
+                    cmds.append(f.read())
+            self.assertEqual(cmds[0], cmds[1])
+            self.assertEqual(cmds[0], cmds[2])
+            # the refined order depends on the time budget, it is not cached
+            logfile = os.path.join(tempdir, "refined.log")
+            try:
+                subprocess.check_output([sys.executable, "sendto_silhouette.py", "--dry_run=True", "--preview=False",
+                                         "--cmdfile=" + os.path.join(tempdir, "refined.cmd"), "--logfile=" + logfile,
+                                         "--cache_dir=" + tempdir, "--cache_size=64", "--optimize_seconds=0.1",
+                                         "--force_hardware=Silhouette SD 1", "examples/testcut_square_triangle_o.svg"],
+                                        stderr=subprocess.STDOUT)
+            except subprocess.CalledProcessError as e:
+                print(e.output.decode())
+                print(e)
+                self.assertEqual(e.returncode, 0)
+            with open(logfile, 'r') as f:
+                log = f.read()
+            self.assertIn("Job cache disabled", log)
+            self.assertNotIn("Job cache: ", log)
+
+    def test_12matfree_processes(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            logfile = os.path.join(tempdir, "run.log")
+            try:
+                subprocess.check_output([sys.executable, "sendto_silhouette.py", "--dry_run=True", "--preview=False",
+                                         "--logfile=" + logfile, "--strategy=matfree", "--matfree_processes=2",
+                                         "--force_hardware=Silhouette SD 1", "examples/fablab_logo_stencil.svg"],
+                                        stderr=subprocess.STDOUT)
+            except subprocess.CalledProcessError as e:
+                print(e.output.decode())
+                print(e)
+                self.assertEqual(e.returncode, 0)
+            with open(logfile, 'r') as f:
+                self.assertIn("MatFree: 2 y-bands on 2 processes", f.read())
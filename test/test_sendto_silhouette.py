@@ -5,7 +5,10 @@ import os
 import subprocess
 from unittest import mock
 
+import numpy as np
+
 from sendto_silhouette import SendtoSilhouette, __version__
+from silhouette.GeometryCache import GeometryCache
 from inkex import Transform
 from inkex.tester import TestCase
 from inkex.tester.mock import Capture
@@ -439,10 +442,103 @@ class DashesTest(SendtoSilhouetteTest):
 
         self.assertDeepAlmostEqual(
             self.e.paths,
-            [[(123.9, 111.46), (124.25984375, 112.09875), (123.92875, 112.7), (122.54, 113.28), (121.216625, 112.7725), (120.395, 111.677)], [(122.587, 106.084), (123.874171875, 105.606390625), (125.255375, 105.433375), (126.650640625, 105.564671875), (127.98, 106.0), (128.895, 106.508)], [(132.105, 112.055), (131.9995, 114.533), (131.18, 116.9), (130.303, 118.262)], [(124.784, 121.685), (121.513375, 121.9075), (118.284, 121.134)], [(113.243, 116.983), (111.80425, 114.017125), (111.189, 110.767)], [(112.431, 104.33), (112.98, 103.3), (114.626625, 101.078075), (116.622, 99.2856)], [(122.667, 96.7185), (125.95175, 96.4845875), (129.238, 96.9547)], [(135.107, 99.9146), (137.462125, 102.279825), (139.245, 105.028)], [(141.066, 111.355), (141.06, 114.64975), (140.442, 117.913)], [(137.452, 123.781), (135.1685, 126.21975), (132.531, 128.162)], [(126.388, 130.553), (123.111375, 130.943125), (119.798, 130.791)], [(113.487, 128.878), (111.66, 127.84), (108.158, 124.993)], [(104.358, 119.6), (103.141125, 116.524), (102.402, 113.298)], [(102.381, 106.696), (103.092375, 103.48225), (104.289, 100.378)], [(107.991, 94.9152), (110.42525, 92.63915), (113.128, 90.7687)], [(119.228, 88.2407), (122.47625, 87.6254625), (125.786, 87.4495)], [(132.32, 88.421), (135.406625, 89.548875), (138.35, 91.1122)], [(143.43, 95.3336), (145.51025, 97.9288375), (147.214, 100.749)], [(149.488, 106.952), (150.0295, 110.21375), (150.169, 113.525)], [(149.237, 120.067), (148.180125, 123.183625), (146.722, 126.178)], [(78.0, 142.0), (78.9999, 142.0)], [(81.9995, 142.0), (83.9995, 142.0)], [(87.0006, 142.0), (89.0009, 142.0)], [(92.0008, 142.0), (94.0002, 142.0)], [(96.0, 143.0), (96.0, 145.001)], [(96.0, 148.0), (96.0, 150.001)], [(96.0, 153.0), (96.0, 155.001)], [(96.0, 158.001), (96.0, 160.0), (95.9992, 160.0)], [(92.9991, 160.0), (90.9999, 160.0)], [(88.0, 160.0), (85.9997, 160.0)], [(82.9992, 160.0), (80.999, 160.0)], [(78.0, 159.999), (78.0, 158.0)], [(78.0, 155.0), (78.0, 153.0)], [(78.0, 150.0), (78.0, 148.0)], [(78.0, 145.0), (78.0, 143.0)], [(90.0, 186.0), (89.3991, 186.002)], [(87.0006, 186.054), (85.8008, 186.107)], [(83.4066, 186.265), (82.2115, 186.372)], [(79.826, 186.641), (78.6379, 186.804)], [(76.2691, 187.192), (75.0908, 187.418)], [(72.7483, 187.936), (71.585, 188.231)], [(69.2812, 188.9), (68.1422, 189.276)], [(65.8977, 190.125), (64.7963, 190.603)], [(62.6533, 191.68), (61.62, 192.289)], [(59.6639, 193.678), (58.7632, 194.472)], [(57.2111, 196.295), (56.6188, 197.338)], [(56.0098, 199.644), (56.0609, 200.841)], [(56.8423, 203.097), (57.4937, 204.104)], [(59.1229, 205.862), (60.0471, 206.626)], [(62.0371, 207.965), (63.083, 208.554)], [(65.2439, 209.596), (65.9584, 209.899), (66.3509, 210.059)], [(68.6055, 210.881), (69.7476, 211.246)], [(72.0592, 211.893), (73.2252, 212.178)], [(75.572, 212.678), (76.7525, 212.894)], [(79.1236, 213.265), (80.3139, 213.42)], [(82.7007, 213.674), (83.8967, 213.773)], [(86.2928, 213.917), (87.4928, 213.962)], [(89.8918, 214.0), (91.0914, 213.993)], [(93.49, 213.927), (94.6879, 213.867)], [(97.0813, 213.694), (98.2757, 213.579)], [(100.658, 213.295), (101.846, 213.123)], [(104.212, 212.718), (105.389, 212.484)], [(107.727, 211.947), (108.887, 211.642)], [(111.186, 210.951), (112.322, 210.561)], [(114.555, 209.684), (115.649, 209.191)], [(117.774, 208.075), (118.795, 207.444)], [(120.713, 206.006), (121.585, 205.183)], [(123.05, 203.289), (123.575, 202.211)], [(123.998, 199.864), (123.848, 198.676)], [(122.908, 196.48), (122.203, 195.509)], [(120.505, 193.818), (119.558, 193.081)], [(117.538, 191.789), (116.482, 191.22)], [(114.305, 190.21), (114.042, 190.101), (113.193, 189.763)], [(110.928, 188.966), (109.782, 188.613)], [(107.464, 187.988), (106.296, 187.713)], [(103.945, 187.232), (102.763, 187.024)], [(100.389, 186.67), (99.1978, 186.522)], [(96.8101, 186.284), (95.6138, 186.192)], [(93.2176, 186.063), (92.0191, 186.025)], [(150.0, 147.0), (149.4, 147.014)], [(147.027, 147.344), (145.872, 147.672)], [(143.68, 148.64), (142.659, 149.271)], [(140.815, 150.8), (140.005, 151.686)], [(138.649, 153.662), (138.114, 154.735)], [(137.349, 157.006), (137.127, 158.184)], [(137.013, 160.579), (137.121, 161.773)], [(137.666, 164.108), (138.096, 165.227)], [(139.258, 167.323), (139.979, 168.282)], [(141.67, 169.981), (142.625, 170.706)], [(144.715, 171.878), (145.832, 172.314)], [(148.164, 172.87), (149.357, 172.984)], [(151.753, 172.882), (152.932, 172.666)], [(155.208, 171.911), (156.285, 171.38)], [(158.268, 170.033), (159.156, 169.229)], [(160.695, 167.391), (161.33, 166.374)], [(162.308, 164.186), (162.642, 163.034)], [(162.983, 160.663), (163.0, 160.0), (162.989, 159.463)], [(162.67, 157.089), (162.347, 155.933)], [(161.391, 153.735), (160.765, 152.711)], [(159.244, 150.859), (159.192, 150.808), (158.362, 150.046)], [(156.393, 148.68), (155.323, 148.14)], [(153.055, 147.364), (151.877, 147.136)]]
+            [[(123.9, 111.46), (124.25984375, 112.09875), (123.92875000000001, 112.69999999999999), (122.54, 113.27999999999999), (121.18812500000001, 112.74921874999998), (120.36500000000001, 111.60624999999999), (120.35574250233901, 111.56259872140727)], [(122.7772918244819, 106.11137197189302), (123.47875, 105.71624999999999), (125.74859375000001, 105.44515624999998), (127.98, 105.99999999999999), (129.03231638549795, 106.64562263786915)], [(131.9795910666228, 112.27355102178662), (132.09890625, 113.85953124999997), (131.78447265625, 115.41814453125), (131.18, 116.89999999999999), (130.1425850513418, 118.42465075052814)], [(124.54718523046883, 121.7047618970108), (122.96740234375001, 121.93144531249999), (120.95515625000002, 121.84718749999999), (118.97689453125001, 121.39121093749998), (118.07635875333412, 120.99239514058078)], [(113.1396343492535, 116.74284791491407), (112.228046875, 115.12783203125), (111.4775, 112.82624999999999), (111.18270823490863, 110.49521071444221)], [(112.6048528679672, 104.10195325816498), (112.98, 103.29999999999998), (114.77949218750001, 100.91337890624997), (116.86997343797708, 99.12567376534258)], [(122.97439432364442, 96.71920741222226), (125.0665234375, 96.47861328124998), (127.94531250000001, 96.68359374999999), (129.52402055215208, 97.10118685693153)], [(135.30792433344718, 100.18453636471776), (136.14056640625, 100.83044921874998), (138.28140625, 103.39359374999998), (139.33180316731753, 105.36253124467004)], [(141.028173719397, 111.7077638311905), (141.13767578125, 112.73865234374999), (140.87171875, 116.05203124999998), (140.27146695315113, 118.23529577697848)], [(137.14161337533932, 124.00372728442129), (136.04146484375002, 125.39205078124998), (133.11796875, 127.79078124999998), (132.16847768333434, 128.288411791689)], [(126.00251435500931, 130.606860095239), (122.51185546875, 130.95572265624997), (119.40661237771911, 130.68581616072825)], [(113.16487897927392, 128.60650190565693), (111.66000000000001, 127.83999999999999), (108.27400390625002, 125.11009765624999), (107.90509580909169, 124.65382550917839)], [(104.24733370456562, 119.17079384918033), (103.70185546875001, 118.11419921874999), (102.54125000000002, 114.11375), (102.42163219470113, 112.84889047459696)], [(102.4903772366386, 106.25259781439807), (102.53484375000002, 105.77171874999999), (103.71458984375002, 101.69568359374998), (104.58741129585852, 100.00944918340075)], [(108.36116569586595, 94.60462527804398), (108.74126953125003, 94.13964843749999), (112.39015625000002, 91.22343749999999), (113.59568023620447, 90.60832245333066)], [(119.73512645993864, 88.20258972225972), (120.92625000000002, 87.86249999999998), (125.52119140625004, 87.44730468749998), (126.29019549090097, 87.52190793519064)], [(132.78443302242866, 88.67562559644516), (134.63419921875, 89.22128906249999), (138.7923408258086, 91.40447628329596)], [(143.7153030535828, 95.80011285218454), (146.09015625000004, 98.79843749999998), (147.35338282777678, 101.29739791297976)], [(149.55554476219484, 107.51623954811986), (149.73625000000004, 108.15749999999998), (150.17337890625004, 113.18824218749998), (150.08222269957528, 114.09272687643045)], [(148.9592242136161, 120.59337451401868), (148.19201171875002, 123.15410156249999), (146.33810767231324, 126.64406562987601)], [(78.0, 142.0), (79.0, 142.0)], [(82.0, 142.0), (84.0, 142.0)], [(87.0, 142.0), (89.0, 142.0)], [(92.0, 142.0), (94.0, 142.0)], [(96.0, 143.0), (96.0, 145.0)], [(96.0, 148.0), (96.0, 150.0)], [(96.0, 153.0), (96.0, 155.0)], [(96.0, 158.0), (96.0, 160.0)], [(93.0, 160.0), (91.0, 160.0)], [(88.0, 160.0), (86.0, 160.0)], [(83.0, 160.0), (81.0, 160.0)], [(78.0, 160.0), (78.0, 158.0)], [(78.0, 155.0), (78.0, 153.0)], [(78.0, 150.0), (78.0, 148.0)], [(78.0, 145.0), (78.0, 143.0)], [(90.0, 186.0), (89.40028531291752, 186.0185011917876)], [(87.0014265645876, 186.0925059589381), (85.80199719042264, 186.12950834251333)], [(83.40902611795674, 186.298153646541), (82.21425885788177, 186.4100964634295)], [(79.82642120222934, 186.64736897964045), (78.64150950544415, 186.83706418469748)], [(76.27168611187375, 187.21645459481152), (75.40542998558402, 187.35513550576403), (75.0911936410331, 187.42861577913078)], [(72.75423578001433, 187.9750844020384), (71.58575684950495, 188.2483187134922)], [(69.28988190345343, 188.94323156272407), (68.14718672150114, 189.30962987214025)], [(65.90955955502011, 190.1699870062031), (64.80723546089403, 190.64420382529445)], [(62.67195293103935, 191.73043543499008), (61.634432560637954, 192.3333877390757)], [(59.69689171449185, 193.73798984754663), (58.767011849717115, 194.49649063006868)], [(57.2338965127077, 196.33688939173683), (56.995025602213545, 196.63577934697668), (56.68217386240705, 197.39092266522655)], [(56.098235669534425, 199.68404021178364), (56.0435233588112, 200.7131005391339), (56.092543977428655, 200.87534284869741)], [(56.90983692103977, 203.11454893397604), (57.577301636837305, 204.1117905562348)], [(59.20837131269036, 205.8546851896559), (59.96443378580488, 206.56207463499248), (60.102176282214245, 206.65220676257798)], [(62.11043759783246, 207.9663172937706), (62.633999056319254, 208.30891096968986), (63.15206393745002, 208.5567851830693)], [(65.31701679173706, 209.59263224645), (65.95836943965737, 209.89949493661166), (66.41930064411073, 210.06283290581706)], [(68.68146463007514, 210.86446505375378), (69.81254662305734, 211.26528112772212)], [(72.13558838512691, 211.86803360241015), (73.29722636997352, 212.1690272770306)], [(75.6461437505924, 212.65438100378492), (76.82691251516478, 212.868355592487)], [(79.19416715086754, 213.25746146234547), (80.38651412036955, 213.3927711231956)], [(82.77120805937358, 213.66339044489578), (83.36692905145163, 213.7309939256452), (83.96725304327674, 213.74355531888364)], [(86.36672782130294, 213.7937627846237), (87.56646521031605, 213.81886651749375)], [(89.96593998834227, 213.86907398323382), (91.16567737735538, 213.89417771610385)], [(93.56439988103848, 213.91381557663914), (94.76145028484375, 213.82973031782618)], [(97.15555109245427, 213.66155980020025), (98.17025015734238, 213.5902835755591), (98.35139536513721, 213.56573778459068)], [(100.729660810577, 213.24347473826512), (101.9187935332969, 213.08234321510233)], [(104.28165560398583, 212.67024532197715), (105.45654323446757, 212.4260342334881)], [(107.80153022279525, 211.91841226002995), (108.95350419758756, 211.5823230435989)], [(111.25745214717216, 210.91014461073686), (111.65062299256354, 210.79543674038334), (112.38600715872285, 210.50560572454498)], [(114.61884829515485, 209.62559409993023), (115.23543344920427, 209.3825843782465), (115.71037687983952, 209.1314437031807)], [(117.83202172401035, 208.00955995019945), (118.26996681828655, 207.7779832622744), (118.84039552291246, 207.3643787580963)], [(120.7720770854521, 205.94267935424668), (121.59592074438623, 205.07016481245725)], [(123.02598422787474, 203.16620359964767), (123.60638604430153, 202.11590186610226)], [(123.97058282992384, 199.75533724380168), (123.83362665339733, 198.61627201282906), (123.81566059766634, 198.5666962208794)], [(122.7433824217644, 196.44664091631427), (122.03082886071284, 195.4811009520286)], [(120.3368286449414, 193.81327310294847), (119.38661082908575, 193.0804115181792)], [(117.38314953881499, 191.7785857084991), (116.31077836713902, 191.2400505934339)], [(114.16603602378707, 190.16298036330346), (114.04163056034261, 190.1005050633883), (113.0365786118885, 189.7611785060838)], [(110.76268046093182, 188.9934629343544), (109.62573138545349, 188.6096051484897)], [(107.30522080273538, 188.0096602151295), (106.13320720199894, 187.75200905621725)], [(103.78918000052604, 187.23670673839277), (103.01123670041306, 187.06568654484198), (102.61087834000524, 187.01559154265158)], [(100.22944821028385, 186.7176141320058), (99.03873314542315, 186.56862542668293)], [(96.65725607131343, 186.27121507166814), (95.45825067065667, 186.2223678691291)], [(93.0602398693431, 186.12467346405106), (91.86123446868635, 186.07582626151202)], [(150.0, 147.0), (149.40661575232065, 147.08885456997817)], [(147.03307876160324, 147.4442728498909), (146.18810609152635, 147.5708007844234), (145.87593091549576, 147.7190929333693)], [(143.7080889669249, 148.7488799433944), (142.77758697074518, 149.19089504006692), (142.65154519978637, 149.30474633438874)], [(140.87054886067406, 150.91348871279138), (139.98005069111792, 151.71785990199268)], [(138.74203362182578, 153.7736062216752), (138.1236951434533, 154.80203100072518)], [(137.47251737383263, 157.10140226289045), (137.18254256975186, 158.26583972922273)], [(137.1538493171417, 160.64815699226293), (137.21475028899374, 161.84661060906564)], [(137.82300688608814, 164.1467559959423), (138.22537006829242, 165.27728855611315)], [(139.42779453543668, 167.32656148322806), (140.1413072482614, 168.29139287193672)], [(141.8362793385038, 169.95310898476112), (142.80111072721246, 170.66662169758584)], [(144.87231021588076, 171.82787301383894), (146.0028427760516, 172.2302361960432)], [(148.31197587988808, 172.79330848872158), (149.51042949669076, 172.8542094605736)], [(151.88824554099776, 172.77908624473088), (153.05268300733005, 172.4891114406501)], [(155.33405626421015, 171.7944826425743), (156.36248104326012, 171.17614416420182)], [(158.38857926338048, 169.90211331076785), (159.1929504525818, 169.0116151412117)], [(160.80169283098445, 167.2306188020994), (160.80910495993308, 167.22241302925485), (161.31925381831334, 166.14848018251476)], [(162.34904082833845, 163.9806382339439), (162.4291992155766, 163.81189390847368), (162.57924267725636, 162.80988099400093)], [(162.9346609571691, 160.43634400328352), (163.0, 160.0), (162.92529040952664, 159.2448957461876)], [(162.57393628287826, 156.8794980499983), (162.2250381987594, 155.73133859813709)], [(161.22773474469747, 153.55907967423266), (160.8158473316909, 152.7875934239231), (160.60949734244963, 152.53592760837967)], [(159.06480344471788, 150.70300048277775), (158.13685320746188, 149.9421402083669)], [(156.14983022550717, 148.61685568280546), (155.09125068998927, 148.0516925497344)], [(152.8047790035975, 147.3301230958655), (152.54801739389862, 147.25209940886452), (151.62089878388574, 147.16037081466763)]]
         )
 
 
+class TraverseTest(SendtoSilhouetteTest):
+    def traverse(self, body, *args):
+        svg = ('<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+               'width="100mm" height="100mm" viewBox="0 0 100 100">%s</svg>' % body)
+        with open(os.path.join(self.tempdir, "traverse.svg"), "w") as f:
+            f.write(svg)
+        self.e.parse_arguments(list(args) + [f.name])
+        self.e.load_raw()
+        self.e.clean_up()
+        self.e.initDocScale()
+        self.e.report = mock.Mock()
+        self.e.recursivelyTraverseSvg(self.e.document.getroot())
+        return self.e.paths
+
+    def test_deep_nesting(self):
+        # deeper than the recursion limit
+        n = 2000
+        body = '<g transform="translate(0.01,0)">' * n + '<path d="M 0,0 L 10,10"/>' + '</g>' * n
+        self.assertDeepAlmostEqual(self.traverse(body), [[(20.0, 0.0), (30.0, 10.0)]])
+        self.assertEqual(self.e.nodecount, n + 1)
+
+    def test_use_cycle(self):
+        body = ('<g id="g1"><path d="M 0,0 L 10,0"/><use id="u1" xlink:href="#g1" y="10"/></g>')
+        self.assertDeepAlmostEqual(self.traverse(body), [[(0.0, 0.0), (10.0, 0.0)], [(0.0, 10.0), (10.0, 10.0)]])
+        self.e.report.assert_called_once_with("<use> element 'u1' is part of a reference cycle - skipped", 'error')
+
+    def test_hidden_and_skipped_layers(self):
+        body = ('<g style="display:none"><path d="M 0,0 L 10,0"/></g>'
+                '<g opacity="0"><path d="M 0,1 L 10,1"/></g>'
+                '<g style="fill:none;visibility:hidden"><path d="M 0,2 L 10,2"/>'
+                '<path visibility="visible" d="M 0,3 L 10,3"/></g>'
+                '<g xmlns:inkscape="http://www.inkscape.org/namespaces/inkscape" inkscape:label="My Regmarks">'
+                '<path d="M 0,4 L 10,4"/></g>')
+        self.assertDeepAlmostEqual(self.traverse(body), [[(0.0, 3.0), (10.0, 3.0)]])
+        self.e.report.assert_called_once_with("layer 'My Regmarks' is a registration mark layer - skipped", 'log')
+
+    def test_clones_flattened_once(self):
+        d = "M 0,0 C 0,10 10,10 10,0"
+        body = ('<defs><path id="p1" d="%s"/></defs>' % d +
+                ''.join('<use xlink:href="#p1" x="%d"/>' % (20*i) for i in range(3)) +
+                '<path d="%s" transform="translate(0,50)"/>' % d +
+                '<use xlink:href="#p1" transform="scale(2)"/>')
+        paths = self.traverse(body)
+        self.assertEqual(self.e.pathcount, 5)
+        self.assertEqual(len(self.e.flatcache), 2)     # the scaled clone is flattened finer
+        for i, dx, dy in ((1, 20, 0), (2, 40, 0), (3, 0, 50)):
+            self.assertDeepAlmostEqual(paths[i], [(x + dx, y + dy) for x, y in paths[0]])
+        # the same points as if the curve was drawn at twice the size
+        self.assertDeepAlmostEqual(paths[4], self.traverse('<path d="M 0,0 C 0,20 20,20 20,0"/>')[-1])
+
+    def test_geometry_cache(self):
+        body = ('<path d="M 0,0 C 0,10 10,10 10,0"/><rect x="1" y="2" width="3" height="4"/>'
+                '<path d="M 0,0 C 0,10 10,10 10,0" transform="translate(5,5)"/>')
+        paths = []
+        for run in range(2):
+            self.e = self.effect_class()
+            self.e.geocache = GeometryCache(os.path.join(self.tempdir, "geometry.sqlite"), 1000000)
+            paths.append(self.traverse(body))
+            self.assertEqual((self.e.geocache.hits, self.e.geocache.misses), ((0, 3), (3, 0))[run])
+            self.assertEqual(self.e.geocache.close()[0], 3)
+        self.assertEqual(paths[0], paths[1])
+        # the cache under the user's home is used only when asked for
+        self.e.parse_arguments([])
+        self.assertEqual(self.e.options.cache_size, 0)
+
+    def test_matfree_processes(self):
+        self.traverse('<path d="M 0,0 L 10,10"/>')
+        self.assertEqual(self.e.matfreeProcesses(), 1)          # no pool by default
+        self.e.parse_arguments(["--matfree_processes=0"])
+        self.assertEqual(self.e.matfreeProcesses(), 1)          # a small job
+        with mock.patch("sendto_silhouette.MATFREE_POOL_POINTS", 2), mock.patch("os.cpu_count", return_value=4):
+            self.assertEqual(self.e.matfreeProcesses(), 4)
+
+    def test_native_circles(self):
+        body = ('<circle cx="10" cy="20" r="5"/><circle cx="10" cy="20" r="5" transform="rotate(30) scale(2)"/>'
+                '<ellipse cx="50" cy="50" rx="4" ry="4" transform="scale(-1,1)"/>'
+                # not circles
+                '<ellipse cx="50" cy="50" rx="4" ry="3"/><circle cx="0" cy="0" r="5" transform="scale(2,1)"/>'
+                '<circle cx="0" cy="0" r="5" transform="skewX(10)"/><rect width="5" height="5"/>')
+        paths = self.traverse(body, "--native_circles=True")
+        circles = sorted(self.e.primitives.values())
+        self.assertEqual(len(circles), 3)
+        for points, (cx, cy, r) in circles:
+            self.assertIn(list(points), paths)
+            np.testing.assert_allclose(np.hypot(*(np.array(points) - (cx, cy)).T), r, atol=0.05)
+        self.assertDeepAlmostEqual([circle for points, circle in circles],
+                                   [(-50, 50, 4), (2 * (10 * 0.75 ** 0.5 - 20 * 0.5), 2 * (10 * 0.5 + 20 * 0.75 ** 0.5), 10),
+                                    (10, 20, 5)])
+        self.e = self.effect_class()
+        self.traverse(body)
+        self.assertEqual(self.e.primitives, {})
+
+
 # @mark.xfail(__inkex_version__[0:3] < '1.2', reason="earlier versions generate different curves")
 class CutTest(SendtoSilhouetteTest):
     source_file = "testcut_square_triangle_o.svg"
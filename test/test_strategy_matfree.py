@@ -0,0 +1,349 @@
+import contextlib
+import io
+import math
+import random
+import unittest
+
+import numpy as np
+
+from silhouette.Geometry import Barrier, XY_Hash, XY_s, sharp_turn
+from silhouette.Strategy import MatFree
+
+
+class XYHashTest(unittest.TestCase):
+    def test_same_cell(self):
+        h = XY_Hash(0.05)
+        self.assertEqual(h.setdefault(10.0, 20.0, 1), 1)
+        self.assertEqual(h.setdefault(10.0 + 1e-12, 20.0, 2), 1)
+        self.assertEqual(h.setdefault(10.02, 19.98, 3), 1)
+        self.assertEqual(h.lookup(10.0, 20.0), 1)
+        self.assertEqual(len(h), 1)
+
+    def test_other_cell(self):
+        h = XY_Hash(0.05)
+        h.setdefault(10.0, 20.0, 1)
+        self.assertEqual(h.setdefault(10.05, 20.0, 2), 2)
+        self.assertEqual(h.setdefault(-10.0, -20.0, 3), 3)
+        self.assertIsNone(h.lookup(10.0, 20.1))
+        self.assertEqual(len(h), 3)
+
+    def test_across_cell_border(self):
+        # 0.025 is a cell border with epsilon 0.05
+        h = XY_Hash(0.05)
+        h.setdefault(0.025 - 1e-12, 0.025 - 1e-12, 1)
+        self.assertEqual(h.lookup(0.025 + 1e-12, 0.025 - 1e-12), 1)
+        self.assertEqual(h.lookup(0.025 - 1e-12, 0.025 + 1e-12), 1)
+        self.assertEqual(h.lookup(0.025 + 1e-12, 0.025 + 1e-12), 1)
+        self.assertEqual(h.setdefault(0.025 + 1e-12, 0.025 + 1e-12, 2), 1)
+
+    def test_remove(self):
+        h = XY_Hash(0.05)
+        h.setdefault(1.0, 1.0, 1)
+        h.setdefault(2.0, 1.0, 2)
+        h.remove(1.0, 1.0)
+        self.assertIsNone(h.lookup(1.0, 1.0))
+        self.assertEqual(h.lookup(2.0, 1.0), 2)
+        self.assertEqual(h.setdefault(1.0, 1.0, 3), 3)
+
+    def test_discard(self):
+        h = XY_Hash(0.05)
+        h.setdefault(1.0, 1.0, 1)
+        self.assertFalse(h.discard(1.01, 1.01, 2))      # same cell, other value
+        self.assertFalse(h.discard(3.0, 3.0, 1))        # never stored
+        self.assertTrue(h.discard(1.01, 1.01, 1))
+        self.assertIsNone(h.lookup(1.0, 1.0))
+        self.assertFalse(h.discard(1.0, 1.0, 1))
+
+    def test_exact(self):
+        h = XY_Hash(0)
+        h.setdefault(1.0, 1.0, 1)
+        self.assertEqual(h.setdefault(1.0, 1.0, 2), 1)
+        self.assertEqual(h.setdefault(1.0 + 1e-12, 1.0, 3), 3)
+        h.remove(1.0, 1.0)
+        self.assertIsNone(h.lookup(1.0, 1.0))
+
+    def test_random(self):
+        # a location is identical to a stored one, iff in the same cell or very close.
+        rnd = random.Random(1)
+        h = XY_Hash(0.05)
+        stored = {}
+        cell = lambda x, y: (int(x / 0.05 + 0.5), int(y / 0.05 + 0.5))
+        for i in range(5000):
+            x, y = rnd.uniform(0, 2), rnd.uniform(0, 2)
+            found = h.setdefault(x, y, i)
+            if found == i:
+                self.assertNotIn(cell(x, y), [cell(*p) for p in stored.values()])
+                stored[i] = (x, y)
+            else:
+                px, py = stored[found]
+                self.assertTrue(cell(px, py) == cell(x, y) or (px-x)**2 + (py-y)**2 < (0.01*0.05)**2)
+        self.assertEqual(len(h), len(stored))
+
+    def test_setdefault_many_matches_setdefault(self):
+        # near duplicates right at the cell borders, on top of known locations.
+        for seed in range(40):
+            rnd = random.Random(seed)
+            eps = rnd.choice([0.05, 0.5, 0])
+            jitter = lambda: rnd.choice([0, 1e-4, -1e-4, eps*0.5 - 1e-5, eps*0.5 + 1e-5, rnd.uniform(-eps, eps)])
+            pts = [(rnd.randint(0, 20)*eps*0.5 + jitter(), rnd.randint(0, 20)*eps*0.5 + jitter()) for i in range(300)]
+            known = rnd.sample(pts, 20) + [(rnd.uniform(0, 5), rnd.uniform(0, 5)) for i in range(20)]
+            h1 = XY_Hash(eps)
+            h2 = XY_Hash(eps)
+            for x, y in known:
+                h1.setdefault(x, y, len(h1))
+                h2.setdefault(x, y, len(h2))
+            expected = []
+            for x, y in pts:
+                expected.append(h1.setdefault(x, y, len(h1) + 100))
+            self.assertEqual(h2.setdefault_many(np.array(pts), len(h2) + 100).tolist(), expected)
+            self.assertEqual(h2.cells, h1.cells)
+            self.assertEqual(h2.locs, h1.locs)
+
+    def test_setdefault_many_empty(self):
+        self.assertEqual(XY_Hash(0.05).setdefault_many(np.zeros((0, 2)), 0).tolist(), [])
+
+
+class XYsTest(unittest.TestCase):
+    def test_like_tuple(self):
+        p = XY_s((1.5, 2.5))
+        self.assertEqual((p.x, p.y), (1.5, 2.5))
+        self.assertEqual((p[0], p[1], p[-1]), (1.5, 2.5, 2.5))
+        self.assertEqual(tuple(p), (1.5, 2.5))
+        self.assertEqual(len(p), 2)
+        self.assertEqual(p, (1.5, 2.5))
+        self.assertEqual(p, XY_s((1.5, 2.5)))
+        self.assertNotEqual(p, XY_s((1.5, 2.0)))
+        self.assertEqual(hash(p), hash((1.5, 2.5)))
+        self.assertEqual(repr(p), repr((1.5, 2.5)))
+
+    def test_attr_adapter(self):
+        p = XY_s((0, 0))
+        self.assertEqual(p.attr, {})
+        self.assertFalse(p.sharp)
+        p.id = 3
+        p.seg = [1, 2]
+        p.sharp = True
+        self.assertEqual(p.att(), {'id': 3, 'seg': [1, 2], 'sharp': True})
+        self.assertTrue('sharp' in p.attr)
+        self.assertFalse('seen' in p.attr)
+        with self.assertRaises(AttributeError):
+            p.color = 'red'
+
+
+class BarrierTest(unittest.TestCase):
+    @staticmethod
+    def linear_find(keys, idx, limit):
+        """the former linear scan of Barrier.find(): (new idx, result)."""
+        prev = None
+        for i in range(idx, len(keys)):
+            if keys[i] > limit:
+                return (idx, None) if prev is None else (prev, prev)
+            prev = i
+        return prev, prev
+
+    def test_find_matches_linear(self):
+        rnd = random.Random(5)
+        points = [(0, rnd.randint(0, 30)) for i in range(300)]
+        bar = Barrier(points, key=lambda a: a[1])
+        keys = sorted(p[1] for p in points)
+        for step in range(500):
+            start = rnd.randint(0, len(points) - 1)
+            limit = rnd.uniform(-2, 32)
+            bar.pos(start)
+            expected_idx, expected = self.linear_find(keys, start, limit)
+            self.assertEqual(bar.find((0, limit)), expected)
+            self.assertEqual(bar.pos(), expected_idx)
+            self.assertEqual(bar.find((0, limit), start=start), expected)
+
+    def test_find_backwards(self):
+        bar = Barrier([(0, 5), (0, 1), (0, 3)], key=lambda a: a[1])
+        bar.pos(2)
+        self.assertEqual(bar.find((0, 2), backwards=True), 2)
+        self.assertEqual(bar.find((0, 0), backwards=True), 0)
+        self.assertEqual(bar.pos(), 0)
+
+    def test_insert_and_index(self):
+        rnd = random.Random(6)
+        points = [XY_s((0, rnd.randint(0, 10))) for i in range(50)]
+        bar = Barrier(points[:20], key=lambda a: a[1])
+        bar.pos(10)
+        for p in points[20:]:
+            behind = p.y < bar.point().y
+            self.assertEqual(bar.insert(p), behind)
+        self.assertEqual([p.y for p in bar.points], sorted(p.y for p in points))
+        self.assertEqual(bar.keys, [p.y for p in bar.points])
+        for p in points:
+            self.assertIs(bar.point(bar.index(p)), p)
+            self.assertEqual(bar.index(p), bar.lookup(lambda b: b is p))
+        self.assertIsNone(bar.index(XY_s((0, 3))))
+
+
+class MarkSharpSegsTest(unittest.TestCase):
+    def test_mark_sharp_segs(self):
+        rnd = random.Random(8)
+        cut = [[(rnd.randint(0, 8), rnd.randint(0, 8)) for i in range(6)] for n in range(40)]
+        for ratio in (0.0, 0.5, 0.99):
+            mf = MatFree("default")
+            mf.sharp_turn_fwd_ratio = ratio
+            mf.load(cut)
+            mf.link_points()
+            mf.mark_sharp_segs()
+            for pt in mf.points:
+                expected = any(sharp_turn(mf.points[a], pt, mf.points[b], ratio)
+                               for i, a in enumerate(pt.seg) for b in pt.seg[i+1:])
+                self.assertEqual(pt.sharp, expected)
+
+
+class MatFreeLoadTest(unittest.TestCase):
+    def test_near_duplicates_merge(self):
+        mf = MatFree("default")
+        mf.load([[(1.0, 1.0), (5.0, 1.0), (5.0, 5.0)],
+                 [(5.0 + 1e-9, 5.0 - 1e-9), (1.0, 5.0), (1.0, 1.0)]])
+        self.assertEqual(len(mf.points), 4)
+        self.assertEqual(mf.paths, [[0, 1, 2], [2, 3, 0]])
+        self.assertEqual(mf.points[2].dup, 1)
+
+    def test_empty_and_repeated(self):
+        cut = [[], [(0, 0), (0, 0), (1, 1), (1, 1)], [], [(1, 1), (0, 0)]]
+        mf = MatFree("default")
+        mf.load(cut)
+        self.assertEqual(mf.paths, [[], [0, 1], [], [1, 0]])
+        self.assertEqual([p.dup for p in mf.points], [2, 2])
+        mf = MatFree("default")
+        mf.do_dedup = False
+        mf.load(cut)
+        self.assertEqual(mf.paths, [[], [0, 0, 1, 1], [], [1, 0]])
+
+    def test_subdivide_and_link(self):
+        mf = MatFree("default")
+        mf.load([[(0, 0), (25, 0), (25, 5)], [(0, 0), (0, 12)]])
+        mf.subdivide_segments(10.0)
+        self.assertEqual(mf.paths, [[0, 4, 5, 1, 2], [0, 6, 3]])
+        self.assertEqual([(p.x, p.y) for p in mf.points[4:]], [(25/3, 0.0), (25/3 + 25/3, 0.0), (0.0, 6.0)])
+        self.assertEqual([p.sub for p in mf.points], [False]*4 + [True]*3)
+        mf.link_points()
+        self.assertEqual([p.seg for p in mf.points], [[4, 6], [5, 2], [1], [6], [0, 5], [4, 1], [0, 3]])
+
+    def test_dedup_epsilon_zero(self):
+        mf = MatFree("default")
+        mf.dedup_epsilon = 0
+        mf.points_dict = XY_Hash(mf.dedup_epsilon)
+        mf.load([[(1.0, 1.0), (5.0, 1.0), (5.0 + 1e-9, 1.0)]])
+        self.assertEqual(len(mf.points), 3)
+
+
+class MatFreeApplyTest(unittest.TestCase):
+    def test_gap_between_barriers(self):
+        # no segments at all between y=10 and y=40.
+        square = [(0.0, 0.0), (5.0, 0.0), (5.0, 5.0), (0.0, 5.0), (0.0, 0.0)]
+        far = [(x, y + 40.0) for x, y in square]
+        mf = MatFree("default")
+        output = mf.apply([square, far])
+        ys = [p.y for path in output for p in path]
+        self.assertTrue(min(ys) < 1.0 and max(ys) > 44.0)
+
+    def test_every_segment_cut_once(self):
+        # wiggly lines spanning many barrier steps: nothing is lost or cut twice.
+        cut = [[(x * 3.0 + 0.1 * (i % 2), i * 0.7) for i in range(60)] for x in range(5)]
+        mf = MatFree("default")
+        mf.overshoot = 0
+        output = mf.apply([list(p) for p in cut])
+        done = sorted(tuple(sorted(((A.x, A.y), (B.x, B.y)))) for path in output for A, B in zip(path, path[1:]))
+        expected = sorted(tuple(sorted((A, B))) for path in cut for A, B in zip(path, path[1:]))
+        self.assertEqual(done, expected)
+
+
+class MatFreePyramidsTest(unittest.TestCase):
+    @staticmethod
+    def star(cx, cy, r, n=7):
+        return [(cx + (r if i % 2 else r / 2.5) * math.cos(i * math.pi / n),
+                 cy + (r if i % 2 else r / 2.5) * math.sin(i * math.pi / n)) for i in range(2 * n + 1)]
+
+    @staticmethod
+    def length(paths):
+        return sum(math.hypot(B[0] - A[0], B[1] - A[1]) for path in paths for A, B in zip(path, path[1:]))
+
+    def cut(self):
+        cut = [self.star(20, 20, 15), self.star(50, 22, 12, 5), self.star(35, 45, 20, 9)]
+        cut += [[(x * 3.0 + 0.1 * (i % 2), i * 0.7) for i in range(60)] for x in range(5)]
+        cut.append([(60.0, 60.0)])
+        return cut
+
+    def test_all_segments_cut(self):
+        cut = self.cut()
+        mf = MatFree("pyramids")
+        mf.verbose = 0
+        mf.overshoot = 0
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            output = mf.apply([list(p) for p in cut])
+        self.assertEqual(stderr.getvalue(), "")
+        self.assertEqual([p for p in mf.points if p is not None and p.seg and max(p.seg) >= 0], [])
+        self.assertAlmostEqual(self.length([[tuple(p) for p in path] for path in output]), self.length(cut), places=6)
+
+    def pyramids(self, cut):
+        mf = MatFree("pyramids")
+        mf.overshoot = 0
+        return [[(round(p.x, 3), round(p.y, 3)) for p in path] for path in mf.apply(cut)]
+
+    def test_right_to_left_shadow(self):
+        # check b) of a right-to-left sweep looks for D on the right of [AB]; with the
+        # left-to-right side and slope it also cut the empty segment (4.2, 7.2)-(4.2, 7.2)
+        self.assertEqual(self.pyramids([[(6, 0), (4, 8), (7, 6), (4, 7)]]), [
+            [(6.0, 0.0), (4.75, 5.0)], [(7.0, 6.0), (6.062, 6.312)], [(4.75, 5.0), (4.2, 7.2)],
+            [(4.0, 7.0), (6.062, 6.312)], [(7.0, 6.0), (4.6, 7.6)], [(4.6, 7.6), (4.0, 8.0)],
+            [(4.2, 7.2), (4.0, 8.0)]])
+
+    def test_forced_cut(self):
+        # no sweep cuts [(4, 1), (7, 7)], so it is cut as it is, across the barrier at y=4
+        lines = []
+        mf = MatFree("pyramids")
+        mf.verbose = 1
+        mf.tracer = lines.append
+        mf.overshoot = 0
+        output = mf.apply([[(9, 1), (4, 1), (7, 7)]])
+        self.assertEqual([[tuple(p) for p in path] for path in output], [[(4, 1), (9, 1)], [(4, 1), (7, 7)]])
+        self.assertTrue(any(line.startswith("pyramids_barrier: no progress, forced cuts") for line in lines))
+
+    def test_tracer(self):
+        lines = []
+        mf = MatFree("pyramids")
+        mf.verbose = 3
+        mf.tracer = lines.append
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            mf.apply([list(p) for p in self.cut()])
+        self.assertEqual(stderr.getvalue(), "")
+        self.assertTrue(any(line.startswith("pyramids_barrier: new Y-slice") for line in lines))
+        self.assertTrue(any(line.startswith("output_add") for line in lines))
+
+
+class MatFreeBandsTest(unittest.TestCase):
+    square = [(0.0, 0.0), (5.0, 0.0), (5.0, 5.0), (0.0, 5.0), (0.0, 0.0)]
+
+    def shifted(self, dy, path=None):
+        return [(x, y + dy) for x, y in (path or self.square)]
+
+    def test_split_bands(self):
+        mf = MatFree("default")
+        far = self.shifted(100)
+        near = self.shifted(8)          # overlaps nothing, but the gap is too small
+        chain = self.shifted(103)
+        bands = mf.split_bands([far, [], self.square, chain, near])
+        self.assertEqual(bands, [[[], self.square, near], [far, chain]])
+        self.assertEqual(mf.split_bands([]), [[]])
+
+    def test_apply_bands(self):
+        cut = [self.shifted(200), self.square, self.shifted(100, [(0.0, 0.0), (20.0, 3.0), (40.0, 0.0)])]
+        mf = MatFree("default")
+        mf.processes = 2
+        output = mf.apply([list(p) for p in cut])
+        expected = []
+        for band in ([self.square], [cut[2]], [cut[0]]):
+            expected.extend(MatFree("default").apply([list(p) for p in band]))
+        self.assertEqual([[tuple(p) for p in path] for path in output],
+                         [[tuple(p) for p in path] for path in expected])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import random
+import unittest
+
+import silhouette.StrategyMinTraveling as mintravel
+from silhouette.Geometry import KDTree
+
+
+def random_paths(seed, count, grid=None):
+    """Open and closed paths. With grid set, coordinates are small integers,
+       which produces lots of equal distances to exercise the tie breaking."""
+    rnd = random.Random(seed)
+
+    def coord():
+        if grid:
+            return (rnd.randint(0, grid), rnd.randint(0, grid))
+        return (rnd.uniform(0, 300), rnd.uniform(0, 300))
+
+    paths = []
+    for n in range(count):
+        path = [coord() for i in range(rnd.randint(2, 6))]
+        if n % 3 == 0:
+            path.append(path[0])
+        paths.append(path)
+    return paths
+
+
+class KDTreeTest(unittest.TestCase):
+    def test_nearest_matches_linear_scan(self):
+        rnd = random.Random(1)
+        points = [(rnd.randint(0, 20), rnd.randint(0, 20)) for i in range(500)]
+        tree = KDTree(points, leafsize=4)
+        alive = set(range(len(points)))
+        for step in range(400):
+            q = (rnd.uniform(-5, 25), rnd.uniform(-5, 25))
+            expected = min(((q[0]-points[i][0])**2 + (q[1]-points[i][1])**2, i) for i in alive)
+            self.assertEqual(tree.nearest(q), expected)
+            tree.remove(expected[1])
+            alive.discard(expected[1])
+        self.assertEqual(len(tree), 100)
+
+    def test_empty(self):
+        tree = KDTree([(1, 1)])
+        tree.remove(0)
+        tree.remove(0)
+        self.assertEqual(len(tree), 0)
+        self.assertEqual(tree.nearest((0, 0)), (float("inf"), None))
+        self.assertEqual(KDTree([]).nearest((0, 0)), (float("inf"), None))
+
+    def test_knearest_matches_sorting(self):
+        rnd = random.Random(2)
+        points = [(rnd.randint(0, 20), rnd.randint(0, 20)) for i in range(300)]
+        tree = KDTree(points, leafsize=4)
+        for i in range(0, 300, 3):
+            tree.remove(i)
+        for step in range(50):
+            q = (rnd.uniform(-5, 25), rnd.uniform(-5, 25))
+            expected = sorted(((q[0]-points[i][0])**2 + (q[1]-points[i][1])**2, i)
+                              for i in range(len(points)) if i % 3)
+            self.assertEqual(tree.knearest(q, 7), expected[:7])
+
+
+class MinTravelingSortTest(unittest.TestCase):
+    def check_same_as_linear(self, paths, **kwargs):
+        expected = mintravel.sort_linear([list(p) for p in paths], **kwargs)
+        self.assertEqual(mintravel.sort([list(p) for p in paths], **kwargs), expected)
+
+    def test_sort_matches_linear(self):
+        for seed in range(5):
+            self.check_same_as_linear(random_paths(seed, 150))
+            self.check_same_as_linear(random_paths(seed, 150), reversible=False)
+
+    def test_sort_matches_linear_with_ties(self):
+        for seed in range(5):
+            self.check_same_as_linear(random_paths(seed, 150, grid=10))
+            self.check_same_as_linear(random_paths(seed, 150, grid=10), reversible=False)
+
+    def test_sort_matches_linear_entrycircular(self):
+        for seed in range(3):
+            self.check_same_as_linear(random_paths(seed, 80, grid=10), entrycircular=True)
+            self.check_same_as_linear(random_paths(seed, 80), entrycircular=True, reversible=False)
+
+    def test_sort_entrycircular_rotates_closed_path(self):
+        square = [(10, 10), (20, 10), (20, 20), (10, 20), (10, 10)]
+        line = [(0, 0), (25, 0)]
+        result = mintravel.sort([list(square), list(line)], entrycircular=True)
+        self.assertEqual(result, [line, [(20, 10), (20, 20), (10, 20), (10, 10), (20, 10)]])
+
+    def test_sort_empty(self):
+        self.assertEqual(mintravel.sort([]), [])
+
+
+class MinTravelingCellsTest(unittest.TestCase):
+    def test_small_job_is_plain_sort(self):
+        paths = random_paths(1, 100)
+        self.assertEqual(mintravel.sort_cells([list(p) for p in paths]), mintravel.sort([list(p) for p in paths]))
+
+    def test_all_paths_kept(self):
+        paths = random_paths(2, 2000)
+        result = mintravel.sort_cells([list(p) for p in paths], per_cell=50)
+        self.assertEqual(sorted(sorted(p) for p in result), sorted(sorted(p) for p in paths))
+        result = mintravel.sort_cells([list(p) for p in paths], reversible=False, per_cell=50)
+        self.assertEqual(sorted(result), sorted(paths))
+
+    def test_serpentine(self):
+        # one dot per 10x10 cell, in random order: the sweep must zigzag along the rows.
+        dots = [[(x*10 + 5, y*10 + 5), (x*10 + 5, y*10 + 5)] for y in range(4) for x in range(4)]
+        random.Random(3).shuffle(dots)
+        result = mintravel.sort_cells(dots, per_cell=1)
+        xs = [p[0][0] for p in result]
+        self.assertEqual(xs, [5, 15, 25, 35, 35, 25, 15, 5] * 2)
+        self.assertEqual([p[0][1] for p in result], sorted(p[0][1] for p in result))
+
+    def test_process_pool(self):
+        paths = random_paths(4, 600)
+        serial = mintravel.sort_cells([list(p) for p in paths], per_cell=100)
+        self.assertEqual(mintravel.sort_cells([list(p) for p in paths], per_cell=100, processes=2), serial)
+
+
+class MinTravelingRefineTest(unittest.TestCase):
+    def test_refine_never_worse(self):
+        for seed in range(4):
+            greedy = mintravel.sort(random_paths(seed, 200))
+            refined = mintravel.refine(greedy, 5)
+            self.assertLessEqual(mintravel.travel(refined), mintravel.travel(greedy))
+            self.assertEqual(sorted(sorted(p) for p in refined), sorted(sorted(p) for p in greedy))
+
+    def test_refine_improves(self):
+        # greedy walks along the row and leaves the outlier for last, far from x=90.
+        paths = [[(x, 0), (x, 1)] for x in range(0, 100, 10)] + [[(5, 50), (5, 51)]]
+        greedy = mintravel.sort(list(paths))
+        refined = mintravel.refine(greedy, 5)
+        self.assertLess(mintravel.travel(refined), mintravel.travel(greedy))
+
+    def test_refine_not_reversible(self):
+        greedy = mintravel.sort(random_paths(7, 200), reversible=False)
+        refined = mintravel.refine(greedy, 5, reversible=False)
+        self.assertLessEqual(mintravel.travel(refined), mintravel.travel(greedy))
+        self.assertEqual(sorted(refined), sorted(greedy))
+
+    def test_refine_disabled(self):
+        paths = random_paths(3, 20)
+        self.assertIs(mintravel.refine(paths, 0), paths)
+
+
+if __name__ == "__main__":
+    unittest.main()
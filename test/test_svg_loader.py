@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import glob
+import io
+import os
+import unittest
+from unittest import mock
+
+import inkex
+from lxml import etree
+
+from sendto_silhouette import SendtoSilhouette
+from silhouette.SvgLoader import load_paths, shape_d
+
+datadir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def svg(body):
+    return io.BytesIO(('<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+                       'width="100mm" height="100mm" viewBox="0 0 100 100">%s</svg>' % body).encode())
+
+
+class SvgLoaderTest(unittest.TestCase):
+    def test_same_as_sendto(self):
+        for filename in sorted(glob.glob(os.path.join(datadir, "*.svg"))):
+            for smoothness in (0.05, 0.2):
+                e = SendtoSilhouette()
+                e.parse_arguments(["--smoothness=%g" % smoothness, filename])
+                e.load_raw()
+                e.clean_up()
+                e.initDocScale()
+                e.report = mock.Mock()
+                e.recursivelyTraverseSvg(e.document.getroot())
+                self.assertEqual(load_paths(filename, smoothness), e.paths, filename)
+
+    def test_shapes(self):
+        body = ('<g transform="translate(10,0)"><rect x="1" y="2" width="3" height="4" rx="1"/>'
+                '<circle cx="5" cy="5" r="2"/><ellipse cx="5" cy="5" rx="2" ry="1" transform="rotate(30)"/>'
+                '<line x1="0" y1="0" x2="1" y2="1"/><polyline points="0,0 1,0 1,1"/><polygon points="0,0 1,0 1,1"/>'
+                '<path id="p" d="M 0,0 C 0,10 10,10 10,0"/></g><use xlink:href="#p" x="3"/>')
+        paths = load_paths(svg(body))
+        self.assertEqual(len(paths), 8)
+        self.assertEqual(paths[3], [(10.0, 0.0), (11.0, 1.0)])
+        self.assertEqual(paths[5][-1], paths[5][0])                 # polygon is closed
+        self.assertEqual(paths[7], [(x - 7.0, y) for x, y in paths[6]])
+
+    def test_shape_d_same_as_inkex(self):
+        # shape_d() adopts the node into an inkex document, check it against the .path of the loaded document
+        shapes = [
+            '<rect x="1" y="2" width="3" height="4"/>', '<rect width="3" height="4"/>',
+            '<rect x="1" y="2" width="0" height="4"/>', '<rect x="1" y="2" width="3" height="4" rx="1"/>',
+            '<rect x="1" y="2" width="3" height="4" ry="1"/>', '<rect x="1" y="2" width="3" height="4" rx="5" ry="7"/>',
+            '<rect x="1" y="2" width="3" height="4" rx="-1" ry="1"/>', '<rect x="1" y="2" width="3" height="4" rx="1" ry="-1"/>',
+            '<rect x="1" y="2" width="3" height="4" rx="0" ry="1"/>', '<rect x="1" y="2" width="3" height="4" rx="auto" ry="1"/>',
+            '<rect x="1" y="2" width="3" height="4" rx="1" ry="auto"/>',
+            '<rect x="1mm" y="2in" width="3cm" height="4pt" rx="1px"/>', '<rect x="10%" y="20%" width="30%" height="40%"/>',
+            '<circle cx="5" cy="5" r="2"/>', '<circle r="2"/>', '<circle cx="5" cy="5" r="0"/>',
+            '<circle cx="5mm" cy="5%" r="2pt"/>',
+            '<ellipse cx="5" cy="5" rx="2" ry="1"/>', '<ellipse cx="5" cy="5" rx="2"/>',
+            '<ellipse cx="5" cy="5" rx="auto" ry="3"/>', '<ellipse cx="5" cy="5" rx="2in" ry="10%"/>',
+            '<line x1="0" y1="0" x2="1" y2="1"/>', '<line x2="1mm" y2="1%"/>',
+            '<polyline points="0,0 1,0 1,1"/>', '<polyline points="0 0 1 0 1 1 2"/>',
+            '<polygon points="0,0 1,0 1,1"/>', '<polygon points="0,0,1,0 1e1,-1"/>']
+        source = svg("".join(shapes)).getvalue()
+        document = inkex.load_svg(io.BytesIO(source)).getroot()
+        for text, element, node in zip(shapes, document, etree.fromstring(source)):
+            self.assertEqual(shape_d(node), str(element.path), text)
+
+    def test_skipped(self):
+        report = mock.Mock()
+        body = ('<g id="g1"><path d="M 0,0 L 10,0"/><use id="u1" xlink:href="#g1" y="10"/></g>'
+                '<g style="display:none"><path d="M 0,1 L 10,1"/></g>'
+                '<g style="visibility:hidden"><path d="M 0,2 L 10,2"/></g>'
+                '<text><tspan>hello</tspan></text><text/>')
+        self.assertEqual(load_paths(svg(body), report=report), [[(0.0, 0.0), (10.0, 0.0)], [(0.0, 10.0), (10.0, 10.0)]])
+        self.assertEqual(report.call_args_list, [
+            mock.call("<use> element 'u1' is part of a reference cycle - skipped", 'error'),
+            mock.call("Warning: unable to draw <text> object, please convert it to a path first.", 'error')])
+
+
+if __name__ == "__main__":
+    unittest.main()